@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Load the promoted model bundle (scaler, feature order and classifier)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from segment_predictor import SegmentPredictor
+
+predictor = SegmentPredictor.from_bundle_dir()
+model_info = predictor.model_info
+feature_columns = predictor.feature_columns
+
+def predict_customer_segment(customer_features_dict):
+    """
+    Predict the segment for a new customer.
+    
+    Parameters:
+    -----------
+    customer_features_dict : dict
+        Dictionary containing customer features with keys matching feature_columns
+        
+    Returns:
+    --------
+    dict : Prediction results including segment, probability, and confidence
+    """
+    return predictor.predict(customer_features_dict)[0]
+
+def predict_customer_segments(customers):
+    """
+    Predict segments for many customers in one vectorized call.
+    
+    Parameters:
+    -----------
+    customers : dict, list of dict, or 2-D array
+        Feature dicts, or a raw feature matrix with columns in feature_columns order
+        
+    Returns:
+    --------
+    list of dict : One prediction result per customer (same keys as predict_customer_segment)
+    """
+    return predictor.predict(customers)
+
+# Example usage
+if __name__ == "__main__":
+    # Example: Predict segment for a new customer
+    example_customer = {
+        'order_id_nunique': 3,
+        'payment_id_count': 5,
+        'amount_sum': 5000,
+        'amount_mean': 1000,
+        'amount_median': 950,
+        'amount_std': 150,
+        'amount_order_sum': 5100,
+        'amount_order_mean': 1020,
+        'amount_order_median': 1000,
+        'payment_delay_days_mean': -30,
+        'payment_delay_days_median': -25,
+        'payment_delay_days_min': -60,
+        'payment_delay_days_max': 10,
+        'payment_delay_days_std': 25,
+        'recency_days': 45,
+        'customer_lifetime_days': 180,
+        'payment_frequency': 0.028
+    }
+    
+    result = predict_customer_segment(example_customer)
+    print("Prediction Result:")
+    print(f"  Segment: {result['predicted_segment']}")
+    print(f"  Confidence: {result['confidence']:.2%}")
+    print(f"  Model: {result['model_name']}")
+    print(f"  Model Accuracy: {result['model_accuracy']:.2%}")
+    if result['probabilities']:
+        print("  Probabilities:")
+        for seg, prob in result['probabilities'].items():
+            print(f"    {seg}: {prob:.2%}")
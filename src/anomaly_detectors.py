@@ -0,0 +1,228 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from scipy.stats import spearmanr
+from sklearn.preprocessing import StandardScaler
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import SGDOneClassSVM
+from sklearn.svm import OneClassSVM
+import warnings
+warnings.filterwarnings('ignore')
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
+
+# Above this many customers the exact RBF One-Class SVM (quadratic-to-cubic
+# training cost, support-vector set growing with the data) is replaced by
+# ApproxOneClassSVM in the anomaly ensemble
+EXACT_SVM_MAX_ROWS = 20_000
+
+
+class ApproxOneClassSVM:
+    """
+    One-Class SVM with an approximated RBF kernel, trained in mini-batches.
+
+    A Nystroem feature map (fit on a subsample) approximates the RBF kernel and
+    a linear SGDOneClassSVM is trained on the mapped features with partial_fit,
+    so training cost and model size are linear in the number of rows and
+    independent of it, respectively. The decision threshold is then set to the
+    nu-quantile of the training scores, so the flagged fraction matches the
+    exact model's nu.
+
+    Exposes the same fit_predict / predict / score_samples / decision_function
+    interface as sklearn.svm.OneClassSVM.
+    """
+
+    def __init__(self, nu=0.1, gamma='auto', n_components=300, kernel_sample_size=20_000,
+                 batch_size=10_000, n_epochs=5, random_state=42):
+        self.nu = nu
+        self.gamma = gamma
+        self.n_components = n_components
+        self.kernel_sample_size = kernel_sample_size
+        self.batch_size = batch_size
+        self.n_epochs = n_epochs
+        self.random_state = random_state
+
+    def _resolve_gamma(self, X):
+        if self.gamma == 'auto':
+            return 1.0 / X.shape[1]
+        if self.gamma == 'scale':
+            return 1.0 / (X.shape[1] * X.var())
+        return self.gamma
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        n_samples = X.shape[0]
+        rng = np.random.default_rng(self.random_state)
+
+        kernel_sample = X[rng.choice(n_samples, size=min(n_samples, self.kernel_sample_size), replace=False)]
+        self.feature_map_ = Nystroem(
+            kernel='rbf',
+            gamma=self._resolve_gamma(X),
+            n_components=min(self.n_components, len(kernel_sample)),
+            random_state=self.random_state
+        ).fit(kernel_sample)
+
+        self.sgd_ = SGDOneClassSVM(nu=self.nu, random_state=self.random_state)
+        for _ in range(self.n_epochs):
+            order = rng.permutation(n_samples)
+            for start in range(0, n_samples, self.batch_size):
+                batch = X[order[start:start + self.batch_size]]
+                self.sgd_.partial_fit(self.feature_map_.transform(batch))
+
+        self.offset_ = float(np.quantile(self.score_samples(X), self.nu))
+        return self
+
+    def score_samples(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        scores = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], self.batch_size):
+            batch = X[start:start + self.batch_size]
+            scores[start:start + len(batch)] = self.sgd_.score_samples(self.feature_map_.transform(batch))
+        return scores
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def fit_predict(self, X):
+        return self.fit(X).predict(X)
+
+
+def make_svm_detector(n_samples, nu=0.1, gamma='auto'):
+    """Exact RBF One-Class SVM for small data, ApproxOneClassSVM above EXACT_SVM_MAX_ROWS."""
+    if n_samples <= EXACT_SVM_MAX_ROWS:
+        return OneClassSVM(nu=nu, kernel='rbf', gamma=gamma)
+    return ApproxOneClassSVM(nu=nu, gamma=gamma)
+
+
+def _fit_detector(detector, X, with_scores):
+    start = time.perf_counter()
+    labels = detector.fit_predict(X)
+    scores = detector.score_samples(X) if with_scores else None
+    return labels, scores, time.perf_counter() - start
+
+
+def run_detectors_concurrently(detectors, X, score_detectors=()):
+    """
+    Fit several anomaly detectors on the same matrix at the same time.
+
+    Detectors run in threads over one read-only view of the shared array, so
+    no detector can modify it and no per-worker copies are made. The heavy
+    parts of the sklearn detectors (tree building, libsvm, BLAS) release the
+    GIL, so wall time approaches that of the slowest detector.
+
+    Parameters:
+    -----------
+    detectors : dict
+        Name -> unfitted detector with fit_predict (and score_samples)
+    X : np.ndarray
+        Feature matrix shared by all detectors
+    score_detectors : iterable of str
+        Names of detectors whose score_samples should also be computed
+
+    Returns:
+    --------
+    dict : name -> {'labels', 'scores' (or None), 'seconds'}
+    """
+    X = np.asarray(X).view()
+    X.setflags(write=False)
+    score_detectors = set(score_detectors)
+
+    with ThreadPoolExecutor(max_workers=len(detectors)) as executor:
+        futures = {
+            name: executor.submit(_fit_detector, detector, X, name in score_detectors)
+            for name, detector in detectors.items()
+        }
+        results = {}
+        for name, future in futures.items():
+            labels, scores, seconds = future.result()
+            results[name] = {'labels': labels, 'scores': scores, 'seconds': seconds}
+    return results
+
+
+def measure_svm_agreement(X, sizes, nu=0.1, gamma='auto', random_state=42):
+    """
+    Compare ApproxOneClassSVM with the exact One-Class SVM on subsamples of X.
+
+    Returns:
+    --------
+    pd.DataFrame : per size, fit times, label agreement, Jaccard overlap of the
+                   flagged sets and Spearman correlation of the scores
+    """
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for size in sizes:
+        if size > len(X):
+            # Resample with replacement plus jitter to reach sizes beyond the data
+            idx = rng.choice(len(X), size=size, replace=True)
+            X_sample = X[idx] + rng.normal(scale=0.01, size=(size, X.shape[1]))
+        else:
+            X_sample = X[rng.choice(len(X), size=size, replace=False)]
+
+        start = time.perf_counter()
+        exact = OneClassSVM(nu=nu, kernel='rbf', gamma=gamma).fit(X_sample)
+        exact_labels = exact.predict(X_sample)
+        exact_scores = exact.score_samples(X_sample)
+        exact_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = ApproxOneClassSVM(nu=nu, gamma=gamma, random_state=random_state).fit(X_sample)
+        approx_labels = approx.predict(X_sample)
+        approx_scores = approx.score_samples(X_sample)
+        approx_seconds = time.perf_counter() - start
+
+        exact_flagged = exact_labels == -1
+        approx_flagged = approx_labels == -1
+        union = (exact_flagged | approx_flagged).sum()
+        rows.append({
+            'n_samples': size,
+            'exact_seconds': round(exact_seconds, 3),
+            'approx_seconds': round(approx_seconds, 3),
+            'exact_support_vectors': len(exact.support_),
+            'exact_flagged': int(exact_flagged.sum()),
+            'approx_flagged': int(approx_flagged.sum()),
+            'label_agreement': float((exact_labels == approx_labels).mean()),
+            'flagged_jaccard': float((exact_flagged & approx_flagged).sum() / union) if union else 1.0,
+            'score_spearman': float(spearmanr(exact_scores, approx_scores).correlation)
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure agreement of the approximate One-Class SVM with the exact model.')
+    parser.add_argument('--sizes', default='1000,5000,10000,20000', help='Comma-separated sample sizes')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("ONE-CLASS SVM APPROXIMATION AGREEMENT")
+    print("="*80)
+
+    # Same features and scaling as the customer-level anomaly detection
+    feature_columns = [
+        'order_id_nunique', 'payment_id_count', 'amount_sum', 'amount_mean',
+        'payment_delay_days_mean', 'payment_delay_days_max',
+        'recency_days', 'payment_frequency'
+    ]
+    customer_features = pd.read_csv(os.path.join(data_dir, 'customer_features.csv'))
+    X_customer = customer_features[feature_columns].replace([np.inf, -np.inf], np.nan).fillna(0)
+    X_customer_scaled = StandardScaler().fit_transform(X_customer)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    agreement = measure_svm_agreement(X_customer_scaled, sizes)
+    print("\n" + agreement.to_string(index=False))
+
+    os.makedirs(output_dir, exist_ok=True)
+    agreement.to_csv(os.path.join(output_dir, 'svm_approximation_agreement.csv'), index=False)
+    print(f"\n[OK] Agreement report saved to {output_dir}/svm_approximation_agreement.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 import pandas as pd
 import numpy as np
 import os
+import time
+import argparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import IsolationForest
 from sklearn.covariance import EllipticEnvelope
-from sklearn.svm import OneClassSVM
+from anomaly_detectors import make_svm_detector, run_detectors_concurrently
+from fraud_scoring import TransactionFraudModel, fraud_model_path
+from partitioned_fraud_scoring import PartitionedFraudScorer, partition_root
+from customer_anomaly_state import CustomerAnomalyState, RESULT_COLUMNS, anomaly_state_path
+from identity_linkage import IdentityLinkage, RING_FEATURES, MAX_CONTACT_CUSTOMERS, linkage_path
+from risk_tracker import TopKRiskTracker, high_risk_report_path
+from artifact_store import write_artifact
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -16,6 +24,13 @@ data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
 output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
 os.makedirs(output_dir, exist_ok=True)
 
+parser = argparse.ArgumentParser(description='Customer anomaly and transaction fraud detection.')
+parser.add_argument('--full-refit', action='store_true',
+                    help='Refit the customer anomaly detectors instead of rescoring changed customers, and rebuild the identity linkage')
+parser.add_argument('--max-contact-customers', type=int, default=MAX_CONTACT_CUSTOMERS,
+                    help='Ignore an email/phone shared by more customers than this when linking identities')
+args = parser.parse_args()
+
 print("="*80)
 print("ANOMALY & FRAUD DETECTION IN CUSTOMER PAYMENT BEHAVIOR")
 print("="*80)
@@ -51,42 +66,89 @@ feature_columns = [
 X_customer = customer_features[feature_columns].copy()
 X_customer = X_customer.replace([np.inf, -np.inf], np.nan).fillna(0)
 
-# Standardize features
-scaler_customer = StandardScaler()
-X_customer_scaled = scaler_customer.fit_transform(X_customer)
-
 print(f"\nUsing {len(feature_columns)} features for customer anomaly detection")
 
-# Method 1: Isolation Forest (best for high-dimensional data)
-print("\n--- Method 1: Isolation Forest ---")
-iso_forest = IsolationForest(
-    contamination=0.1,  # Assume 10% are anomalies
-    random_state=42,
-    n_estimators=100
-)
-customer_features['anomaly_iso_forest'] = iso_forest.fit_predict(X_customer_scaled)
-customer_features['anomaly_score_iso_forest'] = iso_forest.score_samples(X_customer_scaled)
-
-# -1 means anomaly, 1 means normal
-anomalies_if = customer_features[customer_features['anomaly_iso_forest'] == -1]
-print(f"Isolation Forest detected {len(anomalies_if)} anomalous customers ({len(anomalies_if)/len(customer_features)*100:.1f}%)")
-
-# Method 2: One-Class SVM
-print("\n--- Method 2: One-Class SVM ---")
-oc_svm = OneClassSVM(nu=0.1, kernel='rbf', gamma='auto')
-customer_features['anomaly_svm'] = oc_svm.fit_predict(X_customer_scaled)
-customer_features['anomaly_score_svm'] = oc_svm.score_samples(X_customer_scaled)
-
-anomalies_svm = customer_features[customer_features['anomaly_svm'] == -1]
-print(f"One-Class SVM detected {len(anomalies_svm)} anomalous customers ({len(anomalies_svm)/len(customer_features)*100:.1f}%)")
-
-# Method 3: Elliptic Envelope (assumes Gaussian distribution)
-print("\n--- Method 3: Elliptic Envelope ---")
-elliptic = EllipticEnvelope(contamination=0.1, random_state=42)
-customer_features['anomaly_elliptic'] = elliptic.fit_predict(X_customer_scaled)
-
-anomalies_ee = customer_features[customer_features['anomaly_elliptic'] == -1]
-print(f"Elliptic Envelope detected {len(anomalies_ee)} anomalous customers ({len(anomalies_ee)/len(customer_features)*100:.1f}%)")
+# Change-driven rescoring: reuse the persisted detectors and rescore only customers with
+# new payments or changed features, unless a full refit is due (schedule, drift, many changes)
+anomaly_state = None
+refit_reason = "--full-refit requested" if args.full_refit else "no persisted detectors"
+if not args.full_refit and os.path.exists(anomaly_state_path):
+    anomaly_state = CustomerAnomalyState.load(anomaly_state_path)
+    if anomaly_state.feature_columns != feature_columns:
+        refit_reason = "feature set changed"
+    else:
+        dirty = anomaly_state.dirty_customers(customer_features, merged_data)
+        refit_reason = anomaly_state.plan_refit(customer_features, dirty)
+        if refit_reason is None and anomaly_state.clock_moved(merged_data):
+            # Recency-style features moved for everyone; rescore all customers with the persisted detectors
+            print("\nReference date moved: clock-relative features changed for every customer")
+            dirty = np.ones(len(customer_features), dtype=bool)
+
+stage_start = time.perf_counter()
+if refit_reason is None:
+    print(f"\nRescoring {dirty.sum()} of {len(customer_features)} customers with changed activity "
+          f"(detectors fitted {anomaly_state.fitted_at:%Y-%m-%d %H:%M})...")
+    detectors = anomaly_state.detectors
+    customer_features[RESULT_COLUMNS] = anomaly_state.rescore(customer_features, dirty, merged_data)
+    stage_seconds = time.perf_counter() - stage_start
+    detector_results = None
+else:
+    print(f"\nFull refit of the customer anomaly detectors ({refit_reason})")
+
+    # Standardize features
+    scaler_customer = StandardScaler()
+    X_customer_scaled = scaler_customer.fit_transform(X_customer)
+
+    # Run the three detectors concurrently over the same read-only feature matrix
+    detectors = {
+        # Method 1: Isolation Forest (best for high-dimensional data)
+        'Isolation Forest': IsolationForest(
+            contamination=0.1,  # Assume 10% are anomalies
+            random_state=42,
+            n_estimators=100,
+            n_jobs=-1
+        ),
+        # Method 2: One-Class SVM (exact RBF kernel for small data, Nystroem + SGD approximation at scale)
+        'One-Class SVM': make_svm_detector(len(X_customer_scaled), nu=0.1, gamma='auto'),
+        # Method 3: Elliptic Envelope (assumes Gaussian distribution)
+        'Elliptic Envelope': EllipticEnvelope(contamination=0.1, random_state=42)
+    }
+
+    print(f"Running {len(detectors)} detectors concurrently...")
+    detector_results = run_detectors_concurrently(
+        detectors, X_customer_scaled, score_detectors=['Isolation Forest', 'One-Class SVM']
+    )
+    stage_seconds = time.perf_counter() - stage_start
+
+    # -1 means anomaly, 1 means normal
+    customer_features['anomaly_iso_forest'] = detector_results['Isolation Forest']['labels']
+    customer_features['anomaly_score_iso_forest'] = detector_results['Isolation Forest']['scores']
+    customer_features['anomaly_svm'] = detector_results['One-Class SVM']['labels']
+    customer_features['anomaly_score_svm'] = detector_results['One-Class SVM']['scores']
+    customer_features['anomaly_elliptic'] = detector_results['Elliptic Envelope']['labels']
+
+    anomaly_state = CustomerAnomalyState.from_fit(scaler_customer, detectors, feature_columns,
+                                                  customer_features, merged_data)
+
+anomaly_state.save(anomaly_state_path)
+
+detector_columns = {
+    'Isolation Forest': 'anomaly_iso_forest',
+    'One-Class SVM': 'anomaly_svm',
+    'Elliptic Envelope': 'anomaly_elliptic'
+}
+for method_idx, (name, column) in enumerate(detector_columns.items(), 1):
+    n_anomalies = (customer_features[column] == -1).sum()
+    print(f"\n--- Method {method_idx}: {name} ({type(detectors[name]).__name__}) ---")
+    print(f"{name} detected {n_anomalies} anomalous customers ({n_anomalies/len(customer_features)*100:.1f}%)")
+    if detector_results is not None:
+        print(f"  Fit + score time: {detector_results[name]['seconds']:.2f}s")
+
+if detector_results is not None:
+    print(f"\nCustomer anomaly stage wall time: {stage_seconds:.2f}s "
+          f"(sum of detector times: {sum(r['seconds'] for r in detector_results.values()):.2f}s)")
+else:
+    print(f"\nCustomer anomaly stage wall time: {stage_seconds:.2f}s (incremental rescore)")
 
 # Consensus: Mark as anomaly if detected by at least 2 methods
 customer_features['anomaly_consensus'] = (
@@ -99,6 +161,27 @@ customer_features['is_anomaly'] = customer_features['anomaly_consensus'] >= 2
 consensus_anomalies = customer_features[customer_features['is_anomaly']]
 print(f"\n[OK] Consensus: {len(consensus_anomalies)} customers flagged as anomalies ({len(consensus_anomalies)/len(customer_features)*100:.1f}%)")
 
+# Identity linkage: rings of customers sharing a normalized email or phone. The persisted
+# linkage is extended (contacts it already holds are skipped), not rebuilt every run
+all_customers = pd.read_csv(os.path.join(data_dir, 'all_customers.csv'))
+if os.path.exists(linkage_path) and not args.full_refit:
+    linkage = IdentityLinkage.load(linkage_path).set_max_contact_customers(args.max_contact_customers)
+else:
+    linkage = IdentityLinkage(args.max_contact_customers)
+linkage.add_customers(all_customers['customer_id'], all_customers['email'], all_customers['phone'])
+ring_features = linkage.ring_features(customer_features)
+for column in RING_FEATURES:
+    customer_features[column] = ring_features[column]
+linkage.save(linkage_path)
+
+linked_customers = customer_features[customer_features['ring_size'] > 1]
+print(f"[OK] Identity linkage: {len(linked_customers)} customers share an email or phone "
+      f"({linked_customers['ring_id'].nunique()} rings, largest {customer_features['ring_size'].max()}; "
+      f"{linkage.common_contacts()} contacts shared by more than {linkage.max_contact_customers} customers ignored)")
+if len(linked_customers) > 0:
+    print(f"  - Anomaly rate in rings: {linked_customers['is_anomaly'].mean()*100:.1f}% "
+          f"vs {customer_features.loc[customer_features['ring_size'] == 1, 'is_anomaly'].mean()*100:.1f}% for unlinked customers")
+
 # ============================================================================
 # PART 2: TRANSACTION-LEVEL FRAUD DETECTION
 # ============================================================================
@@ -108,46 +191,44 @@ print("="*80)
 
 # Create transaction-level features for fraud detection
 print("\nEngineering fraud detection features...")
-
-# Feature 1: Unusual payment amounts (z-score)
-merged_data['amount_zscore'] = np.abs((merged_data['amount'] - merged_data['amount'].mean()) / merged_data['amount'].std())
-
-# Feature 2: Extreme payment delays
-merged_data['delay_zscore'] = np.abs((merged_data['payment_delay_days'] - merged_data['payment_delay_days'].mean()) / 
-                                      merged_data['payment_delay_days'].std())
-
-# Feature 3: Weekend/holiday transactions (higher fraud risk)
-merged_data['is_weekend'] = merged_data['payment_date'].dt.dayofweek.isin([5, 6]).astype(int)
-
-# Feature 4: Unusual time gaps between orders and payments
-merged_data['unusual_delay'] = (np.abs(merged_data['payment_delay_days']) > 365).astype(int)
-
-# Transaction risk scoring
-transaction_features = ['amount_zscore', 'delay_zscore', 'is_weekend', 'unusual_delay']
-X_transaction = merged_data[transaction_features].copy()
-X_transaction = X_transaction.fillna(0)
-
-# Standardize
-scaler_transaction = StandardScaler()
-X_transaction_scaled = scaler_transaction.fit_transform(X_transaction)
-
-# Apply Isolation Forest for transaction-level fraud detection
-print("\nApplying Isolation Forest for transaction fraud detection...")
-iso_forest_txn = IsolationForest(
-    contamination=0.05,  # Assume 5% fraudulent transactions
-    random_state=42,
-    n_estimators=100
-)
-merged_data['fraud_prediction'] = iso_forest_txn.fit_predict(X_transaction_scaled)
-merged_data['fraud_score'] = iso_forest_txn.score_samples(X_transaction_scaled)
-
-# Calculate fraud risk score (0-100, higher = more suspicious)
-merged_data['fraud_risk_score'] = ((1 - (merged_data['fraud_score'] - merged_data['fraud_score'].min()) / 
-                                    (merged_data['fraud_score'].max() - merged_data['fraud_score'].min())) * 100)
+print("Applying Isolation Forest for transaction fraud detection...")
+
+# Replays the history into per-customer amount/delay baselines (each payment
+# z-scored against the customer's earlier payments), then fits the scaler and
+# Isolation Forest (assume 5% fraudulent transactions) and adds the features.
+# Scoring runs per payment month in worker processes sharing the memory-mapped
+# forest; months whose features and model are unchanged since the last run are reused
+partitioned_scorer = PartitionedFraudScorer()
+fraud_model, fraud_scores = TransactionFraudModel.fit(merged_data, contamination=0.05,
+                                                      scorer=partitioned_scorer.score_samples)
+print(f"[OK] Scored {len(partitioned_scorer.pending)} changed payment-month partitions "
+      f"({merged_data['payment_date'].dt.to_period('M').nunique()} in total)")
+merged_data['fraud_prediction'] = np.where(fraud_scores - fraud_model.iso_forest.offset_ < 0, -1, 1)
+merged_data['fraud_score'] = fraud_scores
+
+# Calculate fraud risk score (0-100, higher = more suspicious), calibrated against
+# the training score distribution so > 70 marks its riskiest 5%
+merged_data['fraud_risk_score'] = fraud_model.risk_scores(fraud_scores)
+
+# Persist the fitted model so new payments can be scored without refitting
+fraud_model.save(fraud_model_path)
+print(f"[OK] Saved transaction fraud model to {fraud_model_path}")
+print(f"[OK] Per-customer baselines tracked for {len(fraud_model.baselines)} customers")
+
+# Riskiest payment per customer, top 50 (bounded; the same tracker is fed by online scoring)
+top_risk = TopKRiskTracker(k=50).update(merged_data)
 
 fraudulent_txns = merged_data[merged_data['fraud_prediction'] == -1]
 print(f"\n[OK] Detected {len(fraudulent_txns)} potentially fraudulent transactions ({len(fraudulent_txns)/len(merged_data)*100:.1f}%)")
 
+# Rule-based checks (added by the fit): duplicate payments and cumulative overpayment per order
+duplicate_payments = merged_data[merged_data['is_duplicate_payment'] | merged_data['is_near_duplicate_payment']]
+overpaid_orders = merged_data.loc[merged_data['is_overpayment'], 'order_id'].nunique()
+print(f"[OK] Duplicate payments: {merged_data['is_duplicate_payment'].sum()} exact, "
+      f"{merged_data['is_near_duplicate_payment'].sum()} near-duplicate (same order, within "
+      f"{fraud_model.integrity.window_days} days)")
+print(f"[OK] Overpaid orders (total payments > order amount): {overpaid_orders}")
+
 # ============================================================================
 # ANALYSIS & PROFILING
 # ============================================================================
@@ -181,7 +262,7 @@ print("="*80)
 
 if len(fraudulent_txns) > 0:
     print(f"\nTop 5 most suspicious transactions:")
-    top_fraud = merged_data.nlargest(5, 'fraud_risk_score')[
+    top_fraud = top_risk.head(5)[
         ['payment_id', 'customer_id', 'amount', 'payment_delay_days', 'fraud_risk_score']
     ]
     print(top_fraud.to_string(index=False))
@@ -276,11 +357,14 @@ print("="*80)
 
 # Save customer-level results
 customer_features.to_csv(os.path.join(data_dir, 'customer_anomaly_detection.csv'), index=False)
+write_artifact(customer_features, 'customer_anomaly_detection')
 print(f"[OK] Customer anomaly detection results saved to {data_dir}/customer_anomaly_detection.csv")
 
 # Save transaction-level results
 merged_data.to_csv(os.path.join(data_dir, 'transaction_fraud_detection.csv'), index=False)
 print(f"[OK] Transaction fraud detection results saved to {data_dir}/transaction_fraud_detection.csv")
+written_partitions = partitioned_scorer.write_partitions(merged_data, complete=True)
+print(f"[OK] {written_partitions} changed payment-month partitions written to {partition_root}")
 
 # Save high-risk report
 high_risk_customers = customer_features[customer_features['is_anomaly']][
@@ -291,13 +375,8 @@ high_risk_customers = customer_features[customer_features['is_anomaly']][
 high_risk_customers.to_csv(os.path.join(output_dir, 'high_risk_customers.csv'), index=False)
 print(f"[OK] High-risk customer report saved to {output_dir}/high_risk_customers.csv")
 
-high_risk_txns = merged_data.nlargest(50, 'fraud_risk_score')[
-    ['payment_id', 'customer_id', 'order_id', 'amount', 'payment_delay_days', 
-     'fraud_risk_score', 'method']
-]
-
-high_risk_txns.to_csv(os.path.join(output_dir, 'high_risk_transactions.csv'), index=False)
-print(f"[OK] High-risk transaction report saved to {output_dir}/high_risk_transactions.csv")
+top_risk.save(high_risk_report_path)
+print(f"[OK] High-risk transaction report saved to {high_risk_report_path}")
 
 # ============================================================================
 # SUMMARY
@@ -308,16 +387,23 @@ print("="*80)
 print(f"\nSummary:")
 print(f"  - Total customers analyzed: {len(customer_features)}")
 print(f"  - Anomalous customers detected: {len(consensus_anomalies)} ({len(consensus_anomalies)/len(customer_features)*100:.1f}%)")
+print(f"  - Customers in shared-contact rings: {len(linked_customers)}")
 print(f"  - Total transactions analyzed: {len(merged_data)}")
 print(f"  - Fraudulent transactions detected: {len(fraudulent_txns)} ({len(fraudulent_txns)/len(merged_data)*100:.1f}%)")
 print(f"  - High-risk transactions (score > 70): {len(merged_data[merged_data['fraud_risk_score'] > 70])}")
+print(f"  - Duplicate payments (exact or near): {len(duplicate_payments)}")
+print(f"  - Overpaid orders: {overpaid_orders}")
 
 print(f"\nOutput files generated:")
 print(f"  - customer_anomaly_detection.csv")
 print(f"  - transaction_fraud_detection.csv")
+print(f"  - transaction_fraud_detection/ (per payment month, Parquet)")
 print(f"  - high_risk_customers.csv")
 print(f"  - high_risk_transactions.csv")
 print(f"  - anomaly_fraud_analysis.png")
 print(f"  - anomaly_feature_comparison.png")
+print(f"  - transaction_fraud_model.joblib (models/, for scoring new payments)")
+print(f"  - identity_linkage.joblib (models/, for linking new customers)")
+print(f"  - customer_anomaly_state.joblib (models/, for rescoring changed customers)")
 
 print("\n" + "="*80)
@@ -0,0 +1,212 @@
+import pandas as pd
+import numpy as np
+import os
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+
+# read_artifact filter operators; each works on a pandas Series and a pyarrow dataset field
+_FILTER_OPS = {
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    'in': lambda column, value: column.isin(value),
+}
+
+
+def write_artifact(df, name, directory=data_dir):
+    """Write a pipeline output as <name>.parquet next to its CSV (the columnar copy the dashboard reads)."""
+    df.to_parquet(os.path.join(directory, f'{name}.parquet'), index=False)
+
+
+def artifact_path(name, directory=data_dir):
+    """
+    Best available copy of an artifact: a directory of Parquet partitions,
+    a single Parquet file, or the CSV. None if none exists.
+    """
+    for path in (os.path.join(directory, name), os.path.join(directory, f'{name}.parquet'),
+                 os.path.join(directory, f'{name}.csv')):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def artifact_version(name, directory=data_dir):
+    """
+    Cache key for an artifact's current contents: (path, size, latest mtime).
+
+    For a partitioned artifact this covers every file in the directory, so
+    rewriting any partition gives a new version. None if the artifact is missing.
+    """
+    path = artifact_path(name, directory)
+    if path is None:
+        return None
+    if os.path.isdir(path):
+        stats = [entry.stat() for entry in os.scandir(path) if entry.is_file()]
+        return path, sum(s.st_size for s in stats), max((s.st_mtime_ns for s in stats), default=0)
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+def read_artifact(name, columns=None, filters=None, directory=data_dir):
+    """
+    Read only the given columns and rows of an artifact.
+
+    Parameters:
+    -----------
+    name : str
+        Artifact name (file name without extension), e.g. 'customer_segments'
+    columns : list of str, optional
+        Columns to load (default: all); columns the artifact lacks are skipped
+    filters : list of (column, op, value), optional
+        Row filters, all of which must hold; op is one of ==, !=, <, <=, >, >=, in.
+        Parquet artifacts apply them while reading (row groups and partitions
+        that cannot match are skipped); CSV artifacts after parsing.
+
+    Returns:
+    --------
+    pd.DataFrame, or None if the artifact does not exist
+    """
+    path = artifact_path(name, directory)
+    if path is None:
+        return None
+
+    if path.endswith('.csv'):
+        usecols = None
+        if columns is not None:
+            wanted = set(columns) | {column for column, _, _ in filters or []}
+            usecols = lambda column: column in wanted
+        df = pd.read_csv(path, usecols=usecols)
+        for column, op, value in filters or []:
+            df = df[_FILTER_OPS[op](df[column], value)]
+        if columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        return df.reset_index(drop=True)
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet')
+    if columns is not None:
+        columns = [column for column in columns if column in dataset.schema.names]
+    expression = None
+    for column, op, value in filters or []:
+        condition = _FILTER_OPS[op](ds.field(column), value)
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def iter_artifact_frames(name, columns=None, filters=None, batch_size=65_536, directory=data_dir):
+    """
+    Columns/rows of an artifact as a stream of DataFrames of at most batch_size rows
+    (same columns and filters as read_artifact), so large reads never hold the whole result.
+
+    Yields nothing if the artifact does not exist.
+    """
+    path = artifact_path(name, directory)
+    if path is None:
+        return
+
+    if path.endswith('.csv'):
+        usecols = None
+        if columns is not None:
+            wanted = set(columns) | {column for column, _, _ in filters or []}
+            usecols = lambda column: column in wanted
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=batch_size):
+            for column, op, value in filters or []:
+                chunk = chunk[_FILTER_OPS[op](chunk[column], value)]
+            if columns is not None:
+                chunk = chunk[[column for column in columns if column in chunk.columns]]
+            yield chunk.reset_index(drop=True)
+        return
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet')
+    if columns is not None:
+        columns = [column for column in columns if column in dataset.schema.names]
+    expression = None
+    for column, op, value in filters or []:
+        condition = _FILTER_OPS[op](ds.field(column), value)
+        expression = condition if expression is None else expression & condition
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+        if batch.num_rows > 0:
+            yield batch.to_pandas()
+
+
+def artifact_schema(name, columns=None, directory=data_dir):
+    """pyarrow schema of a Parquet artifact's columns (None for a CSV or missing artifact)."""
+    path = artifact_path(name, directory)
+    if path is None or path.endswith('.csv'):
+        return None
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = ds.dataset(path, format='parquet').schema
+    if columns is None:
+        return schema.remove_metadata()
+    return pa.schema([schema.field(column) for column in columns if column in schema.names])
+
+
+def artifact_sort_index(name, column, ascending=True, filters=None, directory=data_dir):
+    """
+    Row positions of an artifact ordered by one column, for reading it a page at a time.
+
+    Only the sort column and the filter columns are read. Rows failing the
+    filters (same form as read_artifact) are left out; missing values sort
+    last and ties keep file order.
+
+    Returns:
+    --------
+    np.ndarray of int64 : positions for read_artifact_rows, or None if the artifact does not exist
+    """
+    filters = filters or []
+    df = read_artifact(name, list(dict.fromkeys([column] + [c for c, _, _ in filters])), directory=directory)
+    if df is None:
+        return None
+    mask = np.ones(len(df), dtype=bool)
+    for filter_column, op, value in filters:
+        mask &= _FILTER_OPS[op](df[filter_column], value).to_numpy(dtype=bool)
+    positions = np.flatnonzero(mask)
+    order = (df[column].iloc[positions].reset_index(drop=True)
+             .sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy())
+    return positions[order]
+
+
+def read_artifact_rows(name, positions, columns=None, directory=data_dir):
+    """
+    Rows of an artifact at the given positions (in that order), e.g. one page of an artifact_sort_index.
+
+    Parquet artifacts read only those rows' columns; CSV artifacts are parsed
+    in full first. None if the artifact does not exist.
+    """
+    path = artifact_path(name, directory)
+    if path is None:
+        return None
+    positions = np.asarray(positions, dtype=np.int64)
+    if path.endswith('.csv'):
+        return read_artifact(name, columns, directory=directory).iloc[positions].reset_index(drop=True)
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet')
+    if columns is not None:
+        columns = [column for column in columns if column in dataset.schema.names]
+    return dataset.take(positions, columns=columns).to_pandas()
+
+
+def artifact_row_count(name, directory=data_dir):
+    """Number of rows in an artifact (from Parquet metadata, without reading any column). None if missing."""
+    path = artifact_path(name, directory)
+    if path is None:
+        return None
+    if path.endswith('.csv'):
+        return len(pd.read_csv(path, usecols=[0]))
+
+    import pyarrow.dataset as ds
+
+    return ds.dataset(path, format='parquet').count_rows()
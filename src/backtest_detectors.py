@@ -0,0 +1,225 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import datetime
+import warnings
+warnings.filterwarnings('ignore')
+
+from fraud_scoring import TransactionFraudModel, TRANSACTION_FEATURES
+from score_calibration import HIGH_RISK_THRESHOLD
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
+backtest_dir = os.path.join(output_dir, 'backtests')
+
+
+def time_windows(payment_dates, freq='Q', min_train_rows=1000, train_periods=None):
+    """
+    Time-ordered (train, test) windows over the payment history.
+
+    Each test window is one calendar period; training covers everything
+    before it (or only the last train_periods periods). Windows with fewer
+    than min_train_rows training payments are skipped.
+
+    Returns:
+    --------
+    list of (pd.Period, np.ndarray, np.ndarray) : test period, train row positions, test row positions
+    """
+    periods = pd.to_datetime(payment_dates).dt.to_period(freq).to_numpy()
+    windows = []
+    for period in np.unique(periods[~pd.isna(periods)]):
+        train_mask = periods < period
+        if train_periods is not None:
+            train_mask &= periods >= period - train_periods
+        train_rows = np.flatnonzero(train_mask)
+        if len(train_rows) < min_train_rows:
+            continue
+        windows.append((period, train_rows, np.flatnonzero(periods == period)))
+    return windows
+
+
+def _measure(func, track_memory):
+    """Run func; return (result, seconds, peak traced memory in MB or None)."""
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak_mb = None
+    if track_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def run_backtest(transactions, contamination=0.05, n_estimators=100, feature_columns=TRANSACTION_FEATURES,
+                 freq='Q', min_train_rows=1000, train_periods=None, label_column=None, track_memory=True):
+    """
+    Replay history: fit the transaction fraud model on the past, score the next window.
+
+    Parameters:
+    -----------
+    transactions : pd.DataFrame
+        Merged payments (as in merged_payments_orders.csv), any order
+    label_column : str, optional
+        Boolean/0-1 column of confirmed fraud; enables precision/recall
+
+    Returns:
+    --------
+    pd.DataFrame : one row per test window with latency, throughput, memory,
+                   alert volume and (with labels) precision/recall
+    """
+    transactions = transactions.sort_values('payment_date', kind='mergesort').reset_index(drop=True)
+    rows = []
+    for period, train_rows, test_rows in time_windows(transactions['payment_date'], freq, min_train_rows, train_periods):
+        train = transactions.iloc[train_rows].copy()
+        test = transactions.iloc[test_rows]
+
+        (model, _), fit_seconds, fit_peak_mb = _measure(
+            lambda: TransactionFraudModel.fit(train, contamination=contamination, n_estimators=n_estimators,
+                                              feature_columns=feature_columns),
+            track_memory)
+        scored, score_seconds, score_peak_mb = _measure(lambda: model.score(test), track_memory)
+
+        alerts = (scored['fraud_prediction'] == -1).to_numpy()
+        row = {
+            'window': str(period),
+            'train_rows': len(train),
+            'test_rows': len(test),
+            'fit_seconds': round(fit_seconds, 4),
+            'score_seconds': round(score_seconds, 4),
+            'fit_rows_per_sec': round(len(train) / fit_seconds, 1),
+            'score_rows_per_sec': round(len(test) / score_seconds, 1),
+            'fit_peak_mb': None if fit_peak_mb is None else round(fit_peak_mb, 2),
+            'score_peak_mb': None if score_peak_mb is None else round(score_peak_mb, 2),
+            'alerts': int(alerts.sum()),
+            'alert_rate': round(float(alerts.mean()), 4),
+            'high_risk': int((scored['fraud_risk_score'] > HIGH_RISK_THRESHOLD).sum()),
+            'duplicates': int((scored['is_duplicate_payment'] | scored['is_near_duplicate_payment']).sum()),
+            'overpayments': int(scored['is_overpayment'].sum())
+        }
+        if label_column is not None and label_column in test.columns:
+            labels = test[label_column].fillna(0).astype(bool).to_numpy()
+            true_positives = int((alerts & labels).sum())
+            row['labelled_fraud'] = int(labels.sum())
+            row['true_positives'] = true_positives
+            row['precision'] = round(true_positives / alerts.sum(), 4) if alerts.sum() else None
+            row['recall'] = round(true_positives / labels.sum(), 4) if labels.sum() else None
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# Fixed column set of backtest_runs.csv (precision/recall are empty for unlabelled runs)
+RUN_COLUMNS = ['run', 'input', 'contamination', 'n_estimators', 'freq', 'train_periods', 'min_train_rows',
+               'label_column', 'track_memory', 'n_features', 'windows', 'test_rows', 'total_fit_seconds',
+               'total_score_seconds', 'median_fit_rows_per_sec', 'median_score_rows_per_sec', 'max_fit_peak_mb',
+               'max_score_peak_mb', 'alerts', 'alert_rate', 'high_risk', 'precision', 'recall']
+
+
+def append_run(runs_path, run_row):
+    """Append one run to the runs CSV with RUN_COLUMNS, first rewriting a file written with other columns."""
+    run_row = run_row.reindex(columns=RUN_COLUMNS)
+    if os.path.exists(runs_path):
+        header = pd.read_csv(runs_path, nrows=0).columns.tolist()
+        if header != RUN_COLUMNS:
+            pd.read_csv(runs_path).reindex(columns=RUN_COLUMNS).to_csv(runs_path, index=False)
+        run_row.to_csv(runs_path, mode='a', header=False, index=False)
+    else:
+        run_row.to_csv(runs_path, index=False)
+
+
+def summarize_backtest(results):
+    """Run-level totals and medians that make runs with different settings comparable."""
+    summary = {
+        'windows': len(results),
+        'test_rows': int(results['test_rows'].sum()),
+        'total_fit_seconds': round(float(results['fit_seconds'].sum()), 3),
+        'total_score_seconds': round(float(results['score_seconds'].sum()), 3),
+        'median_fit_rows_per_sec': round(float(results['fit_rows_per_sec'].median()), 1),
+        'median_score_rows_per_sec': round(float(results['score_rows_per_sec'].median()), 1),
+        'max_fit_peak_mb': results['fit_peak_mb'].max() if results['fit_peak_mb'].notna().any() else None,
+        'max_score_peak_mb': results['score_peak_mb'].max() if results['score_peak_mb'].notna().any() else None,
+        'alerts': int(results['alerts'].sum()),
+        'alert_rate': round(float(results['alerts'].sum() / results['test_rows'].sum()), 4),
+        'high_risk': int(results['high_risk'].sum())
+    }
+    if 'labelled_fraud' in results.columns:
+        alerts = results['alerts'].sum()
+        true_positives = results['true_positives'].sum()
+        summary['precision'] = round(float(true_positives / alerts), 4) if alerts else None
+        summary['recall'] = round(float(true_positives / results['labelled_fraud'].sum()), 4) if results['labelled_fraud'].sum() else None
+    return {key: (float(value) if isinstance(value, np.floating) else value) for key, value in summary.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the transaction fraud detector over time-ordered windows.')
+    parser.add_argument('--input', default=os.path.join(data_dir, 'merged_payments_orders.csv'), help='Merged payments CSV')
+    parser.add_argument('--contamination', type=float, default=0.05)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--features', default=None,
+                        help='Comma-separated Isolation Forest features (default: all TRANSACTION_FEATURES)')
+    parser.add_argument('--freq', default='Q', help="Test window length as a pandas period ('M', 'Q', 'Y')")
+    parser.add_argument('--train-periods', type=int, default=None,
+                        help='Train on only the last N periods (default: all history before the window)')
+    parser.add_argument('--min-train-rows', type=int, default=1000)
+    parser.add_argument('--label-column', default=None, help='Column of confirmed fraud labels, if any')
+    parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc (exact latencies, no peak memory)')
+    parser.add_argument('--tag', default=None, help='Run name for the report files (default: timestamp)')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("TRANSACTION FRAUD DETECTOR BACKTEST")
+    print("="*80)
+
+    feature_columns = args.features.split(',') if args.features else TRANSACTION_FEATURES
+    transactions = pd.read_csv(args.input)
+    config = {
+        'input': args.input,
+        'contamination': args.contamination,
+        'n_estimators': args.n_estimators,
+        'feature_columns': list(feature_columns),
+        'freq': args.freq,
+        'train_periods': args.train_periods,
+        'min_train_rows': args.min_train_rows,
+        'label_column': args.label_column,
+        'track_memory': not args.no_memory
+    }
+    print(f"\nConfig: contamination={args.contamination}, n_estimators={args.n_estimators}, "
+          f"{len(feature_columns)} features, windows of {args.freq}")
+
+    results = run_backtest(transactions, contamination=args.contamination, n_estimators=args.n_estimators,
+                           feature_columns=feature_columns, freq=args.freq, min_train_rows=args.min_train_rows,
+                           train_periods=args.train_periods, label_column=args.label_column,
+                           track_memory=not args.no_memory)
+    if len(results) == 0:
+        print("\nNo window has enough training history; lower --min-train-rows or use a shorter --freq.")
+        return
+    summary = summarize_backtest(results)
+    print("\n" + results.to_string(index=False))
+
+    tag = args.tag or datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(backtest_dir, exist_ok=True)
+    results.assign(run=tag).to_csv(os.path.join(backtest_dir, f'backtest_{tag}.csv'), index=False)
+    with open(os.path.join(backtest_dir, f'backtest_{tag}.json'), 'w') as f:
+        json.dump({'run': tag, 'config': config, 'summary': summary,
+                   'windows': json.loads(results.to_json(orient='records'))}, f, indent=2)
+
+    # One line per run, to compare settings side by side
+    runs_path = os.path.join(backtest_dir, 'backtest_runs.csv')
+    run_row = pd.DataFrame([{'run': tag, **{k: v for k, v in config.items() if k != 'feature_columns'},
+                             'n_features': len(feature_columns), **summary}])
+    append_run(runs_path, run_row)
+
+    print(f"\nSummary: {json.dumps(summary)}")
+    print(f"\n[OK] Window report saved to {backtest_dir}/backtest_{tag}.csv and .json")
+    print(f"[OK] Run appended to {runs_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+warnings.filterwarnings('ignore')
+
+from model_bundle import load_bundle, bundle_root
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
+
+# Per-process model bundle (loaded once by _init_worker, reused for every chunk)
+_bundle = None
+
+
+def _init_worker(bundle_dir, version=None):
+    """Load the model bundle once per worker process; its arrays are memory-mapped."""
+    global _bundle
+    _bundle = load_bundle(bundle_dir, version)
+
+
+def score_chunk(chunk, id_column='customer_id', bundle=None):
+    """
+    Score a chunk of customers as one NumPy matrix.
+
+    Parameters:
+    -----------
+    chunk : pd.DataFrame
+        Customer features; missing feature columns are treated as 0
+    id_column : str
+        Identifier column carried through to the output (if present)
+    bundle : ModelBundle, optional
+        Model to score with (default: the worker's bundle from _init_worker)
+
+    Returns:
+    --------
+    pd.DataFrame : id, predicted_segment, confidence and one prob_segment_<k> column per class
+    """
+    bundle = bundle if bundle is not None else _bundle
+    X = chunk.reindex(columns=bundle.feature_columns, fill_value=0).to_numpy(dtype=np.float64, copy=True)
+    X[~np.isfinite(X)] = 0
+    X_scaled = bundle.transform(X)
+
+    result = {}
+    if id_column in chunk.columns:
+        result[id_column] = chunk[id_column].to_numpy()
+
+    probabilities = bundle.predict_proba(X_scaled)
+    if probabilities is not None:
+        result['predicted_segment'] = bundle.classes_[probabilities.argmax(axis=1)].astype(np.int64)
+        result['confidence'] = probabilities.max(axis=1)
+        for idx, cls in enumerate(bundle.classes_):
+            result[f'prob_segment_{int(cls)}'] = probabilities[:, idx]
+    else:
+        result['predicted_segment'] = bundle.predict(X_scaled).astype(np.int64)
+        result['confidence'] = np.ones(len(X))
+
+    return pd.DataFrame(result)
+
+
+def _is_parquet(input_path, is_parquet=None):
+    return input_path.endswith('.parquet') if is_parquet is None else is_parquet
+
+
+def input_columns(input_path, is_parquet=None):
+    """
+    Column names of a CSV or Parquet feature file without reading its rows.
+
+    input_path can also be a file object (e.g. an upload); is_parquet then
+    says which format it is (default: from the .parquet extension).
+    """
+    if _is_parquet(input_path, is_parquet):
+        import pyarrow.parquet as pq
+
+        return list(pq.ParquetFile(input_path).schema_arrow.names)
+    columns = list(pd.read_csv(input_path, nrows=0).columns)
+    if hasattr(input_path, 'seek'):
+        input_path.seek(0)
+    return columns
+
+
+def missing_feature_columns(columns, feature_columns):
+    """Model feature columns (model_info['feature_columns']) that an input file lacks."""
+    available = set(columns)
+    return [col for col in feature_columns if col not in available]
+
+
+def iter_feature_chunks(input_path, chunksize, columns=None, is_parquet=None):
+    """
+    Yield DataFrame chunks from a CSV or Parquet file, reading only the given columns.
+
+    input_path can also be a file object, with is_parquet as in input_columns.
+    """
+    if _is_parquet(input_path, is_parquet):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(input_path)
+        if columns is not None:
+            available = set(parquet_file.schema_arrow.names)
+            columns = [col for col in columns if col in available]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        usecols = None
+        if columns is not None:
+            wanted = set(columns)
+            usecols = lambda col: col in wanted
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, usecols=usecols):
+            yield chunk
+
+
+class ScoredOutputWriter:
+    """Append scored chunks to a Parquet (default) or CSV file."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.is_parquet = output_path.endswith('.parquet')
+        self._writer = None
+        self._wrote_header = False
+
+    def write(self, scored):
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            scored.to_csv(self.output_path, mode='w' if not self._wrote_header else 'a',
+                          header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run_batch_scoring(input_path, output_path, bundle_dir=bundle_root, chunksize=100_000,
+                      workers=None, id_column='customer_id'):
+    """
+    Score every customer in input_path and write the results to output_path.
+
+    Chunks are fanned out to a process pool; each worker loads the model bundle
+    once, and the bundle's forest arrays are shared through the page cache.
+    At most 2 * workers chunks are in flight, so memory stays bounded by the
+    chunk size rather than the input size. Output order matches input order.
+    """
+    # Pin the version so a promotion during the run can't mix models across workers
+    bundle = load_bundle(bundle_dir)
+    feature_columns = bundle.feature_columns
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    chunks = iter_feature_chunks(input_path, chunksize, columns=[id_column] + feature_columns)
+    writer = ScoredOutputWriter(output_path)
+    total_rows = 0
+    start = time.perf_counter()
+
+    try:
+        if workers <= 1:
+            _init_worker(bundle_dir, bundle.version)
+            for chunk in chunks:
+                scored = score_chunk(chunk, id_column)
+                writer.write(scored)
+                total_rows += len(scored)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(bundle_dir, bundle.version)) as executor:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(score_chunk, chunk, id_column))
+                    if len(pending) >= 2 * workers:
+                        scored = pending.popleft().result()
+                        writer.write(scored)
+                        total_rows += len(scored)
+                while pending:
+                    scored = pending.popleft().result()
+                    writer.write(scored)
+                    total_rows += len(scored)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return total_rows, elapsed, bundle.version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch-score customers with the trained segment classifier.')
+    parser.add_argument('--input', default=os.path.join(data_dir, 'customer_features.csv'),
+                        help='CSV or Parquet file with customer features')
+    parser.add_argument('--output', default=os.path.join(output_dir, 'segment_predictions.parquet'),
+                        help='Output file (.parquet or .csv)')
+    parser.add_argument('--bundle-dir', default=bundle_root, help='Model bundle directory (uses its promoted version)')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='Rows per chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count, 1 = no pool)')
+    parser.add_argument('--id-column', default='customer_id', help='Identifier column copied to the output')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("BATCH SEGMENT SCORING")
+    print("="*80)
+    print(f"\nInput: {args.input}")
+    print(f"Output: {args.output}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    total_rows, elapsed, version = run_batch_scoring(
+        args.input, args.output, bundle_dir=args.bundle_dir, chunksize=args.chunksize,
+        workers=args.workers, id_column=args.id_column
+    )
+
+    rows_per_minute = total_rows / elapsed * 60 if elapsed > 0 else float('inf')
+    print(f"\n[OK] Scored {total_rows:,} customers with model bundle {version} in {elapsed:.2f}s ({rows_per_minute:,.0f} rows/min)")
+    print(f"[OK] Predictions saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import time
+import argparse
+import joblib
+import warnings
+warnings.filterwarnings('ignore')
+
+from segment_predictor import SegmentPredictor
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
+
+
+def load_legacy_predictor(models_dir):
+    """The original DataFrame-based predict_customer_segment, on the loose model artifacts."""
+    model = joblib.load(os.path.join(models_dir, 'segment_classifier.pkl'))
+    scaler = joblib.load(os.path.join(models_dir, 'feature_scaler.pkl'))
+    with open(os.path.join(models_dir, 'model_info.json'), 'r') as f:
+        model_info = json.load(f)
+    feature_columns = model_info['feature_columns']
+
+    def predict_customer_segment(customer_features_dict):
+        customer_df = pd.DataFrame([customer_features_dict])
+        for feature in feature_columns:
+            if feature not in customer_df.columns:
+                customer_df[feature] = 0
+        X = customer_df[feature_columns].copy()
+        X = X.replace([np.inf, -np.inf], np.nan).fillna(0)
+        X_scaled = scaler.transform(X)
+        predicted_segment = model.predict(X_scaled)[0]
+        if hasattr(model, 'predict_proba'):
+            probabilities = model.predict_proba(X_scaled)[0]
+            confidence = probabilities.max()
+            all_probs = {f'segment_{i}': prob for i, prob in enumerate(probabilities)}
+        else:
+            confidence = 1.0
+            all_probs = {}
+        return {
+            'predicted_segment': int(predicted_segment),
+            'confidence': float(confidence),
+            'probabilities': all_probs,
+            'model_name': model_info['model_name'],
+            'model_accuracy': model_info['test_accuracy']
+        }
+
+    return predict_customer_segment
+
+
+def time_per_row(func, inputs, n_rows, repeat=3):
+    """Best-of-repeat wall time per row in microseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(inputs)
+        best = min(best, time.perf_counter() - start)
+    return best / n_rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the pandas-free predictor with the original predict_customer_segment.')
+    parser.add_argument('--rows', type=int, default=500, help='Customers for the single-row comparison')
+    parser.add_argument('--batch-rows', type=int, default=100_000, help='Rows for the 2-D array batch measurement')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("SEGMENT PREDICTION MICROBENCHMARK")
+    print("="*80)
+
+    customer_features = pd.read_csv(os.path.join(data_dir, 'customer_features.csv'))
+    legacy_predict = load_legacy_predictor(models_dir)
+    predictor = SegmentPredictor.from_bundle_dir()
+
+    sample = customer_features.sample(n=min(args.rows, len(customer_features)), replace=False, random_state=42)
+    customers = sample[predictor.feature_columns].to_dict('records')
+    n = len(customers)
+
+    # Correctness: same segments and (near-)identical probabilities as the original function
+    legacy_results = [legacy_predict(customer) for customer in customers]
+    fast_results = predictor.predict(customers)
+    agreement = np.mean([a['predicted_segment'] == b['predicted_segment'] for a, b in zip(legacy_results, fast_results)])
+    max_prob_diff = max(abs(a['probabilities'][key] - b['probabilities'][key])
+                        for a, b in zip(legacy_results, fast_results) for key in a['probabilities'])
+    print(f"\nModel: {predictor.model_info['model_name']} (bundle {predictor.bundle.version})")
+    print(f"Segment agreement with original function: {agreement:.2%}")
+    print(f"Max absolute probability difference: {max_prob_diff:.2e}")
+    X_raw = predictor.to_matrix(customers)
+    scaling_matches = np.array_equal(predictor.transform(X_raw.copy()), predictor.bundle.transform(X_raw.copy()))
+    print(f"Scaling identical to the model bundle: {scaling_matches}")
+
+    results = {
+        'original, one dict per call': time_per_row(lambda rows: [legacy_predict(r) for r in rows], customers, n),
+        'fast path, one dict per call': time_per_row(lambda rows: [predictor.predict(r) for r in rows], customers, n),
+        'fast path, list of dicts': time_per_row(predictor.predict, customers, n),
+    }
+
+    X = np.resize(sample[predictor.feature_columns].to_numpy(dtype=np.float64),
+                  (args.batch_rows, len(predictor.feature_columns)))
+    results[f'fast path, 2-D array ({args.batch_rows:,} rows, probabilities)'] = time_per_row(
+        predictor.predict_proba, X, len(X))
+
+    baseline = results['original, one dict per call']
+    print(f"\n{'Method':<60} {'us/row':>10} {'speedup':>10}")
+    print("-"*82)
+    for name, us_per_row in results.items():
+        print(f"{name:<60} {us_per_row:>10.1f} {baseline / us_per_row:>9.1f}x")
+    print("\n" + "="*80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+
+from artifact_store import read_artifact, write_artifact
+from score_calibration import HIGH_RISK_THRESHOLD
+from chart_summaries import histogram_bins
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+
+# Artifact names of the cubes (data/<name>.parquet)
+CUSTOMER_CUBE = 'cube_customers'
+TRANSACTION_CUBE = 'cube_transactions'
+CUSTOMER_FRAUD_RISK = 'customer_fraud_risk'
+RISK_HISTOGRAM = 'hist_fraud_risk'
+
+# One-point risk bins, so the high-risk threshold falls on a bin edge
+RISK_HISTOGRAM_BINS = 100
+RISK_HISTOGRAM_RANGE = (0, 100)
+
+CUSTOMER_DIMENSIONS = ['segment', 'preferred_method', 'is_anomaly', 'anomaly_consensus']
+TRANSACTION_DIMENSIONS = ['payment_month', 'segment', 'method', 'fraud_prediction', 'is_high_risk']
+
+# Customer features the dashboard shows as totals or segment means
+CUBE_FEATURES = [
+    'order_id_nunique', 'payment_id_count', 'amount_sum', 'amount_mean',
+    'payment_delay_days_mean', 'recency_days', 'payment_frequency', 'avg_fraud_risk'
+]
+
+
+def customer_fraud_risk(transactions):
+    """Mean fraud_risk_score of every customer's transactions (customer_id, avg_fraud_risk)."""
+    return (transactions.groupby('customer_id')['fraud_risk_score'].mean()
+            .rename('avg_fraud_risk').reset_index())
+
+
+def build_customer_cube(segments, anomaly, fraud_risk):
+    """
+    Customer counts and feature sums per segment, preferred method, anomaly flag and consensus.
+
+    Every feature has a sum_<feature> and count_<feature> (non-null values)
+    measure, so means over any slice are sum / count after summing the
+    slice's cells. Customers without anomaly results count as normal with
+    consensus 0, and customers without transactions have an average fraud
+    risk of 0 (as the combined view shows them).
+    """
+    customers = segments.merge(anomaly[['customer_id', 'is_anomaly', 'anomaly_consensus']], on='customer_id', how='left')
+    customers = customers.merge(fraud_risk, on='customer_id', how='left')
+    customers['is_anomaly'] = customers['is_anomaly'].fillna(False).astype(bool)
+    customers['anomaly_consensus'] = customers['anomaly_consensus'].fillna(0).astype(int)
+    customers['avg_fraud_risk'] = customers['avg_fraud_risk'].fillna(0)
+    customers['preferred_method'] = customers['preferred_method'].fillna('unknown')
+
+    grouped = customers.groupby(CUSTOMER_DIMENSIONS, observed=True)
+    cube = grouped.size().rename('customers').to_frame()
+    for feature in CUBE_FEATURES:
+        cube[f'sum_{feature}'] = grouped[feature].sum()
+        cube[f'count_{feature}'] = grouped[feature].count()
+    return cube.reset_index()
+
+
+def build_transaction_cube(transactions, segments):
+    """Transaction counts, risk and amount sums per payment month, segment, method, prediction and high-risk flag."""
+    cube_input = pd.DataFrame({
+        'payment_month': pd.to_datetime(transactions['payment_date']).dt.to_period('M').astype(str),
+        'segment': transactions['customer_id'].map(segments.set_index('customer_id')['segment']).fillna(-1).astype(int),
+        'method': transactions['method'].fillna('unknown'),
+        'fraud_prediction': transactions['fraud_prediction'].astype(int),
+        'is_high_risk': transactions['fraud_risk_score'] > HIGH_RISK_THRESHOLD,
+        'fraud_risk_score': transactions['fraud_risk_score'],
+        'amount': transactions['amount']
+    })
+    grouped = cube_input.groupby(TRANSACTION_DIMENSIONS, observed=True)
+    cube = grouped.size().rename('transactions').to_frame()
+    cube['sum_fraud_risk_score'] = grouped['fraud_risk_score'].sum()
+    cube['sum_amount'] = grouped['amount'].sum()
+    return cube.reset_index()
+
+
+def build_cubes(segments, anomaly=None, transactions=None):
+    """
+    All dashboard cubes from the row-level outputs.
+
+    Returns:
+    --------
+    (pd.DataFrame, pd.DataFrame or None, pd.DataFrame, pd.DataFrame or None) : customer cube,
+        transaction cube, per-customer average fraud risk and fraud risk histogram
+        (transaction cube and histogram are None without transactions)
+    """
+    if anomaly is None:
+        anomaly = pd.DataFrame(columns=['customer_id', 'is_anomaly', 'anomaly_consensus'])
+    if transactions is None:
+        fraud_risk = pd.DataFrame(columns=['customer_id', 'avg_fraud_risk'])
+        transaction_cube = risk_histogram = None
+    else:
+        fraud_risk = customer_fraud_risk(transactions)
+        transaction_cube = build_transaction_cube(transactions, segments)
+        risk_histogram = histogram_bins(transactions['fraud_risk_score'], RISK_HISTOGRAM_BINS, RISK_HISTOGRAM_RANGE)
+    return build_customer_cube(segments, anomaly, fraud_risk), transaction_cube, fraud_risk, risk_histogram
+
+
+def load_cube_inputs():
+    """Only the columns the cubes need from the pipeline artifacts (None for a missing artifact)."""
+    segments = read_artifact('customer_segments', ['customer_id', 'segment', 'preferred_method'] +
+                             [f for f in CUBE_FEATURES if f != 'avg_fraud_risk'])
+    anomaly = read_artifact('customer_anomaly_detection', ['customer_id', 'is_anomaly', 'anomaly_consensus'])
+    transactions = read_artifact('transaction_fraud_detection',
+                                 ['customer_id', 'payment_date', 'method', 'amount', 'fraud_prediction', 'fraud_risk_score'])
+    return segments, anomaly, transactions
+
+
+def slice_mean(cube, feature, by=None):
+    """Mean of a feature over the customers of a (filtered) customer cube, overall or per `by` column(s)."""
+    if by is None:
+        count = cube[f'count_{feature}'].sum()
+        return cube[f'sum_{feature}'].sum() / count if count else np.nan
+    sums = cube.groupby(by)[[f'sum_{feature}', f'count_{feature}']].sum()
+    return (sums[f'sum_{feature}'] / sums[f'count_{feature}']).rename(feature)
+
+
+def main():
+    print("="*80)
+    print("DASHBOARD AGGREGATE CUBES")
+    print("="*80)
+
+    start = time.perf_counter()
+    segments, anomaly, transactions = load_cube_inputs()
+    if segments is None or anomaly is None or transactions is None:
+        print("\nMissing pipeline outputs; run customer_segmentation.py and anomaly_fraud_detection.py first.")
+        return
+
+    customer_cube, transaction_cube, fraud_risk, risk_histogram = build_cubes(segments, anomaly, transactions)
+
+    write_artifact(customer_cube, CUSTOMER_CUBE)
+    write_artifact(transaction_cube, TRANSACTION_CUBE)
+    write_artifact(fraud_risk, CUSTOMER_FRAUD_RISK)
+    write_artifact(risk_histogram, RISK_HISTOGRAM)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n[OK] {len(segments)} customers -> {len(customer_cube)} cells in {data_dir}/{CUSTOMER_CUBE}.parquet")
+    print(f"[OK] {len(transactions)} transactions -> {len(transaction_cube)} cells in {data_dir}/{TRANSACTION_CUBE}.parquet")
+    print(f"[OK] Average fraud risk of {len(fraud_risk)} customers saved to {data_dir}/{CUSTOMER_FRAUD_RISK}.parquet")
+    print(f"[OK] Fraud risk histogram ({RISK_HISTOGRAM_BINS} bins) saved to {data_dir}/{RISK_HISTOGRAM}.parquet")
+    print(f"[OK] Built in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
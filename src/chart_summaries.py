@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+def histogram_bins(values, bins=30, value_range=None):
+    """
+    Histogram of the finite values as a small table (np.histogram).
+
+    Returns:
+    --------
+    pd.DataFrame : bin_left, bin_right, count (one row per bin)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if value_range is None and len(values) == 0:
+        value_range = (0.0, 1.0)
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return pd.DataFrame({'bin_left': edges[:-1], 'bin_right': edges[1:], 'count': counts})
+
+
+def box_stats(values):
+    """
+    Box plot statistics of the finite values: quartiles, Tukey whiskers (furthest
+    values within 1.5 IQR of the box), mean and count; None if there are no values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        'q1': float(q1), 'median': float(median), 'q3': float(q3),
+        'lowerfence': float(inside.min()), 'upperfence': float(inside.max()),
+        'mean': float(values.mean()), 'count': int(len(values)),
+        'outliers': int(len(values) - len(inside))
+    }
+
+
+def value_range(values):
+    """(min, max) of the finite values, widened when they are all equal; (0, 1) if there are none."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return 0.0, 1.0
+    low, high = float(values.min()), float(values.max())
+    return (low - 0.5, high + 0.5) if low == high else (low, high)
+
+
+def density_cells(x, y, bins=80, x_range=None, y_range=None):
+    """
+    Non-empty cells of a 2-D histogram of the points (np.histogram2d), to draw
+    a density layer with one marker per cell instead of one per point.
+
+    Parameters:
+    -----------
+    x, y : array-like
+        Point coordinates (points with a non-finite coordinate are dropped)
+    bins : int
+        Cells per axis
+    x_range, y_range : (float, float), optional
+        Grid extent (default: value_range of the points); pass the same ranges
+        for several point sets to get aligned cells
+
+    Returns:
+    --------
+    pd.DataFrame : x, y (cell centre), count (one row per non-empty cell)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    x_range = x_range if x_range is not None else value_range(x)
+    y_range = y_range if y_range is not None else value_range(y)
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=[x_range, y_range])
+    ix, iy = np.nonzero(counts)
+    return pd.DataFrame({
+        'x': ((x_edges[:-1] + x_edges[1:]) / 2)[ix],
+        'y': ((y_edges[:-1] + y_edges[1:]) / 2)[iy],
+        'count': counts[ix, iy].astype(int)
+    })
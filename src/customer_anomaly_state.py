@@ -0,0 +1,145 @@
+import pandas as pd
+import numpy as np
+import os
+import joblib
+from datetime import datetime, timedelta
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
+anomaly_state_path = os.path.join(models_dir, 'customer_anomaly_state.joblib')
+
+# Detector name -> (label column, score column or None) in the customer anomaly results
+DETECTOR_COLUMNS = {
+    'Isolation Forest': ('anomaly_iso_forest', 'anomaly_score_iso_forest'),
+    'One-Class SVM': ('anomaly_svm', 'anomaly_score_svm'),
+    'Elliptic Envelope': ('anomaly_elliptic', None)
+}
+RESULT_COLUMNS = [column for columns in DETECTOR_COLUMNS.values() for column in columns if column is not None]
+
+# Features measured against the latest payment date (the reference date); they move for every
+# customer whenever it does, so they are left out of the change hashes and a moved reference
+# date rescores every customer instead (see clock_moved)
+CLOCK_RELATIVE_FEATURES = ['recency_days', 'payment_frequency']
+
+REFIT_INTERVAL_DAYS = 7
+DRIFT_THRESHOLD = 0.25
+MAX_DIRTY_FRACTION = 0.5
+
+
+def customer_feature_matrix(customer_features, feature_columns):
+    return customer_features[feature_columns].replace([np.inf, -np.inf], np.nan).fillna(0).to_numpy(dtype=np.float64)
+
+
+def feature_hashes(customer_features, feature_columns):
+    """Per-customer hash of the activity-derived detector features (customer_id -> uint64)."""
+    columns = [c for c in feature_columns if c not in CLOCK_RELATIVE_FEATURES]
+    hashes = pd.util.hash_pandas_object(customer_features[columns], index=False)
+    return pd.Series(hashes.to_numpy(), index=customer_features['customer_id'].to_numpy())
+
+
+class CustomerAnomalyState:
+    """
+    Persisted customer anomaly detectors plus what they last saw.
+
+    Holds the fitted scaler and detectors, the payment watermark (latest
+    payment_date at fit/rescore time), a hash of every customer's
+    activity-derived features and the last per-customer results, so a run
+    can rescore only customers that changed and reuse everyone else's
+    results. plan_refit() decides when a full refit is due instead. The
+    reference date the clock-relative features were computed against is
+    kept too: once it moves, every customer's results are stale.
+    """
+
+    def __init__(self, scaler, detectors, feature_columns, results, hashes, payment_watermark, fitted_at=None):
+        self.scaler = scaler
+        self.detectors = detectors
+        self.feature_columns = list(feature_columns)
+        self.results = results
+        self.hashes = hashes
+        self.payment_watermark = payment_watermark
+        self.reference_date = payment_watermark
+        self.fitted_at = fitted_at or datetime.now()
+
+    def dirty_customers(self, customer_features, payments):
+        """
+        Customers to rescore: new payments past the watermark, changed features, or not seen before.
+
+        Returns:
+        --------
+        np.ndarray of bool : mask over customer_features rows
+        """
+        paid_since = payments.loc[pd.to_datetime(payments['payment_date']) > self.payment_watermark, 'customer_id']
+        current = feature_hashes(customer_features, self.feature_columns)
+        known = current.index.isin(self.hashes.index)
+        previous = self.hashes.reindex(current.index, fill_value=0)
+        changed = ~known | (previous.to_numpy() != current.to_numpy())
+        return changed | customer_features['customer_id'].isin(paid_since.unique()).to_numpy()
+
+    def clock_moved(self, payments):
+        """True if the reference date (latest payment_date) differs from the one the results were scored at."""
+        reference_date = pd.to_datetime(payments['payment_date']).max()
+        return getattr(self, 'reference_date', None) != reference_date
+
+    def drift(self, customer_features):
+        """Largest shift of a feature's mean since the fit, in training standard deviations."""
+        X = customer_feature_matrix(customer_features, self.feature_columns)
+        return float(np.max(np.abs(X.mean(axis=0) - self.scaler.mean_) / self.scaler.scale_))
+
+    def plan_refit(self, customer_features, dirty, refit_interval_days=REFIT_INTERVAL_DAYS,
+                   drift_threshold=DRIFT_THRESHOLD, max_dirty_fraction=MAX_DIRTY_FRACTION):
+        """Reason for a full refit, or None if rescoring the dirty customers is enough."""
+        if list(self.detectors) != list(DETECTOR_COLUMNS):
+            return "detector set changed"
+        age = datetime.now() - self.fitted_at
+        if age > timedelta(days=refit_interval_days):
+            return f"detectors are {age.days} days old (refit every {refit_interval_days})"
+        drift = self.drift(customer_features)
+        if drift > drift_threshold:
+            return f"feature drift {drift:.2f} std > {drift_threshold}"
+        if dirty.mean() > max_dirty_fraction:
+            return f"{dirty.mean():.0%} of customers changed (> {max_dirty_fraction:.0%})"
+        return None
+
+    def rescore(self, customer_features, dirty, payments):
+        """
+        Score the dirty customers with the persisted detectors and merge with the previous results.
+
+        Returns:
+        --------
+        pd.DataFrame : RESULT_COLUMNS for every row of customer_features (same index)
+        """
+        results = self.results.reindex(customer_features['customer_id'].to_numpy())
+        if dirty.any():
+            X = customer_feature_matrix(customer_features[dirty], self.feature_columns)
+            X -= self.scaler.mean_
+            X /= self.scaler.scale_
+            for name, (label_column, score_column) in DETECTOR_COLUMNS.items():
+                detector = self.detectors[name]
+                results.loc[results.index[dirty], label_column] = detector.predict(X)
+                if score_column is not None:
+                    results.loc[results.index[dirty], score_column] = detector.score_samples(X)
+
+        self.results = results.copy()
+        self.hashes = feature_hashes(customer_features, self.feature_columns)
+        self.reference_date = pd.to_datetime(payments['payment_date']).max()
+        self.payment_watermark = max(self.payment_watermark, self.reference_date)
+        for label_column, _ in DETECTOR_COLUMNS.values():
+            results[label_column] = results[label_column].astype(int)
+        return results.set_index(customer_features.index)
+
+    @classmethod
+    def from_fit(cls, scaler, detectors, feature_columns, customer_features, payments):
+        """State after a full fit; customer_features must already hold the RESULT_COLUMNS."""
+        results = customer_features[RESULT_COLUMNS].set_index(customer_features['customer_id'].to_numpy())
+        return cls(scaler, detectors, feature_columns, results,
+                   feature_hashes(customer_features, feature_columns),
+                   pd.to_datetime(payments['payment_date']).max())
+
+    def save(self, path=anomaly_state_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=anomaly_state_path):
+        return joblib.load(path)
@@ -0,0 +1,198 @@
+import numpy as np
+
+
+class CustomerBaselineStore:
+    """
+    Per-customer running mean/variance of payment amount and delay.
+
+    Each customer keeps a Welford state (count, mean, M2) per metric. Scores
+    are taken against the customer's baseline blended with a global prior
+    worth prior_weight pseudo-payments, so customers with no or few payments
+    fall back to the population mean/std (cold start).
+
+    score_and_update() scores every payment against the state *before* it
+    (earlier payments of the same customer, in input order, including
+    earlier rows of the same batch) and then folds the batch into the state
+    in place. A batch is processed in a vectorized way: per customer, prefix
+    sums of deviations from a shift (the customer's first value in the batch)
+    give the in-batch mean and M2, which are merged into the stored state
+    with Chan et al.'s parallel update. Deviations are squared rather than
+    raw values, so large amounts with a small spread keep their variance
+    (up to rounding, the same state as one-at-a-time Welford updates).
+    """
+
+    METRICS = ('amount', 'delay')
+
+    def __init__(self, prior_mean, prior_var, prior_weight=5.0, initial_capacity=1024):
+        self.prior_mean = np.asarray(prior_mean, dtype=np.float64)
+        self.prior_var = np.asarray(prior_var, dtype=np.float64)
+        self.prior_weight = float(prior_weight)
+        self.index = {}
+        self.count = np.zeros((initial_capacity, len(self.METRICS)), dtype=np.float64)
+        self.mean = np.zeros((initial_capacity, len(self.METRICS)), dtype=np.float64)
+        self.m2 = np.zeros((initial_capacity, len(self.METRICS)), dtype=np.float64)
+
+    @classmethod
+    def from_history(cls, values, prior_weight=5.0):
+        """Create an empty store whose global prior is the mean/variance of the given (n, 2) values."""
+        values = np.asarray(values, dtype=np.float64)
+        return cls(np.nanmean(values, axis=0), np.nanvar(values, axis=0, ddof=1), prior_weight)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _rows_for(self, customer_ids, register=True):
+        """
+        State row per payment, registering unseen customers.
+
+        With register=False the store is left unchanged: unseen customers get
+        temporary rows past the stored ones (see _state).
+        """
+        index = self.index
+        unseen = {}
+        rows = np.empty(len(customer_ids), dtype=np.int64)
+        for position, customer_id in enumerate(customer_ids):
+            row = index.get(customer_id)
+            if row is None:
+                if register:
+                    row = len(index)
+                    index[customer_id] = row
+                else:
+                    row = unseen.setdefault(customer_id, len(index) + len(unseen))
+            rows[position] = row
+
+        if register and len(index) > len(self.count):
+            capacity = max(len(index), 2 * len(self.count))
+            pad = np.zeros((capacity - len(self.count), len(self.METRICS)))
+            self.count = np.vstack([self.count, pad])
+            self.mean = np.vstack([self.mean, pad])
+            self.m2 = np.vstack([self.m2, pad])
+        return rows
+
+    def _state(self, array, rows):
+        """Rows of a state array; temporary rows of unregistered customers are empty (zeros)."""
+        stored = rows < len(self.index)
+        state = np.zeros((len(rows), len(self.METRICS)))
+        state[stored] = array[rows[stored]]
+        return state
+
+    def baseline(self, customer_ids):
+        """Prior-blended (mean, std) per customer and metric, without updating state; unknown customers get the prior."""
+        rows = np.array([self.index.get(customer_id, -1) for customer_id in customer_ids], dtype=np.int64)
+        known = rows >= 0
+        count = np.zeros((len(rows), len(self.METRICS)))
+        mean = np.zeros((len(rows), len(self.METRICS)))
+        m2 = np.zeros((len(rows), len(self.METRICS)))
+        count[known] = self.count[rows[known]]
+        mean[known] = self.mean[rows[known]]
+        m2[known] = self.m2[rows[known]]
+        return self._blend(count, mean, m2)
+
+    def _blend(self, count, mean, m2):
+        """Shrink customer statistics towards the global prior (prior_weight pseudo-payments)."""
+        k = self.prior_weight
+        total = count + k
+        blended_mean = (count * mean + k * self.prior_mean) / total
+        blended_var = (m2 + k * self.prior_var) / total
+        return blended_mean, np.sqrt(blended_var)
+
+    def score_and_update(self, customer_ids, values, update=True):
+        """
+        Absolute z-scores of each payment against its customer's baseline.
+
+        Parameters:
+        -----------
+        customer_ids : sequence
+            Customer id per payment
+        values : np.ndarray, shape (n, 2)
+            Payment amount and delay (days); NaN and infinite values score 0 and are not learned
+        update : bool
+            Fold the payments into the per-customer state afterwards (otherwise
+            the store, including its set of customers, is left unchanged)
+
+        Returns:
+        --------
+        np.ndarray, shape (n, 2) : |z| for amount and delay
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_payments = len(values)
+        rows = self._rows_for(customer_ids, register=update)
+        valid = np.isfinite(values)
+        filled = np.where(valid, values, 0.0)
+
+        # Group the batch by customer, keeping input order within a customer
+        order = np.argsort(rows, kind='stable')
+        sorted_rows = rows[order]
+        group_start = np.ones(n_payments, dtype=bool)
+        group_start[1:] = sorted_rows[1:] != sorted_rows[:-1]
+        group_id = np.cumsum(group_start) - 1
+        first_position = np.flatnonzero(group_start)
+
+        # Per-metric exclusive prefix sums within each customer's group
+        def exclusive_prefix(x):
+            inclusive = np.cumsum(x, axis=0)
+            before_group = (inclusive[first_position] - x[first_position])[group_id]
+            return inclusive - x - before_group
+
+        v = filled[order]
+        w = valid[order].astype(np.float64)
+
+        # Shift each customer's values by their first valid value in the batch, so the
+        # sums of squares below are of small deviations (no catastrophic cancellation)
+        shift = np.zeros((len(first_position), values.shape[1]))
+        for metric in range(values.shape[1]):
+            positions = np.flatnonzero(w[:, metric] > 0)
+            groups, first = np.unique(group_id[positions], return_index=True)
+            shift[groups, metric] = v[positions[first], metric]
+        d = np.where(w > 0, v - shift[group_id], 0.0)
+
+        prefix_count = exclusive_prefix(w)
+        prefix_sum = exclusive_prefix(d)
+        prefix_sq = exclusive_prefix(d * d)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            prefix_mean = np.where(prefix_count > 0, shift[group_id] + prefix_sum / prefix_count, 0.0)
+            prefix_m2 = np.where(prefix_count > 0, np.maximum(prefix_sq - prefix_sum ** 2 / prefix_count, 0.0), 0.0)
+
+        # Combine stored state with the in-batch prefix (Chan et al. parallel update)
+        state_count = self._state(self.count, sorted_rows)
+        state_mean = self._state(self.mean, sorted_rows)
+        state_m2 = self._state(self.m2, sorted_rows)
+        count = state_count + prefix_count
+        delta = prefix_mean - state_mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(count > 0, prefix_count / count, 0.0)
+        mean = state_mean + delta * share
+        m2 = state_m2 + prefix_m2 + delta ** 2 * state_count * share
+
+        # Blend with the global prior per metric and score
+        blended_mean, blended_std = self._blend(count, mean, m2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_sorted = np.where(blended_std > 0, np.abs(v - blended_mean) / blended_std, 0.0)
+        z_sorted[~valid[order]] = 0.0
+
+        zscores = np.empty_like(z_sorted)
+        zscores[order] = z_sorted
+
+        if update:
+            # Fold the whole batch into state: prefix through the last payment of each group
+            last_position = np.append(first_position[1:], n_payments) - 1
+            batch_count = prefix_count[last_position] + w[last_position]
+            batch_sum = prefix_sum[last_position] + d[last_position]
+            batch_sq = prefix_sq[last_position] + (d * d)[last_position]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                batch_mean = np.where(batch_count > 0, shift + batch_sum / batch_count, 0.0)
+                batch_m2 = np.where(batch_count > 0, np.maximum(batch_sq - batch_sum ** 2 / batch_count, 0.0), 0.0)
+
+            group_rows = sorted_rows[first_position]
+            old_count = self.count[group_rows]
+            old_mean = self.mean[group_rows]
+            old_m2 = self.m2[group_rows]
+            new_count = old_count + batch_count
+            delta = batch_mean - old_mean
+            with np.errstate(invalid='ignore', divide='ignore'):
+                share = np.where(new_count > 0, batch_count / new_count, 0.0)
+            self.mean[group_rows] = old_mean + delta * share
+            self.m2[group_rows] = old_m2 + batch_m2 + delta ** 2 * old_count * share
+            self.count[group_rows] = new_count
+
+        return zscores
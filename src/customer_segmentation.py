@@ -7,6 +7,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
 from sklearn.metrics import silhouette_score
+from artifact_store import write_artifact
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -144,7 +145,8 @@ print(f"\nSaved segment heatmap to {output_dir}/segment_heatmap.png")
 
 # Save segmented customer data
 customer_features.to_csv(os.path.join(data_dir, 'customer_segments.csv'), index=False)
-print(f"\nSegmented customer data saved to {data_dir}/customer_segments.csv")
+write_artifact(customer_features, 'customer_segments')
+print(f"\nSegmented customer data saved to {data_dir}/customer_segments.csv (and .parquet for the dashboard)")
 
 # Create summary report
 print("\n" + "="*80)
@@ -5,6 +5,15 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
+import time
+import tempfile
+from risk_tracker import TopKRiskTracker, high_risk_report_path, REPORT_COLUMNS
+from artifact_store import (read_artifact, read_artifact_rows, artifact_version, artifact_row_count,
+                            artifact_sort_index, iter_artifact_frames)
+from report_export import EXPORT_FORMATS, export_artifact, export_report, write_report
+from build_dashboard_cubes import (build_cubes, load_cube_inputs, slice_mean,
+                                   CUSTOMER_CUBE, TRANSACTION_CUBE, CUSTOMER_FRAUD_RISK, RISK_HISTOGRAM)
+from chart_summaries import histogram_bins, box_stats, density_cells, value_range
 
 # Page configuration
 st.set_page_config(
@@ -36,46 +45,313 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Get data directory
+# Get data and output directories
 script_dir = os.path.dirname(os.path.abspath(__file__))
 data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
+
+# Columns each page reads (the artifacts carry many more)
+SEGMENT_COLUMNS = [
+    'customer_id', 'segment', 'pca_1', 'pca_2', 'order_id_nunique', 'payment_id_count', 'amount_sum',
+    'amount_mean', 'payment_delay_days_mean', 'recency_days', 'payment_frequency', 'preferred_method'
+]
+ANOMALY_COLUMNS = [
+    'customer_id', 'is_anomaly', 'anomaly_consensus', 'anomaly_score_iso_forest', 'amount_sum',
+    'payment_delay_days_mean', 'payment_id_count', 'recency_days'
+]
+CUBE_INPUTS = ['customer_segments', 'customer_anomaly_detection', 'transaction_fraud_detection']
+
+# PCA maps: SVG markers up to the first threshold, WebGL markers up to the second,
+# a per-segment density layer (DENSITY_BINS x DENSITY_BINS cells) beyond it
+SCATTER_WEBGL_THRESHOLD = 20_000
+SCATTER_DENSITY_THRESHOLD = 200_000
+DENSITY_BINS = 80
+
+# Rows per page of the paginated tables
+TABLE_PAGE_SIZE = 50
+
+# Customers scored per chunk in the predictor's bulk upload
+BULK_CHUNK_SIZE = 50_000
 
 # Load data
+def load_artifact(name, columns=None, filters=None):
+    """
+    Columns/rows of a pipeline artifact (Parquet preferred, CSV fallback), or None if missing.
+
+    Cached per artifact version, so new pipeline output shows up without
+    restarting the server.
+    """
+    version = artifact_version(name)
+    if version is None:
+        return None
+    return _read_artifact(name, None if columns is None else tuple(columns),
+                          None if filters is None else tuple(filters), version)
+
 @st.cache_data
-def load_data():
-    # Load segmented customers (those with payment data)
-    customer_segments = pd.read_csv(os.path.join(data_dir, 'customer_segments.csv'))
-    
-    # Convert date columns with error handling
-    date_columns = ['payment_date_min', 'payment_date_max', 'reg_date_first']
-    for col in date_columns:
-        if col in customer_segments.columns:
-            customer_segments[col] = pd.to_datetime(customer_segments[col], errors='coerce')
-    
-    # Load customer summary (all customers)
-    try:
-        customer_summary = pd.read_csv(os.path.join(data_dir, 'customer_summary.csv'))
-        customer_summary['reg_date'] = pd.to_datetime(customer_summary['reg_date'], errors='coerce')
-    except:
-        customer_summary = None
-    
-    return customer_segments, customer_summary
+def _read_artifact(name, columns, filters, version):
+    # version (path, size, mtime) is part of the cache key
+    return read_artifact(name, None if columns is None else list(columns),
+                         None if filters is None else list(filters))
+
+def load_segments(segments, columns=SEGMENT_COLUMNS):
+    """Segmented customers of the given segments (filtered while reading)."""
+    return load_artifact('customer_segments', columns, [('segment', 'in', tuple(segments))])
+
+def load_cubes():
+    """
+    Customer cube, transaction cube, per-customer average fraud risk and fraud
+    risk histogram (see build_dashboard_cubes).
+
+    Uses the cubes materialized by the pipeline while they are at least as
+    new as the outputs they summarize; otherwise builds them from the
+    row-level outputs, once per version of those outputs.
+    """
+    input_versions = tuple(artifact_version(name) for name in CUBE_INPUTS)
+    if input_versions[0] is None:
+        return None, None, None, None
+    newest_input = max(version[2] for version in input_versions if version is not None)
+    cube_names = [CUSTOMER_CUBE, TRANSACTION_CUBE, CUSTOMER_FRAUD_RISK, RISK_HISTOGRAM]
+    cube_versions = [artifact_version(name) for name in cube_names]
+    if all(version is not None and version[2] >= newest_input for version in cube_versions):
+        return tuple(load_artifact(name) for name in cube_names)
+    return _build_cubes(input_versions)
 
 @st.cache_data
-def load_anomaly_data():
-    try:
-        customer_anomaly = pd.read_csv(os.path.join(data_dir, 'customer_anomaly_detection.csv'))
-        transaction_fraud = pd.read_csv(os.path.join(data_dir, 'transaction_fraud_detection.csv'))
-        
-        # Convert date columns with error handling
-        if 'order_date' in transaction_fraud.columns:
-            transaction_fraud['order_date'] = pd.to_datetime(transaction_fraud['order_date'], errors='coerce')
-        if 'payment_date' in transaction_fraud.columns:
-            transaction_fraud['payment_date'] = pd.to_datetime(transaction_fraud['payment_date'], errors='coerce')
-        
-        return customer_anomaly, transaction_fraud
-    except Exception as e:
-        return None, None
+def _build_cubes(input_versions):
+    # input_versions is the cache key
+    return build_cubes(*load_cube_inputs())
+
+def load_histogram(name, column, bins=30, value_range=None):
+    """Histogram (bin_left, bin_right, count) of an artifact column, binned server-side; None if missing."""
+    version = artifact_version(name)
+    return None if version is None else _histogram(name, column, bins, value_range, version)
+
+@st.cache_data
+def _histogram(name, column, bins, value_range, version):
+    # Only the bin counts reach the browser, not the raw values
+    return histogram_bins(read_artifact(name, [column])[column], bins, value_range)
+
+def load_box_stats(name, column, group_column):
+    """Box plot statistics of an artifact column per value of group_column; None if missing."""
+    version = artifact_version(name)
+    return None if version is None else _box_stats(name, column, group_column, version)
+
+@st.cache_data
+def _box_stats(name, column, group_column, version):
+    df = read_artifact(name, [column, group_column])
+    return {group: box_stats(values) for group, values in df.groupby(group_column)[column]}
+
+def load_sort_index(name, column, ascending=True, filters=None):
+    """Row positions of an artifact sorted by column (see artifact_sort_index); None if missing."""
+    version = artifact_version(name)
+    if version is None:
+        return None
+    return _sort_index(name, column, ascending, None if filters is None else tuple(filters), version)
+
+@st.cache_data(max_entries=32)
+def _sort_index(name, column, ascending, filters, version):
+    # Built once per artifact version, sort and filter set from just those columns
+    return artifact_sort_index(name, column, ascending, None if filters is None else list(filters))
+
+def load_combined_order(selected_segments):
+    """
+    Row positions of the customer_segments artifact (selected segments only), most suspicious
+    customer (lowest Isolation Forest anomaly score) first; None if an artifact is missing.
+    """
+    versions = (artifact_version('customer_segments'), artifact_version('customer_anomaly_detection'))
+    if None in versions:
+        return None
+    return _combined_order(tuple(selected_segments), versions)
+
+@st.cache_data(max_entries=32)
+def _combined_order(segments, versions):
+    # Built once per artifact versions and segment selection, from three columns
+    segment_rows = read_artifact('customer_segments', ['customer_id', 'segment'])
+    scores = read_artifact('customer_anomaly_detection', ['customer_id', 'anomaly_score_iso_forest'])
+    positions = np.flatnonzero(segment_rows['segment'].isin(segments).to_numpy())
+    score = segment_rows['customer_id'].iloc[positions].map(
+        scores.drop_duplicates('customer_id').set_index('customer_id')['anomaly_score_iso_forest'])
+    order = score.reset_index(drop=True).sort_values(kind='stable', na_position='last').index.to_numpy()
+    return positions[order]
+
+def page_bounds(total, key, page_size=TABLE_PAGE_SIZE):
+    """Page selector for a table of total rows; returns the (start, stop) rows of the selected page."""
+    pages = max(1, -(-total // page_size))
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (page - 1) * page_size
+    stop = min(start + page_size, total)
+    with col2:
+        st.caption(f"Rows {start + 1:,}-{stop:,} of {total:,} ({pages:,} pages)" if total > 0 else "No matching rows")
+    return start, stop
+
+def paged_table(name, columns, sort_options, filters=None, key='table', format_page=None):
+    """
+    Artifact table shown one page at a time.
+
+    sort_options maps a label to (column, ascending); filters are read_artifact
+    filters. Only the visible page's rows are read and sent to the browser,
+    located through the cached sort index. format_page, if given, is applied
+    to the page before it is shown (e.g. to add display columns).
+    """
+    sort_label = st.selectbox("Sort by", list(sort_options), key=f'{key}_sort')
+    column, ascending = sort_options[sort_label]
+    positions = load_sort_index(name, column, ascending, filters)
+    if positions is None:
+        st.info("Data not available.")
+        return
+    # Changing the sort or the filters starts again from page 1
+    start, stop = page_bounds(len(positions), key=f'{key}_page_{sort_label}_{filters}')
+    page = read_artifact_rows(name, positions[start:stop], columns)
+    if format_page is not None:
+        page = format_page(page)
+    st.dataframe(page, use_container_width=True, hide_index=True)
+
+def report_download(label, file_stem, export, key):
+    """
+    Format choice and download button for a report.
+
+    export(fmt) writes the report file (see report_export) and returns its
+    path, or returns the report bytes directly. It only runs when the button is clicked, on Streamlit's download
+    thread, so reruns never build the report and the click does not rerun the page.
+    """
+    fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key=f'{key}_format')
+    st.download_button(
+        label=label,
+        data=lambda: _report_data(export(fmt)),
+        file_name=f'{file_stem}.{fmt}',
+        mime=EXPORT_FORMATS[fmt][1],
+        on_click='ignore',
+        key=key
+    )
+
+def _report_data(report):
+    if isinstance(report, bytes):
+        return report
+    with open(report, 'rb') as f:
+        return f.read()
+
+def histogram_figure(histogram, title, x_label, y_label, color):
+    """Bar trace of a pre-binned histogram: one bar per bin instead of one value per row."""
+    fig = go.Figure(go.Bar(
+        x=(histogram['bin_left'] + histogram['bin_right']) / 2,
+        y=histogram['count'],
+        width=histogram['bin_right'] - histogram['bin_left'],
+        marker_color=color
+    ))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label, bargap=0.05)
+    return fig
+
+def box_trace(stats, name, color):
+    """Box from precomputed statistics (no per-row points are sent)."""
+    return go.Box(
+        x=[name], name=name, marker_color=color,
+        q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+        lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']], mean=[stats['mean']]
+    )
+
+def _point_trace(rows, name, hover_data, marker):
+    """WebGL markers for individual customers, with hover_data columns in the tooltip."""
+    hover = '<br>'.join(f'{column}: %{{customdata[{i}]}}' for i, column in enumerate(hover_data))
+    return go.Scattergl(
+        x=rows['pca_1'], y=rows['pca_2'], mode='markers', name=name, marker=marker,
+        customdata=rows[hover_data].to_numpy(), hovertemplate=f'<b>{name}</b><br>{hover}<extra></extra>'
+    )
+
+def segment_map(df, title, hover_data, available_segments, symbol=None, overlay=None, highlight=None):
+    """
+    PCA map of customers coloured by segment, drawn to suit the number of customers.
+
+    Up to SCATTER_WEBGL_THRESHOLD customers are SVG markers and up to
+    SCATTER_DENSITY_THRESHOLD WebGL markers. Beyond that each segment is a
+    density layer (one marker per non-empty grid cell, sized by its customer
+    count) and only the overlay rows (e.g. anomalous customers) are drawn as
+    points. highlight rows (customers looked up by ID) are always drawn on top.
+    """
+    labels = {'pca_1': 'Principal Component 1', 'pca_2': 'Principal Component 2'}
+    if len(df) <= SCATTER_DENSITY_THRESHOLD:
+        fig = px.scatter(
+            df,
+            x='pca_1',
+            y='pca_2',
+            color='segment_name',
+            symbol=symbol,
+            title=title,
+            labels=labels,
+            color_discrete_map={SEGMENT_INFO[seg]['name']: SEGMENT_INFO[seg]['color'] for seg in available_segments},
+            hover_data=hover_data,
+            render_mode='svg' if len(df) <= SCATTER_WEBGL_THRESHOLD else 'webgl'
+        )
+        fig.update_traces(marker=dict(size=10, opacity=0.7, line=dict(width=1, color='white')))
+    else:
+        fig = go.Figure()
+        # Same grid for every segment so their cells line up
+        x_range, y_range = value_range(df['pca_1']), value_range(df['pca_2'])
+        for seg, seg_df in df.groupby('segment'):
+            cells = density_cells(seg_df['pca_1'], seg_df['pca_2'], DENSITY_BINS, x_range, y_range)
+            name = SEGMENT_INFO[seg]['name']
+            fig.add_trace(go.Scattergl(
+                x=cells['x'], y=cells['y'], mode='markers', name=name,
+                marker=dict(color=SEGMENT_INFO[seg]['color'], opacity=0.5,
+                            size=4 + 12 * np.sqrt(cells['count'] / cells['count'].max())),
+                customdata=cells['count'], hovertemplate=f'<b>{name}</b><br>%{{customdata}} customers<extra></extra>'
+            ))
+        if overlay is not None and len(overlay) > 0:
+            fig.add_trace(_point_trace(overlay, '🔴 Anomalous', hover_data,
+                                       dict(size=7, color='red', symbol='diamond', line=dict(width=1, color='white'))))
+        fig.update_layout(title=title, xaxis_title=labels['pca_1'], yaxis_title=labels['pca_2'])
+    if highlight is not None and len(highlight) > 0:
+        fig.add_trace(_point_trace(highlight, 'Looked up', hover_data,
+                                   dict(size=16, color='black', symbol='star', line=dict(width=1, color='white'))))
+    return fig
+
+def customer_lookup(df, hover_data, key):
+    """
+    Customer ID search for density maps, where single customers have no hover
+    tooltip; shows the matching rows and returns them for segment_map(highlight=...).
+    """
+    if len(df) <= SCATTER_DENSITY_THRESHOLD:
+        return None
+    st.caption(f"{len(df):,} customers are drawn as density cells; look up customers to see their details.")
+    query = st.text_input("Look up customer IDs (comma-separated)", key=key)
+    ids = [customer_id.strip() for customer_id in query.split(',') if customer_id.strip()]
+    if not ids:
+        return None
+    found = df[df['customer_id'].astype(str).isin(ids)]
+    st.dataframe(found[['pca_1', 'pca_2'] + hover_data], use_container_width=True, hide_index=True)
+    return found
+
+def show_chart(fig):
+    """Render a Plotly figure and add its serialized size to this page's payload total."""
+    st.session_state['chart_payload_bytes'] = st.session_state.get('chart_payload_bytes', 0) + len(fig.to_json())
+    st.session_state['chart_count'] = st.session_state.get('chart_count', 0) + 1
+    st.plotly_chart(fig, use_container_width=True)
+
+def report_chart_payload():
+    """Sidebar note of how much chart data this run sent to the browser."""
+    payload_kb = st.session_state.get('chart_payload_bytes', 0) / 1024
+    st.sidebar.caption(f"Chart payload on this page: {payload_kb:,.1f} KB in {st.session_state.get('chart_count', 0)} charts")
+
+def load_customer_count():
+    """Number of customers in the customer summary (None if it has not been produced)."""
+    version = artifact_version('customer_summary')
+    return None if version is None else _count_artifact_rows('customer_summary', version)
+
+@st.cache_data
+def _count_artifact_rows(name, version):
+    return artifact_row_count(name)
+
+def load_top_risk_transactions(n):
+    """Riskiest transactions from the persisted top-K list (None if it has not been produced yet)"""
+    if not os.path.exists(high_risk_report_path):
+        return None
+    return _read_top_risk_transactions(os.path.getmtime(high_risk_report_path)).head(n)
+
+@st.cache_data
+def _read_top_risk_transactions(mtime):
+    # mtime is part of the cache key, so online scoring updates show up
+    return TopKRiskTracker.load(high_risk_report_path).top
 
 # Segment names and descriptions (based on actual data analysis)
 SEGMENT_INFO = {
@@ -110,10 +386,11 @@ def main():
     st.markdown('<div class="main-header">Customer Payment Behaviour Analysis Dashboard</div>', unsafe_allow_html=True)
     st.markdown("### AI-Powered Customer Insights with Segmentation & Fraud Detection")
     
-    # Load data
+    # Load the aggregate cubes (pages load only the row-level columns they plot)
     try:
-        df, customer_summary = load_data()
-        customer_anomaly, transaction_fraud = load_anomaly_data()
+        customer_cube, transaction_cube, customer_risk, risk_histogram = load_cubes()
+        if customer_cube is None:
+            raise FileNotFoundError(os.path.join(data_dir, 'customer_segments.csv'))
     except Exception as e:
         st.error(f"Error loading data: {e}")
         st.info("Please ensure you have run the segmentation script first.")
@@ -131,7 +408,7 @@ def main():
     st.sidebar.markdown("---")
     
     # Segment filter
-    available_segments = sorted(df['segment'].unique())
+    available_segments = sorted(customer_cube['segment'].unique())
     segment_names = [f"Segment {seg}: {SEGMENT_INFO[seg]['name']}" for seg in available_segments]
     
     selected_segments = st.sidebar.multiselect(
@@ -145,37 +422,43 @@ def main():
         st.warning("Please select at least one segment.")
         return
     
-    filtered_df = df[df['segment'].isin(selected_segments)]
-    
     # Route to different pages
+    st.session_state['chart_payload_bytes'] = 0
+    st.session_state['chart_count'] = 0
+    selected_cube = customer_cube[customer_cube['segment'].isin(selected_segments)]
     if page == "Customer Segmentation":
-        show_segmentation_page(filtered_df, selected_segments, available_segments, customer_summary)
+        filtered_df = load_segments(selected_segments)
+        show_segmentation_page(filtered_df, selected_segments, available_segments, load_customer_count(), selected_cube)
     elif page == "Anomaly & Fraud Detection":
-        show_fraud_detection_page(customer_anomaly, transaction_fraud, df)
+        customer_anomaly = load_artifact('customer_anomaly_detection', ANOMALY_COLUMNS)
+        show_fraud_detection_page(customer_anomaly, customer_cube, transaction_cube, risk_histogram)
     elif page == "Segment Predictor":
         show_prediction_page()
     else:
-        show_combined_analysis_page(filtered_df, customer_anomaly, transaction_fraud, selected_segments, available_segments)
+        filtered_df = load_segments(selected_segments)
+        customer_anomaly = load_artifact('customer_anomaly_detection', ['customer_id', 'is_anomaly', 'anomaly_score_iso_forest'])
+        show_combined_analysis_page(filtered_df, customer_anomaly, customer_risk, selected_segments, available_segments,
+                                    selected_cube)
+    report_chart_payload()
 
-def show_segmentation_page(filtered_df, selected_segments, available_segments, customer_summary):
-    """Original segmentation dashboard"""
+def show_segmentation_page(filtered_df, selected_segments, available_segments, total_customers, segment_cube):
+    """Original segmentation dashboard (totals, means and counts from the customer cube)"""
     # Overview metrics
     st.markdown("---")
     st.subheader("📈 Overview Metrics")
     
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
-        total_customers = len(customer_summary) if customer_summary is not None else len(filtered_df)
-        st.metric("Total Customers", total_customers)
+        st.metric("Total Customers", total_customers if total_customers is not None else int(segment_cube['customers'].sum()))
     with col2:
-        customers_with_payments = len(filtered_df)
+        customers_with_payments = int(segment_cube['customers'].sum())
         st.metric("With Payment Data", customers_with_payments)
     with col3:
-        st.metric("Total Orders", int(filtered_df['order_id_nunique'].sum()))
+        st.metric("Total Orders", int(segment_cube['sum_order_id_nunique'].sum()))
     with col4:
-        st.metric("Total Payments", int(filtered_df['payment_id_count'].sum()))
+        st.metric("Total Payments", int(segment_cube['sum_payment_id_count'].sum()))
     with col5:
-        st.metric("Total Revenue", f"{filtered_df['amount_sum'].sum():,.0f} HUF")
+        st.metric("Total Revenue", f"{segment_cube['sum_amount_sum'].sum():,.0f} HUF")
     
     # Segment distribution
     st.markdown("---")
@@ -185,7 +468,7 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
     
     with col1:
         # Pie chart
-        segment_counts = filtered_df['segment'].value_counts().reset_index()
+        segment_counts = segment_cube.groupby('segment')['customers'].sum().sort_values(ascending=False).reset_index()
         segment_counts.columns = ['segment', 'count']
         segment_counts['name'] = segment_counts['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
         segment_counts['color'] = segment_counts['segment'].map(lambda x: SEGMENT_INFO[x]['color'])
@@ -199,7 +482,7 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
             color_discrete_map={SEGMENT_INFO[seg]['name']: SEGMENT_INFO[seg]['color'] for seg in available_segments}
         )
         fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_pie, use_container_width=True)
+        show_chart(fig_pie)
     
     with col2:
         # Bar chart
@@ -214,7 +497,7 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
         )
         fig_bar.update_traces(textposition='outside')
         fig_bar.update_layout(showlegend=False, xaxis_title='Segment', yaxis_title='Number of Customers')
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_chart(fig_bar)
     
     # PCA visualization
     st.markdown("---")
@@ -222,28 +505,21 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
     
     filtered_df['segment_name'] = filtered_df['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
     
-    fig_pca = px.scatter(
-        filtered_df,
-        x='pca_1',
-        y='pca_2',
-        color='segment_name',
-        title='Customer Segments in 2D Space',
-        labels={'pca_1': 'Principal Component 1', 'pca_2': 'Principal Component 2'},
-        color_discrete_map={SEGMENT_INFO[seg]['name']: SEGMENT_INFO[seg]['color'] for seg in available_segments},
-        hover_data=['customer_id', 'amount_sum', 'payment_id_count', 'payment_delay_days_mean']
-    )
-    fig_pca.update_traces(marker=dict(size=10, opacity=0.7, line=dict(width=1, color='white')))
-    st.plotly_chart(fig_pca, use_container_width=True)
+    hover_data = ['customer_id', 'amount_sum', 'payment_id_count', 'payment_delay_days_mean']
+    looked_up = customer_lookup(filtered_df, hover_data, key='segment_map_lookup')
+    fig_pca = segment_map(filtered_df, 'Customer Segments in 2D Space', hover_data, available_segments,
+                          highlight=looked_up)
+    show_chart(fig_pca)
     
     # Segment profiles
     st.markdown("---")
     st.subheader("📊 Detailed Segment Profiles")
     
     for segment in selected_segments:
-        segment_data = filtered_df[filtered_df['segment'] == segment]
+        segment_data = segment_cube[segment_cube['segment'] == segment]
         info = SEGMENT_INFO[segment]
         
-        with st.expander(f"**Segment {segment}: {info['name']}** ({len(segment_data)} customers)", expanded=True):
+        with st.expander(f"**Segment {segment}: {info['name']}** ({int(segment_data['customers'].sum())} customers)", expanded=True):
             st.markdown(f"<div class='segment-card'>", unsafe_allow_html=True)
             
             # Description and recommendation
@@ -258,15 +534,15 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
             # Key metrics
             col1, col2, col3, col4, col5 = st.columns(5)
             with col1:
-                st.metric("Avg Orders", f"{segment_data['order_id_nunique'].mean():.2f}")
+                st.metric("Avg Orders", f"{slice_mean(segment_data, 'order_id_nunique'):.2f}")
             with col2:
-                st.metric("Avg Payments", f"{segment_data['payment_id_count'].mean():.2f}")
+                st.metric("Avg Payments", f"{slice_mean(segment_data, 'payment_id_count'):.2f}")
             with col3:
-                st.metric("Avg Revenue", f"{segment_data['amount_sum'].mean():.0f} HUF")
+                st.metric("Avg Revenue", f"{slice_mean(segment_data, 'amount_sum'):.0f} HUF")
             with col4:
-                st.metric("Avg Delay", f"{segment_data['payment_delay_days_mean'].mean():.1f} days")
+                st.metric("Avg Delay", f"{slice_mean(segment_data, 'payment_delay_days_mean'):.1f} days")
             with col5:
-                st.metric("Avg Recency", f"{segment_data['recency_days'].mean():.0f} days")
+                st.metric("Avg Recency", f"{slice_mean(segment_data, 'recency_days'):.0f} days")
             
             st.markdown("</div>", unsafe_allow_html=True)
     
@@ -307,17 +583,15 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
         )
         
         for idx, feature in enumerate(selected_features, 1):
-            segment_means = filtered_df.groupby('segment')[feature].mean().reset_index()
-            segment_means['name'] = segment_means['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
-            segment_means['color'] = segment_means['segment'].map(lambda x: SEGMENT_INFO[x]['color'])
+            segment_means = slice_mean(segment_cube, feature, by='segment')
             
-            for _, row in segment_means.iterrows():
+            for segment, value in segment_means.items():
                 fig.add_trace(
                     go.Bar(
-                        x=[row['name']],
-                        y=[row[feature]],
-                        name=row['name'],
-                        marker_color=row['color'],
+                        x=[SEGMENT_INFO[segment]['name']],
+                        y=[value],
+                        name=SEGMENT_INFO[segment]['name'],
+                        marker_color=SEGMENT_INFO[segment]['color'],
                         showlegend=(idx == 1)
                     ),
                     row=idx,
@@ -325,13 +599,13 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
                 )
         
         fig.update_layout(height=300 * len(selected_features), showlegend=True)
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
     
     # Payment method distribution
     st.markdown("---")
     st.subheader("💳 Payment Method Distribution by Segment")
     
-    method_dist = filtered_df.groupby(['segment', 'preferred_method']).size().reset_index(name='count')
+    method_dist = segment_cube.groupby(['segment', 'preferred_method'])['customers'].sum().reset_index(name='count')
     method_dist['segment_name'] = method_dist['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
     
     fig_method = px.bar(
@@ -343,7 +617,7 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
         labels={'segment_name': 'Segment', 'count': 'Number of Customers', 'preferred_method': 'Payment Method'},
         barmode='group'
     )
-    st.plotly_chart(fig_method, use_container_width=True)
+    show_chart(fig_method)
     
     # Raw data viewer
     st.markdown("---")
@@ -357,23 +631,29 @@ def show_segmentation_page(filtered_df, selected_segments, available_segments, c
             'recency_days', 'preferred_method'
         ]
         
-        st.dataframe(
-            filtered_df[display_columns].sort_values('segment'),
-            use_container_width=True
+        paged_table(
+            'customer_segments',
+            [column for column in display_columns if column != 'segment_name'],
+            {'Segment': ('segment', True), 'Total spend (highest first)': ('amount_sum', False),
+             'Avg payment delay (longest first)': ('payment_delay_days_mean', False),
+             'Recency (most recent first)': ('recency_days', True)},
+            filters=[('segment', 'in', list(selected_segments))],
+            key='raw_customers',
+            format_page=lambda page: page.assign(segment_name=page['segment'].map(lambda x: SEGMENT_INFO[x]['name']))
+                                         [display_columns]
         )
         
-        # Download button
-        csv = filtered_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download Segmented Data as CSV",
-            data=csv,
-            file_name="customer_segments.csv",
-            mime="text/csv"
+        # Download button (all columns of the selected segments)
+        report_download(
+            "📥 Download Segmented Data",
+            "customer_segments",
+            lambda fmt: export_artifact('customer_segments', fmt, filters=[('segment', 'in', list(selected_segments))]),
+            key='download_segments'
         )
 
-def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
-    """Fraud detection and anomaly analysis page"""
-    if customer_anomaly is None or transaction_fraud is None:
+def show_fraud_detection_page(customer_anomaly, customer_cube, transaction_cube, risk_histogram):
+    """Fraud detection and anomaly analysis page (counts from the cubes, distributions binned server-side)"""
+    if customer_anomaly is None or transaction_cube is None:
         st.error("❌ Anomaly and fraud detection data not found!")
         st.info("Please run the `anomaly_fraud_detection.py` script first to generate the required data.")
         return
@@ -385,19 +665,22 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
     col1, col2, col3, col4 = st.columns(4)
     
     anomalous_customers = customer_anomaly[customer_anomaly['is_anomaly'] == True]
-    fraudulent_txns = transaction_fraud[transaction_fraud['fraud_prediction'] == -1]
-    high_risk_txns = transaction_fraud[transaction_fraud['fraud_risk_score'] > 70]
+    total_customers = int(customer_cube['customers'].sum())
+    anomalous_count = int(customer_cube.loc[customer_cube['is_anomaly'], 'customers'].sum())
+    total_txns = int(transaction_cube['transactions'].sum())
+    fraudulent_count = int(transaction_cube.loc[transaction_cube['fraud_prediction'] == -1, 'transactions'].sum())
+    high_risk_count = int(transaction_cube.loc[transaction_cube['is_high_risk'], 'transactions'].sum())
     
     with col1:
-        st.metric("Total Customers", len(customer_anomaly))
+        st.metric("Total Customers", total_customers)
     with col2:
-        st.metric("Anomalous Customers", len(anomalous_customers), 
-                 delta=f"{len(anomalous_customers)/len(customer_anomaly)*100:.1f}%")
+        st.metric("Anomalous Customers", anomalous_count, 
+                 delta=f"{anomalous_count/total_customers*100:.1f}%")
     with col3:
-        st.metric("Fraudulent Transactions", len(fraudulent_txns),
-                 delta=f"{len(fraudulent_txns)/len(transaction_fraud)*100:.1f}%")
+        st.metric("Fraudulent Transactions", fraudulent_count,
+                 delta=f"{fraudulent_count/total_txns*100:.1f}%")
     with col4:
-        st.metric("High-Risk Transactions", len(high_risk_txns))
+        st.metric("High-Risk Transactions", high_risk_count)
     
     # Anomaly Detection Details
     st.markdown("---")
@@ -407,7 +690,7 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
     
     with col1:
         # Anomaly consensus distribution
-        consensus_counts = customer_anomaly['anomaly_consensus'].value_counts().sort_index()
+        consensus_counts = customer_cube.groupby('anomaly_consensus')['customers'].sum().sort_index()
         
         # Create color mapping: green for 0, yellow for 1, orange for 2, red for 3
         colors = ['#27ae60', '#f39c12', '#e67e22', '#e74c3c']
@@ -428,34 +711,39 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
             yaxis_title='Number of Customers',
             showlegend=False
         )
-        st.plotly_chart(fig_consensus, use_container_width=True)
+        show_chart(fig_consensus)
     
     with col2:
         # Anomaly score distribution
-        fig_scores = px.histogram(
-            customer_anomaly,
-            x='anomaly_score_iso_forest',
-            nbins=30,
+        fig_scores = histogram_figure(
+            load_histogram('customer_anomaly_detection', 'anomaly_score_iso_forest', bins=30),
             title='Isolation Forest Anomaly Score Distribution',
-            labels={'anomaly_score_iso_forest': 'Anomaly Score', 'count': 'Frequency'},
-            color_discrete_sequence=['#3498db']
+            x_label='Anomaly Score',
+            y_label='Frequency',
+            color='#3498db'
         )
         # Add threshold line
         if len(anomalous_customers) > 0:
             threshold = anomalous_customers['anomaly_score_iso_forest'].max()
             fig_scores.add_vline(x=threshold, line_dash="dash", line_color="red",
                                annotation_text="Anomaly Threshold")
-        st.plotly_chart(fig_scores, use_container_width=True)
+        show_chart(fig_scores)
     
     # Top anomalous customers
     if len(anomalous_customers) > 0:
-        st.markdown("#### 🔴 Top 10 Most Anomalous Customers (by Isolation Forest Score)")
+        st.markdown("#### 🔴 Most Anomalous Customers (by Isolation Forest Score)")
         st.info("ℹ️ 'is_anomaly' = True only if flagged by 2+ detection methods (consensus approach to reduce false positives)")
-        top_anomalies = customer_anomaly.nsmallest(10, 'anomaly_score_iso_forest')[
-            ['customer_id', 'amount_sum', 'payment_delay_days_mean', 'payment_id_count', 
-             'anomaly_score_iso_forest', 'anomaly_consensus', 'is_anomaly']
-        ]
-        st.dataframe(top_anomalies, use_container_width=True)
+        only_flagged = st.checkbox("Only customers flagged as anomalous", value=False, key='anomalies_flagged')
+        paged_table(
+            'customer_anomaly_detection',
+            ['customer_id', 'amount_sum', 'payment_delay_days_mean', 'payment_id_count',
+             'anomaly_score_iso_forest', 'anomaly_consensus', 'is_anomaly'],
+            {'Isolation Forest score (most anomalous first)': ('anomaly_score_iso_forest', True),
+             'Detector consensus (highest first)': ('anomaly_consensus', False),
+             'Total amount (highest first)': ('amount_sum', False)},
+            filters=[('is_anomaly', '==', True)] if only_flagged else None,
+            key='anomalies'
+        )
     
     # Transaction Fraud Detection
     st.markdown("---")
@@ -465,22 +753,22 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
     
     with col1:
         # Fraud risk score distribution
-        fig_fraud = px.histogram(
-            transaction_fraud,
-            x='fraud_risk_score',
-            nbins=30,
+        fig_fraud = histogram_figure(
+            risk_histogram,
             title='Transaction Fraud Risk Score Distribution',
-            labels={'fraud_risk_score': 'Fraud Risk Score (0-100)', 'count': 'Number of Transactions'},
-            color_discrete_sequence=['#e74c3c']
+            x_label='Fraud Risk Score (0-100)',
+            y_label='Number of Transactions',
+            color='#e74c3c'
         )
         fig_fraud.add_vline(x=70, line_dash="dash", line_color="darkred",
                            annotation_text="High Risk Threshold")
-        st.plotly_chart(fig_fraud, use_container_width=True)
+        show_chart(fig_fraud)
     
     with col2:
         # Fraud by payment method
-        fraud_method = transaction_fraud[transaction_fraud['fraud_prediction'] == -1]['method'].value_counts()
-        normal_method = transaction_fraud[transaction_fraud['fraud_prediction'] == 1]['method'].value_counts()
+        method_counts = transaction_cube.groupby(['fraud_prediction', 'method'])['transactions'].sum()
+        fraud_method = method_counts.get(-1, pd.Series(dtype=int)).sort_values(ascending=False)
+        normal_method = method_counts.get(1, pd.Series(dtype=int)).sort_values(ascending=False)
         
         fig_method = go.Figure()
         fig_method.add_trace(go.Bar(name='Fraudulent', x=fraud_method.index, y=fraud_method.values, 
@@ -493,15 +781,40 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
             yaxis_title='Number of Transactions',
             barmode='group'
         )
-        st.plotly_chart(fig_method, use_container_width=True)
+        show_chart(fig_method)
     
-    # Top fraudulent transactions
+    # Top fraudulent transactions (persisted top-K list, one per customer)
     st.markdown("#### 🚨 Top 10 Most Suspicious Transactions")
-    top_fraud = transaction_fraud.nlargest(10, 'fraud_risk_score')[
-        ['payment_id', 'customer_id', 'order_id', 'amount', 'payment_delay_days', 
-         'fraud_risk_score', 'method', 'fraud_prediction']
-    ]
-    st.dataframe(top_fraud, use_container_width=True)
+    top_fraud = load_top_risk_transactions(10)
+    if top_fraud is None:
+        positions = load_sort_index('transaction_fraud_detection', 'fraud_risk_score', ascending=False,
+                                    filters=[('fraud_risk_score', '>', 70)])
+        if positions is not None:
+            top_fraud = read_artifact_rows('transaction_fraud_detection', positions[:10], REPORT_COLUMNS)
+    if top_fraud is None:
+        st.info("Data not available.")
+    else:
+        st.dataframe(top_fraud, use_container_width=True)
+    
+    # All flagged transactions, browsed a page at a time
+    st.markdown("#### 🔎 Browse Flagged Transactions")
+    col1, col2 = st.columns(2)
+    with col1:
+        min_risk = st.slider("Minimum fraud risk score", 0, 100, 70, key='flagged_min_risk')
+    with col2:
+        methods = st.multiselect("Payment methods", sorted(transaction_cube['method'].unique()), key='flagged_methods')
+    transaction_filters = [('fraud_risk_score', '>', min_risk)]
+    if methods:
+        transaction_filters.append(('method', 'in', methods))
+    paged_table(
+        'transaction_fraud_detection',
+        REPORT_COLUMNS + ['payment_date'],
+        {'Fraud risk (highest first)': ('fraud_risk_score', False),
+         'Amount (highest first)': ('amount', False),
+         'Payment date (latest first)': ('payment_date', False)},
+        filters=transaction_filters,
+        key='flagged_transactions'
+    )
     
     # Comparison charts
     st.markdown("---")
@@ -520,19 +833,10 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
     
     fig_compare = go.Figure()
     
-    normal_customers = customer_anomaly[customer_anomaly['is_anomaly'] == False]
-    
-    fig_compare.add_trace(go.Box(
-        y=normal_customers[selected_feature],
-        name='Normal',
-        marker_color='lightblue'
-    ))
-    
-    fig_compare.add_trace(go.Box(
-        y=anomalous_customers[selected_feature],
-        name='Anomalous',
-        marker_color='lightcoral'
-    ))
+    group_stats = load_box_stats('customer_anomaly_detection', selected_feature, 'is_anomaly')
+    for is_anomaly, name, color in ((False, 'Normal', 'lightblue'), (True, 'Anomalous', 'lightcoral')):
+        if group_stats.get(is_anomaly) is not None:
+            fig_compare.add_trace(box_trace(group_stats[is_anomaly], name, color))
     
     fig_compare.update_layout(
         title=f'{feature_labels[selected_feature]}: Normal vs Anomalous Customers',
@@ -540,7 +844,7 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
         showlegend=True
     )
     
-    st.plotly_chart(fig_compare, use_container_width=True)
+    show_chart(fig_compare)
     
     # Download options
     st.markdown("---")
@@ -550,61 +854,64 @@ def show_fraud_detection_page(customer_anomaly, transaction_fraud, df):
     
     with col1:
         if len(anomalous_customers) > 0:
-            csv_anomaly = anomalous_customers.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download Anomalous Customers Report",
-                data=csv_anomaly,
-                file_name="anomalous_customers.csv",
-                mime="text/csv"
+            # Full rows, streamed with the filter pushed down to the file
+            report_download(
+                "Download Anomalous Customers Report",
+                "anomalous_customers",
+                lambda fmt: export_artifact('customer_anomaly_detection', fmt, filters=[('is_anomaly', '==', True)]),
+                key='download_anomalies'
             )
     
     with col2:
-        if len(high_risk_txns) > 0:
-            csv_fraud = high_risk_txns.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download High-Risk Transactions Report",
-                data=csv_fraud,
-                file_name="high_risk_transactions.csv",
-                mime="text/csv"
+        if high_risk_count > 0:
+            report_download(
+                "Download High-Risk Transactions Report",
+                "high_risk_transactions",
+                lambda fmt: export_artifact('transaction_fraud_detection', fmt, filters=[('fraud_risk_score', '>', 70)]),
+                key='download_high_risk'
             )
 
-def show_combined_analysis_page(filtered_df, customer_anomaly, transaction_fraud, selected_segments, available_segments):
-    """Combined view showing segments with anomaly/fraud overlay"""
-    if customer_anomaly is None or transaction_fraud is None:
+def combine_customers(segment_rows, customer_anomaly, customer_risk):
+    """Segment rows with their anomaly flag/score, average fraud risk, segment name and status."""
+    combined_df = segment_rows.merge(
+        customer_anomaly[['customer_id', 'is_anomaly', 'anomaly_score_iso_forest']],
+        on='customer_id',
+        how='left'
+    )
+    combined_df['is_anomaly'] = combined_df['is_anomaly'].fillna(False)
+    
+    # Average fraud risk per customer (precomputed over all transactions by the cube stage)
+    combined_df = combined_df.merge(customer_risk, on='customer_id', how='left')
+    combined_df['avg_fraud_risk'] = combined_df['avg_fraud_risk'].fillna(0)
+    combined_df['segment_name'] = combined_df['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
+    combined_df['status'] = combined_df['is_anomaly'].map({True: '🔴 Anomalous', False: '✅ Normal'})
+    return combined_df
+
+def show_combined_analysis_page(filtered_df, customer_anomaly, customer_risk, selected_segments, available_segments,
+                                segment_cube):
+    """Combined view showing segments with anomaly/fraud overlay (totals and rates from the customer cube)"""
+    if customer_anomaly is None or len(customer_risk) == 0:
         st.warning("⚠️ Anomaly and fraud detection data not available. Showing segmentation only.")
-        show_segmentation_page(filtered_df, selected_segments, available_segments)
+        show_segmentation_page(filtered_df, selected_segments, available_segments, load_customer_count(), segment_cube)
         return
     
     st.markdown("---")
     st.subheader("📈 Combined Customer Analysis")
     
-    # Merge segment with anomaly data
-    combined_df = filtered_df.merge(
-        customer_anomaly[['customer_id', 'is_anomaly', 'anomaly_score_iso_forest']], 
-        on='customer_id', 
-        how='left'
-    )
-    combined_df['is_anomaly'] = combined_df['is_anomaly'].fillna(False)
-    
-    # Calculate average fraud risk per customer from transactions
-    if transaction_fraud is not None and 'fraud_risk_score' in transaction_fraud.columns:
-        customer_fraud_risk = transaction_fraud.groupby('customer_id')['fraud_risk_score'].mean().reset_index()
-        customer_fraud_risk.columns = ['customer_id', 'avg_fraud_risk']
-        combined_df = combined_df.merge(customer_fraud_risk, on='customer_id', how='left')
-        combined_df['avg_fraud_risk'] = combined_df['avg_fraud_risk'].fillna(0)
+    # Merge segment with anomaly data and average fraud risk
+    combined_df = combine_customers(filtered_df, customer_anomaly, customer_risk)
     
     # Overview metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Customers", len(combined_df))
+        st.metric("Total Customers", int(segment_cube['customers'].sum()))
     with col2:
-        st.metric("Anomalous", len(combined_df[combined_df['is_anomaly'] == True]))
+        st.metric("Anomalous", int(segment_cube.loc[segment_cube['is_anomaly'], 'customers'].sum()))
     with col3:
-        st.metric("Total Revenue", f"{combined_df['amount_sum'].sum():,.0f} HUF")
+        st.metric("Total Revenue", f"{segment_cube['sum_amount_sum'].sum():,.0f} HUF")
     with col4:
-        avg_risk = combined_df['avg_fraud_risk'].mean() if 'avg_fraud_risk' in combined_df.columns else 0
-        st.metric("Avg Fraud Risk", f"{avg_risk:.1f}/100")
+        st.metric("Avg Fraud Risk", f"{slice_mean(segment_cube, 'avg_fraud_risk'):.1f}/100")
     
     # Segment vs Anomaly distribution
     st.markdown("---")
@@ -614,7 +921,7 @@ def show_combined_analysis_page(filtered_df, customer_anomaly, transaction_fraud
     
     with col1:
         # Stacked bar: normal vs anomaly per segment
-        segment_anomaly = combined_df.groupby(['segment', 'is_anomaly']).size().reset_index(name='count')
+        segment_anomaly = segment_cube.groupby(['segment', 'is_anomaly'])['customers'].sum().reset_index(name='count')
         segment_anomaly['segment_name'] = segment_anomaly['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
         segment_anomaly['type'] = segment_anomaly['is_anomaly'].map({True: 'Anomalous', False: 'Normal'})
         
@@ -628,13 +935,14 @@ def show_combined_analysis_page(filtered_df, customer_anomaly, transaction_fraud
             color_discrete_map={'Normal': '#27ae60', 'Anomalous': '#e74c3c'},
             barmode='stack'
         )
-        st.plotly_chart(fig_stack, use_container_width=True)
+        show_chart(fig_stack)
     
     with col2:
         # Anomaly rate by segment
-        anomaly_rate = combined_df.groupby('segment').apply(
-            lambda x: (x['is_anomaly'] == True).sum() / len(x) * 100
-        ).reset_index(name='anomaly_rate')
+        segment_totals = segment_cube.groupby('segment')['customers'].sum()
+        segment_anomalous = segment_cube[segment_cube['is_anomaly']].groupby('segment')['customers'].sum()
+        anomaly_rate = (segment_anomalous.reindex(segment_totals.index, fill_value=0) / segment_totals * 100) \
+            .reset_index(name='anomaly_rate')
         anomaly_rate['segment_name'] = anomaly_rate['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
         
         fig_rate = px.bar(
@@ -646,28 +954,18 @@ def show_combined_analysis_page(filtered_df, customer_anomaly, transaction_fraud
             color='anomaly_rate',
             color_continuous_scale='Reds'
         )
-        st.plotly_chart(fig_rate, use_container_width=True)
+        show_chart(fig_rate)
     
     # Interactive scatter: Segments with anomaly highlighting
     st.markdown("---")
     st.subheader("🗺️ Customer Segmentation Map with Anomaly Detection")
     
-    combined_df['segment_name'] = combined_df['segment'].map(lambda x: SEGMENT_INFO[x]['name'])
-    combined_df['status'] = combined_df['is_anomaly'].map({True: '🔴 Anomalous', False: '✅ Normal'})
     
-    fig_scatter = px.scatter(
-        combined_df,
-        x='pca_1',
-        y='pca_2',
-        color='segment_name',
-        symbol='status',
-        title='Customer Segments with Anomaly Detection',
-        labels={'pca_1': 'Principal Component 1', 'pca_2': 'Principal Component 2'},
-        color_discrete_map={SEGMENT_INFO[seg]['name']: SEGMENT_INFO[seg]['color'] for seg in available_segments},
-        hover_data=['customer_id', 'amount_sum', 'payment_delay_days_mean', 'is_anomaly']
-    )
-    fig_scatter.update_traces(marker=dict(size=10, opacity=0.7, line=dict(width=1, color='white')))
-    st.plotly_chart(fig_scatter, use_container_width=True)
+    hover_data = ['customer_id', 'amount_sum', 'payment_delay_days_mean', 'is_anomaly']
+    looked_up = customer_lookup(combined_df, hover_data, key='combined_map_lookup')
+    fig_scatter = segment_map(combined_df, 'Customer Segments with Anomaly Detection', hover_data, available_segments,
+                              symbol='status', overlay=combined_df[combined_df['is_anomaly'] == True], highlight=looked_up)
+    show_chart(fig_scatter)
     
     # Detailed table with risk scores
     st.markdown("---")
@@ -680,41 +978,76 @@ def show_combined_analysis_page(filtered_df, customer_anomaly, transaction_fraud
             'anomaly_score_iso_forest'
         ]
         
-        # Sort by anomaly score (most suspicious first)
-        display_df = combined_df[display_columns].sort_values('anomaly_score_iso_forest')
-        st.dataframe(display_df, use_container_width=True)
-        
-        # Download combined report
-        csv_combined = combined_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download Combined Analysis Report",
-            data=csv_combined,
-            file_name="combined_segment_anomaly_analysis.csv",
-            mime="text/csv"
+        # Most suspicious first, from the cached order; only the visible page is read and sent to the browser
+        positions = load_combined_order(selected_segments)
+        if positions is None:
+            st.info("Data not available.")
+        else:
+            start, stop = page_bounds(len(positions), key=f'combined_customers_page_{selected_segments}')
+            page = read_artifact_rows('customer_segments', positions[start:stop], SEGMENT_COLUMNS)
+            page = combine_customers(page, customer_anomaly, customer_risk)
+            st.dataframe(page[display_columns], use_container_width=True, hide_index=True)
+        
+        # Download combined report (built from the segment artifact a chunk at a time)
+        report_download(
+            "📥 Download Combined Analysis Report",
+            "combined_segment_anomaly_analysis",
+            lambda fmt: export_report(
+                'combined_segment_anomaly_analysis',
+                lambda: (combine_customers(chunk, customer_anomaly, customer_risk)
+                         for chunk in iter_artifact_frames('customer_segments', SEGMENT_COLUMNS,
+                                                           [('segment', 'in', list(selected_segments))])),
+                fmt,
+                version=[artifact_version(name) for name in CUBE_INPUTS],
+                query=list(selected_segments)
+            ),
+            key='download_combined'
         )
 
+@st.cache_resource(max_entries=2)
+def load_segment_predictor(version):
+    """
+    One SegmentPredictor per model bundle version, shared by all sessions and reruns.
+
+    The predictor only reads its (memory-mapped) arrays, so concurrent
+    sessions can use the same instance; promoting a new bundle version
+    changes the cache key and the next rerun loads it. The sklearn
+    estimator is loaded up front rather than on first use: once newer
+    versions are saved this version's directory may be pruned, while a
+    cached predictor can still be serving it.
+    """
+    from segment_predictor import SegmentPredictor
+    from model_bundle import bundle_root
+
+    predictor = SegmentPredictor.from_bundle_dir(bundle_root, version)
+    predictor.bundle.estimator
+    return predictor
+
+def load_feature_importance():
+    path = os.path.join(output_dir, 'feature_importance.csv')
+    return _read_feature_importance(path, os.path.getmtime(path))
+
+@st.cache_data
+def _read_feature_importance(path, mtime):
+    # mtime is part of the cache key, so retraining shows up
+    return pd.read_csv(path)
+
 def show_prediction_page():
     """Segment prediction page with interactive predictor"""
-    import joblib
-    import json
+    from model_bundle import current_version, bundle_root
     
     st.markdown("---")
     st.subheader("🎯 Customer Segment Predictor")
     st.markdown("Use our trained AI model to predict which segment a new customer will belong to.")
     
-    # Load model and metadata
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
-    output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
-    
+    # Load model and metadata (cached per bundle version)
     try:
-        model = joblib.load(os.path.join(models_dir, 'segment_classifier.pkl'))
-        scaler = joblib.load(os.path.join(models_dir, 'feature_scaler.pkl'))
-        
-        with open(os.path.join(models_dir, 'model_info.json'), 'r') as f:
-            model_info = json.load(f)
-        
-        feature_columns = model_info['feature_columns']
+        version = current_version(bundle_root)
+        if version is None:
+            raise FileNotFoundError(f"No promoted model bundle in {bundle_root}")
+        predictor = load_segment_predictor(version)
+        model_info = predictor.model_info
+        feature_columns = predictor.feature_columns
         
     except Exception as e:
         st.error(f"❌ Could not load prediction model: {e}")
@@ -737,7 +1070,7 @@ def show_prediction_page():
     st.subheader("📊 Feature Importance")
     
     try:
-        feature_importance = pd.read_csv(os.path.join(output_dir, 'feature_importance.csv'))
+        feature_importance = load_feature_importance()
         top_10 = feature_importance.head(10)
         
         fig_importance = px.bar(
@@ -751,7 +1084,7 @@ def show_prediction_page():
             color_continuous_scale='Blues'
         )
         fig_importance.update_layout(yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_importance, use_container_width=True)
+        show_chart(fig_importance)
     except:
         st.info("Feature importance chart not available.")
     
@@ -761,7 +1094,11 @@ def show_prediction_page():
     st.markdown("Enter customer characteristics below to predict their segment:")
     
     # Create input method selector
-    input_method = st.radio("Input Method", ["Quick Preset", "Manual Entry"], horizontal=True)
+    input_method = st.radio("Input Method", ["Quick Preset", "Manual Entry", "Bulk Upload"], horizontal=True)
+    
+    if input_method == "Bulk Upload":
+        show_bulk_prediction(predictor, version)
+        return
     
     if input_method == "Quick Preset":
         st.markdown("#### Choose a preset customer profile:")
@@ -919,31 +1256,11 @@ def show_prediction_page():
     # Make prediction button
     st.markdown("---")
     if st.button("Predict Segment", type="primary", use_container_width=True):
-        # Prepare features
-        customer_df = pd.DataFrame([customer_features])
-        
-        # Ensure all required features are present
-        for feature in feature_columns:
-            if feature not in customer_df.columns:
-                customer_df[feature] = 0
-        
-        # Select and order features
-        X = customer_df[feature_columns].copy()
-        X = X.replace([np.inf, -np.inf], np.nan).fillna(0)
-        
-        # Scale features
-        X_scaled = scaler.transform(X)
-        
-        # Predict
-        predicted_segment = model.predict(X_scaled)[0]
-        
-        # Get probability if available
-        if hasattr(model, 'predict_proba'):
-            probabilities = model.predict_proba(X_scaled)[0]
-            confidence = probabilities.max()
-        else:
-            confidence = 1.0
-            probabilities = None
+        # Predict (missing features default to 0, non-finite values are zeroed)
+        result = predictor.predict(customer_features)[0]
+        predicted_segment = result['predicted_segment']
+        confidence = result['confidence']
+        probabilities = list(result['probabilities'].values()) if result['probabilities'] else None
         
         # Display results
         st.markdown("---")
@@ -980,7 +1297,7 @@ def show_prediction_page():
                 color_continuous_scale='Blues'
             )
             fig_prob.update_layout(showlegend=False)
-            st.plotly_chart(fig_prob, use_container_width=True)
+            show_chart(fig_prob)
         
         # Feature values used
         with st.expander("📋 View Input Features Used for Prediction"):
@@ -990,5 +1307,129 @@ def show_prediction_page():
             })
             st.dataframe(feature_df, use_container_width=True)
 
+def show_bulk_prediction(predictor, version):
+    """Score an uploaded file of customers in chunks and show the segment and confidence distributions."""
+    from batch_score_segments import input_columns, missing_feature_columns, iter_feature_chunks, score_chunk
+    
+    st.markdown("#### Upload a CSV or Parquet file of customer features:")
+    uploaded = st.file_uploader("Customer features", type=['csv', 'parquet'])
+    st.caption(f"Needs the {len(predictor.feature_columns)} model feature columns "
+               f"({', '.join(predictor.feature_columns)}); a customer_id column is carried through to the results.")
+    if uploaded is None:
+        return
+    
+    # Validate the header against the model's feature columns before reading any rows
+    is_parquet = uploaded.name.endswith('.parquet')
+    try:
+        columns = input_columns(uploaded, is_parquet)
+    except Exception as e:
+        st.error(f"❌ Could not read {uploaded.name}: {e}")
+        return
+    missing = missing_feature_columns(columns, predictor.feature_columns)
+    if missing:
+        st.error(f"❌ {uploaded.name} is missing {len(missing)} feature column(s): {', '.join(missing)}")
+        return
+    
+    # Scores are kept per upload and model version, so reruns (e.g. a new download format) don't rescore
+    scored_key = (uploaded.file_id, version)
+    if st.session_state.get('bulk_scored_key') != scored_key:
+        if not st.button("Score File", type="primary", use_container_width=True):
+            return
+        
+        if is_parquet:
+            import pyarrow.parquet as pq
+            
+            total_rows = pq.ParquetFile(uploaded).metadata.num_rows
+        progress = st.progress(0.0, text="Scoring customers...")
+        start = time.perf_counter()
+        scored_chunks = []
+        rows = 0
+        chunks = iter_feature_chunks(uploaded, BULK_CHUNK_SIZE, columns=['customer_id'] + predictor.feature_columns,
+                                     is_parquet=is_parquet)
+        while True:
+            # Reading and scoring fail for different reasons; report them separately
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                break
+            except Exception as e:
+                progress.empty()
+                st.error(f"❌ Could not read {uploaded.name}: {e}")
+                return
+            if len(chunk) == 0:
+                continue
+            try:
+                scored_chunks.append(score_chunk(chunk, bundle=predictor.bundle))
+            except (ValueError, TypeError) as e:
+                progress.empty()
+                st.error(f"❌ Feature columns must be numeric: {e}")
+                return
+            rows += len(chunk)
+            # CSV progress follows the read position, as the row count is unknown up front
+            done = rows / total_rows if is_parquet else uploaded.tell() / uploaded.size
+            progress.progress(min(done, 1.0), text=f"Scored {rows:,} customers...")
+        progress.empty()
+        if not scored_chunks:
+            st.warning(f"⚠️ {uploaded.name} has no customer rows to score.")
+            return
+        
+        st.session_state['bulk_scored_key'] = scored_key
+        st.session_state['bulk_scored'] = pd.concat(scored_chunks, ignore_index=True)
+        st.session_state['bulk_elapsed'] = time.perf_counter() - start
+    
+    scored = st.session_state['bulk_scored']
+    st.success(f"✅ Scored {len(scored):,} customers in {st.session_state['bulk_elapsed']:.2f}s")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        segment_counts = scored['predicted_segment'].value_counts().sort_index().reset_index(name='customers')
+        segment_counts['segment_name'] = segment_counts['predicted_segment'].map(lambda x: SEGMENT_INFO[x]['name'])
+        fig_segments = px.bar(
+            segment_counts,
+            x='segment_name',
+            y='customers',
+            color='segment_name',
+            title='Predicted Segment Distribution',
+            labels={'segment_name': 'Segment', 'customers': 'Number of Customers'},
+            color_discrete_map={info['name']: info['color'] for info in SEGMENT_INFO.values()}
+        )
+        fig_segments.update_layout(showlegend=False)
+        show_chart(fig_segments)
+    
+    with col2:
+        fig_confidence = histogram_figure(
+            histogram_bins(scored['confidence'], bins=20, value_range=(0, 1)),
+            title='Prediction Confidence Distribution',
+            x_label='Confidence',
+            y_label='Number of Customers',
+            color='#3498db'
+        )
+        show_chart(fig_confidence)
+    
+    st.markdown("#### Scored Customers")
+    start, stop = page_bounds(len(scored), key=f'bulk_page_{uploaded.file_id}')
+    st.dataframe(scored.iloc[start:stop], use_container_width=True, hide_index=True)
+    
+    stem = os.path.splitext(uploaded.name)[0]
+    report_download(
+        "📥 Download Scored File",
+        f"{stem}_segments",
+        lambda fmt: bulk_report(scored, fmt),
+        key='download_bulk'
+    )
+
+def bulk_report(scored, fmt):
+    """
+    Report bytes of a session's scored upload.
+
+    Written in a private temporary directory that is removed right away, so
+    uploaded data never lands in (or is cleaned up with) the shared exports.
+    """
+    with tempfile.TemporaryDirectory(prefix='bulk_segments_') as directory:
+        path = os.path.join(directory, f'scored.{fmt}')
+        write_report((scored.iloc[i:i + BULK_CHUNK_SIZE] for i in range(0, len(scored), BULK_CHUNK_SIZE)), path, fmt)
+        return _report_data(path)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,258 @@
+import os
+import numpy as np
+import sklearn
+from sklearn.ensemble import IsolationForest
+from sklearn.ensemble._forest import ForestClassifier
+from sklearn.ensemble._iforest import _average_path_length
+from sklearn.utils.fixes import parse_version
+
+# From 1.4 on, classifier trees store class fractions in tree_.value and
+# predict_proba returns them as-is; before that they stored weighted counts
+# and predict_proba normalized each row
+_TREE_VALUES_ARE_FRACTIONS = parse_version(sklearn.__version__) >= parse_version('1.4')
+
+# Arrays making up an exported forest (all trees concatenated into one node table)
+FOREST_ARRAYS = ['feature', 'threshold', 'children', 'value', 'roots', 'classes']
+ISOLATION_FOREST_ARRAYS = ['feature', 'threshold', 'children', 'path_length', 'roots']
+
+
+def is_exportable_forest(model):
+    """True for single-output forest classifiers (RandomForest, ExtraTrees)."""
+    return isinstance(model, ForestClassifier) and getattr(model, 'n_outputs_', 1) == 1
+
+
+def _flatten_structure(trees, feature_maps=None):
+    """Shared node table (feature, threshold, children, roots) for a list of sklearn trees."""
+    node_counts = np.array([tree.node_count for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int32)
+    total_nodes = int(node_counts.sum())
+
+    feature = np.empty(total_nodes, dtype=np.int32)
+    threshold = np.empty(total_nodes, dtype=np.float64)
+    children = np.empty((total_nodes, 2), dtype=np.int32)
+    for index, (tree, offset) in enumerate(zip(trees, roots)):
+        nodes = slice(offset, offset + tree.node_count)
+        node_ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+        tree_feature = np.where(is_leaf, 0, tree.feature)
+        if feature_maps is not None:
+            tree_feature = np.asarray(feature_maps[index])[tree_feature]
+
+        feature[nodes] = tree_feature
+        threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+        children[nodes, 0] = np.where(is_leaf, node_ids, tree.children_left + offset)
+        children[nodes, 1] = np.where(is_leaf, node_ids, tree.children_right + offset)
+    return feature, threshold, children, roots
+
+
+def export_forest(model):
+    """
+    Flatten a fitted forest classifier into contiguous NumPy arrays.
+
+    Node ids of every tree are offset into one shared node table. Leaves
+    point to themselves on both sides (with an infinite threshold), so a
+    fixed number of traversal steps lands every tree on its leaf. Leaf
+    values are stored as per-tree class probabilities, exactly as
+    DecisionTreeClassifier.predict_proba returns them.
+
+    Parameters:
+    -----------
+    model : RandomForestClassifier or ExtraTreesClassifier
+        Fitted single-output forest
+
+    Returns:
+    --------
+    dict : feature (int32), threshold (float64), children (int32, n_nodes x 2),
+           value (float64, n_nodes x n_classes), roots (int32), classes, max_depth
+    """
+    if not is_exportable_forest(model):
+        raise ValueError(f"Cannot export {type(model).__name__}; expected a single-output forest classifier")
+
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    feature, threshold, children, roots = _flatten_structure(trees)
+    n_classes = len(model.classes_)
+
+    value = np.empty((len(feature), n_classes), dtype=np.float64)
+    for tree, offset in zip(trees, roots):
+        leaf_values = tree.value[:, 0, :n_classes]
+        nodes = slice(offset, offset + tree.node_count)
+        if _TREE_VALUES_ARE_FRACTIONS:
+            value[nodes] = leaf_values
+        else:
+            normalizer = leaf_values.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            value[nodes] = leaf_values / normalizer[:, np.newaxis]
+
+    return {
+        'feature': feature,
+        'threshold': threshold,
+        'children': children,
+        'value': value,
+        'roots': roots,
+        'classes': np.asarray(model.classes_),
+        'max_depth': max(tree.max_depth for tree in trees)
+    }
+
+
+def _apply_flat(X, feature, threshold, children, roots, max_depth):
+    """Leaf node id reached in every tree of a flattened forest, shape (n_samples, n_trees)."""
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X[np.newaxis, :]
+    rows = np.arange(X.shape[0])[:, np.newaxis]
+    nodes = np.broadcast_to(roots, (X.shape[0], len(roots)))
+    for _ in range(max_depth):
+        go_right = ~(X[rows, feature[nodes]] <= threshold[nodes])
+        nodes = children[nodes, go_right.view(np.int8)]
+    return nodes
+
+
+class FlatForest:
+    """
+    Evaluate an exported forest with plain NumPy indexing.
+
+    Skips sklearn's per-call input validation and joblib dispatch; all trees
+    are walked together, one depth level per step. Inputs are cast to
+    float32 like sklearn's trees, so probabilities are identical to
+    RandomForestClassifier.predict_proba on the same (already scaled) input.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(**export_forest(model))
+
+    def apply(self, X):
+        """Return the leaf node id reached in every tree, shape (n_samples, n_estimators)."""
+        return _apply_flat(X, self.feature, self.threshold, self.children, self.roots, self.max_depth)
+
+    def predict_proba(self, X):
+        # Reducing over the leading (tree) axis adds one tree at a time, in the
+        # same order as sklearn, so the result matches bit for bit
+        probabilities = self.value[self.apply(X).T].sum(axis=0)
+        probabilities /= self.n_estimators
+        return probabilities
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def _node_depths(tree):
+    """Depth of every node of an sklearn tree, counted as IsolationForest does (root = 1)."""
+    depth = np.ones(tree.node_count, dtype=np.float64)
+    for node in range(tree.node_count):
+        # Children always have larger ids than their parent
+        for child in (tree.children_left[node], tree.children_right[node]):
+            if child != -1:
+                depth[child] = depth[node] + 1
+    return depth
+
+
+def export_isolation_forest(model):
+    """
+    Flatten a fitted IsolationForest into contiguous NumPy arrays.
+
+    Same node table as export_forest (feature ids mapped back to input
+    columns when trees saw a feature subset); instead of class values each
+    leaf stores its path length contribution (leaf depth + average path
+    length of its remaining samples - 1), as IsolationForest.score_samples
+    adds them up.
+
+    Returns:
+    --------
+    dict : feature, threshold, children, path_length (float64), roots,
+           max_depth, normalizer (n_trees * c(max_samples)), offset
+    """
+    if not isinstance(model, IsolationForest):
+        raise ValueError(f"Cannot export {type(model).__name__}; expected an IsolationForest")
+
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    subsample_features = model._max_features != model.n_features_in_
+    feature, threshold, children, roots = _flatten_structure(
+        trees, model.estimators_features_ if subsample_features else None)
+
+    path_length = np.empty(len(feature), dtype=np.float64)
+    for tree, offset in zip(trees, roots):
+        path_length[offset:offset + tree.node_count] = (
+            _node_depths(tree) + _average_path_length(tree.n_node_samples) - 1.0
+        )
+
+    return {
+        'feature': feature,
+        'threshold': threshold,
+        'children': children,
+        'path_length': path_length,
+        'roots': roots,
+        'max_depth': max(tree.max_depth for tree in trees),
+        'normalizer': len(trees) * float(_average_path_length([model._max_samples])[0]),
+        'offset': float(model.offset_)
+    }
+
+
+class FlatIsolationForest:
+    """
+    Evaluate an exported IsolationForest with plain NumPy indexing.
+
+    score_samples / decision_function / predict match the sklearn model on
+    the same input. The arrays can be saved to a directory of .npy files and
+    loaded memory-mapped, so several processes share one copy of the model
+    through the OS page cache instead of each unpickling its own.
+    """
+
+    def __init__(self, feature, threshold, children, path_length, roots, max_depth, normalizer, offset):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.path_length = path_length
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.normalizer = float(normalizer)
+        self.offset_ = float(offset)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(**export_isolation_forest(model))
+
+    def save(self, directory):
+        """Write one .npy per array plus the scalars to directory."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ISOLATION_FOREST_ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        np.save(os.path.join(directory, 'scalars.npy'),
+                np.array([self.max_depth, self.normalizer, self.offset_], dtype=np.float64))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load a forest saved with save(); arrays are memory-mapped by default."""
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ISOLATION_FOREST_ARRAYS}
+        max_depth, normalizer, offset = np.load(os.path.join(directory, 'scalars.npy'))
+        return cls(**arrays, max_depth=max_depth, normalizer=normalizer, offset=offset)
+
+    def apply(self, X):
+        return _apply_flat(X, self.feature, self.threshold, self.children, self.roots, self.max_depth)
+
+    def score_samples(self, X):
+        # Accumulate one tree at a time, in sklearn's order, so scores match it exactly
+        leaf_lengths = self.path_length[self.apply(X)]
+        depths = np.zeros(leaf_lengths.shape[0])
+        for tree_lengths in leaf_lengths.T:
+            depths += tree_lengths
+        if self.normalizer == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-depths / self.normalizer))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
@@ -0,0 +1,249 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import argparse
+import joblib
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import IsolationForest
+import warnings
+warnings.filterwarnings('ignore')
+
+from customer_baselines import CustomerBaselineStore
+from velocity_features import VelocityFeatureEngine, VELOCITY_FEATURES
+from risk_tracker import TopKRiskTracker, high_risk_report_path
+from payment_integrity import PaymentIntegrityDetector, INTEGRITY_COLUMNS
+from score_calibration import ScoreQuantileSketch, calibrated_risk, HIGH_RISK_THRESHOLD
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
+fraud_model_path = os.path.join(models_dir, 'transaction_fraud_model.joblib')
+
+TRANSACTION_FEATURES = ['amount_zscore', 'delay_zscore', 'is_weekend', 'unusual_delay'] + VELOCITY_FEATURES
+
+
+def fit_baselines(transactions, prior_weight=5.0):
+    """Empty per-customer baseline store whose global prior is the mean/variance of the history."""
+    return CustomerBaselineStore.from_history(
+        transactions[['amount', 'payment_delay_days']].to_numpy(dtype=np.float64),
+        prior_weight=prior_weight
+    )
+
+
+def add_transaction_features(transactions, baselines, velocity, update=True):
+    """
+    Add the transaction fraud features to a payments DataFrame (in place).
+
+    Expects customer_id, method, amount, payment_date and either
+    payment_delay_days or order_date. Z-scores are taken per customer against the running baseline
+    in baselines (payments processed in payment_date order, each scored
+    against the customer's earlier payments), so a row's features only depend
+    on that customer's history, not on what else is in the batch. Velocity
+    features (payment count/amount per customer and per method over the
+    last 1/7/30 days) come from the velocity engine's ring buffers. With
+    update=True the batch is folded into the baselines and windows afterwards.
+    """
+    payment_date = pd.to_datetime(transactions['payment_date'])
+    if 'payment_delay_days' not in transactions.columns:
+        transactions['payment_delay_days'] = (payment_date - pd.to_datetime(transactions['order_date'])).dt.days
+
+    amount = transactions['amount'].to_numpy(dtype=np.float64)
+    delay = transactions['payment_delay_days'].to_numpy(dtype=np.float64)
+
+    # Features 1-2: Unusual payment amounts and extreme delays for this customer (z-scores)
+    order = np.argsort(payment_date.to_numpy(), kind='stable')
+    customer_ids = transactions['customer_id'].to_numpy()[order]
+    zscores = np.empty((len(transactions), 2))
+    zscores[order] = baselines.score_and_update(customer_ids, np.column_stack([amount, delay])[order], update=update)
+    transactions['amount_zscore'] = zscores[:, 0]
+    transactions['delay_zscore'] = zscores[:, 1]
+
+    # Feature 3: Weekend/holiday transactions (higher fraud risk)
+    transactions['is_weekend'] = payment_date.dt.dayofweek.isin([5, 6]).astype(int)
+
+    # Feature 4: Unusual time gaps between orders and payments
+    transactions['unusual_delay'] = (np.abs(delay) > 365).astype(int)
+
+    # Features 5+: Payment velocity (bursts) per customer and per payment method
+    velocity.add_features(transactions, update=update)
+
+    return transactions
+
+
+class TransactionFraudModel:
+    """
+    Fitted transaction-level fraud detector.
+
+    Bundles the IsolationForest, its feature scaler, the per-customer
+    baselines for the z-score features, the velocity windows and a quantile
+    sketch of reference scores that calibrates the 0-100 risk score, so new
+    payment batches can be scored without refitting and get the same risk
+    whatever they are scored with. Baselines and windows keep learning from
+    scored payments; the reference only changes through recalibrate().
+    Rule-based duplicate/overpayment flags come from a PaymentIntegrityDetector
+    that is carried along the same way. payment_watermark is the latest
+    payment date the model has learned; payments up to it are already in its
+    baselines, windows and duplicate index.
+    """
+
+    def __init__(self, iso_forest, scaler, baselines, velocity, reference_sketch, high_risk_tail=0.05,
+                 integrity=None, feature_columns=TRANSACTION_FEATURES, payment_watermark=None):
+        self.iso_forest = iso_forest
+        self.scaler = scaler
+        self.baselines = baselines
+        self.velocity = velocity
+        self.reference_sketch = reference_sketch
+        self.high_risk_tail = high_risk_tail
+        self.integrity = integrity if integrity is not None else PaymentIntegrityDetector()
+        self.feature_columns = list(feature_columns)
+        self.payment_watermark = payment_watermark
+
+    @classmethod
+    def fit(cls, transactions, contamination=0.05, n_estimators=100, random_state=42,
+            feature_columns=TRANSACTION_FEATURES, scorer=None):
+        """
+        Fit on historical transactions (adds the features and integrity flags in place).
+
+        feature_columns selects the Isolation Forest inputs (a subset of
+        TRANSACTION_FEATURES; all features are still added to transactions).
+        scorer, if given, computes the training scores as
+        scorer(model, transactions) (e.g. PartitionedFraudScorer.score_samples)
+        instead of scoring in-process.
+
+        Returns:
+        --------
+        (TransactionFraudModel, np.ndarray) : the model and the training fraud scores
+        """
+        if 'payment_delay_days' not in transactions.columns:
+            transactions['payment_delay_days'] = (pd.to_datetime(transactions['payment_date'])
+                                                  - pd.to_datetime(transactions['order_date'])).dt.days
+        baselines = fit_baselines(transactions)
+        velocity = VelocityFeatureEngine()
+        add_transaction_features(transactions, baselines, velocity)
+        integrity = PaymentIntegrityDetector()
+        transactions[INTEGRITY_COLUMNS] = integrity.check_batch(transactions)
+        X_transaction = transactions[list(feature_columns)].fillna(0)
+
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X_transaction)
+
+        iso_forest = IsolationForest(
+            contamination=contamination,
+            random_state=random_state,
+            n_estimators=n_estimators
+        )
+        iso_forest.fit(X_scaled)
+        model = cls(iso_forest, scaler, baselines, velocity, None,
+                    high_risk_tail=contamination, integrity=integrity, feature_columns=feature_columns,
+                    payment_watermark=pd.to_datetime(transactions['payment_date']).max())
+        if scorer is None:
+            fraud_scores = iso_forest.score_samples(X_scaled)
+        else:
+            fraud_scores = scorer(model, transactions)
+
+        # The training window is the reference; its riskiest `contamination` share scores above 70
+        model.reference_sketch = ScoreQuantileSketch.from_scores(fraud_scores)
+        return model, fraud_scores
+
+    def feature_matrix(self, transactions):
+        """Scaled feature matrix for transactions that already carry the fraud features."""
+        X = transactions[self.feature_columns].to_numpy(dtype=np.float64, copy=True)
+        X[np.isnan(X)] = 0
+        X -= self.scaler.mean_
+        X /= self.scaler.scale_
+        return X
+
+    def risk_scores(self, fraud_scores):
+        """0-100 risk (higher = more suspicious) calibrated against the reference score distribution."""
+        return calibrated_risk(fraud_scores, self.reference_sketch, self.high_risk_tail)
+
+    def recalibrate(self, fraud_scores, replace=False):
+        """Update the reference distribution from a new window of fraud scores (merged in, or replacing it)."""
+        window = ScoreQuantileSketch.from_scores(fraud_scores)
+        self.reference_sketch = window if replace else self.reference_sketch.merge(window)
+        return self
+
+    def score(self, transactions, update_baselines=True):
+        """
+        Score a batch of payments (vectorized).
+
+        Adds the fraud features plus fraud_prediction (-1 = suspicious, 1 = normal),
+        fraud_score (IsolationForest score_samples), fraud_risk_score (0-100)
+        and the duplicate/overpayment flags to a copy of the input. With
+        update_baselines=True the payments are folded into the per-customer
+        baselines, velocity windows and integrity index (save the model to
+        keep them).
+        """
+        scored = add_transaction_features(transactions.copy(), self.baselines, self.velocity, update=update_baselines)
+        scored[INTEGRITY_COLUMNS] = self.integrity.check_batch(scored, update=update_baselines)
+        if update_baselines and len(scored) > 0:
+            latest = pd.to_datetime(scored['payment_date']).max()
+            watermark = getattr(self, 'payment_watermark', None)
+            self.payment_watermark = latest if watermark is None else max(watermark, latest)
+        X_scaled = self.feature_matrix(scored)
+        fraud_scores = self.iso_forest.score_samples(X_scaled)
+        scored['fraud_prediction'] = np.where(fraud_scores - self.iso_forest.offset_ < 0, -1, 1)
+        scored['fraud_score'] = fraud_scores
+        scored['fraud_risk_score'] = self.risk_scores(fraud_scores)
+        return scored
+
+    def save(self, path=fraud_model_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=fraud_model_path):
+        return joblib.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score new payments with the persisted transaction fraud model.')
+    parser.add_argument('--input', required=True,
+                        help='CSV of payments (payment_id, order_id, customer_id, method, amount, payment_date, '
+                             'order_date or payment_delay_days, optionally amount_order)')
+    parser.add_argument('--output', required=True, help='CSV to write the scored payments to')
+    parser.add_argument('--model', default=fraud_model_path, help='Persisted transaction fraud model')
+    parser.add_argument('--no-update', action='store_true',
+                        help='Score only; do not learn the payments into the baselines, velocity windows, '
+                             'duplicate index or the high-risk list')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='Payments scored per chunk')
+    parser.add_argument('--top-risk-report', default=high_risk_report_path,
+                        help='Persisted top-K high-risk transaction list to merge the scored payments into')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("TRANSACTION FRAUD SCORING")
+    print("="*80)
+
+    model = TransactionFraudModel.load(args.model)
+    top_risk = TopKRiskTracker.load(args.top_risk_report)
+
+    rows = flagged = high_risk = duplicates = overpayments = 0
+    elapsed = 0.0
+    for chunk_index, payments in enumerate(pd.read_csv(args.input, chunksize=args.chunksize)):
+        start = time.perf_counter()
+        scored = model.score(payments, update_baselines=not args.no_update)
+        elapsed += time.perf_counter() - start
+
+        scored.to_csv(args.output, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0, index=False)
+        top_risk.update(scored)
+        rows += len(scored)
+        flagged += int((scored['fraud_prediction'] == -1).sum())
+        high_risk += int((scored['fraud_risk_score'] > HIGH_RISK_THRESHOLD).sum())
+        duplicates += int((scored['is_duplicate_payment'] | scored['is_near_duplicate_payment']).sum())
+        overpayments += int(scored['is_overpayment'].sum())
+
+    print(f"\n[OK] Scored {rows} payments in {elapsed * 1000:.1f} ms")
+    print(f"[OK] Flagged {flagged} as potentially fraudulent, {high_risk} high-risk (score > {HIGH_RISK_THRESHOLD})")
+    print(f"[OK] Duplicate or near-duplicate payments: {duplicates}, payments over the order amount: {overpayments}")
+    print(f"[OK] Scored payments saved to {args.output}")
+    if not args.no_update:
+        model.save(args.model)
+        top_risk.save(args.top_risk_report)
+        print(f"[OK] Updated baselines for {len(model.baselines)} customers and velocity windows saved to {args.model}")
+        print(f"[OK] Top {len(top_risk)} high-risk transactions saved to {args.top_risk_report}")
+
+if __name__ == "__main__":
+    main()
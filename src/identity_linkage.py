@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import argparse
+import joblib
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
+linkage_path = os.path.join(models_dir, 'identity_linkage.joblib')
+
+RING_FEATURES = ['ring_id', 'ring_size', 'ring_total_spend', 'ring_anomaly_rate']
+
+# A contact value shared by more customers than this (placeholder emails/phones such
+# as a shop's default address) is treated as noise and links nobody
+MAX_CONTACT_CUSTOMERS = 10
+
+
+def normalize_email(email):
+    """Lower-cased address without a +tag in the local part; None if not an address."""
+    if not isinstance(email, str):
+        return None
+    email = email.strip().lower()
+    local, sep, domain = email.partition('@')
+    if not sep or not local or not domain:
+        return None
+    return local.split('+', 1)[0] + '@' + domain
+
+
+def normalize_phone(phone):
+    """Digits only, international form (00 prefix dropped, national 06 -> 36); None if too short."""
+    if phone is None or (isinstance(phone, float) and np.isnan(phone)):
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    if digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('06'):
+        digits = '36' + digits[2:]
+    return digits if len(digits) >= 6 else None
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with union by size and path halving (near-constant amortized ops)."""
+
+    def __init__(self):
+        # Plain lists: the hot path is scalar indexing, which is cheaper than on numpy arrays
+        self.parent = []
+        self.size = []
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self):
+        """New singleton set; returns its element."""
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+    def roots(self):
+        """Root of every element, vectorized (pointer jumping until stable)."""
+        parent = np.asarray(self.parent, dtype=np.int64)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                return parent
+            parent = grand
+
+
+class IdentityLinkage:
+    """
+    Customers linked into rings by shared normalized email or phone.
+
+    Each normalized contact value remembers the customers that used it;
+    a later customer with the same value is unioned with the first one, so
+    building the rings is one pass with near-constant work per customer and
+    new customers can be added at any time without rebuilding. A value
+    used by more than max_contact_customers customers stops linking: when
+    a value crosses the limit, the rings are rebuilt once from the
+    remaining values (union-find cannot split sets).
+    """
+
+    def __init__(self, max_contact_customers=MAX_CONTACT_CUSTOMERS):
+        self.max_contact_customers = max_contact_customers
+        self.sets = UnionFind()
+        self.customer_index = {}
+        self.customer_ids = []
+        self.customer_contacts = []
+        self.contact_members = {}
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    def add_customers(self, customer_ids, emails, phones):
+        """Add (or re-link) customers with their contact attributes; known contacts are skipped."""
+        customer_index, contact_members, sets = self.customer_index, self.contact_members, self.sets
+        limit = self.max_contact_customers
+        crossed_limit = False
+        for customer_id, email, phone in zip(customer_ids, emails, phones):
+            node = customer_index.get(customer_id)
+            if node is None:
+                node = sets.add()
+                customer_index[customer_id] = node
+                self.customer_ids.append(customer_id)
+                self.customer_contacts.append(set())
+            known = self.customer_contacts[node]
+            for contact in (('email', normalize_email(email)), ('phone', normalize_phone(phone))):
+                if contact[1] is None or contact in known:
+                    continue
+                known.add(contact)
+                members = contact_members.setdefault(contact, [])
+                members.append(node)
+                if len(members) == limit + 1:
+                    crossed_limit = True
+                elif len(members) <= limit:
+                    sets.union(node, members[0])
+        if crossed_limit:
+            self._rebuild()
+        return self
+
+    def set_max_contact_customers(self, max_contact_customers):
+        """Change the shared-contact limit and rebuild the rings if it differs."""
+        if max_contact_customers != self.max_contact_customers:
+            self.max_contact_customers = max_contact_customers
+            self._rebuild()
+        return self
+
+    def _rebuild(self):
+        """Rebuild the union-find from the contact values within the limit."""
+        sets = UnionFind()
+        for _ in self.customer_ids:
+            sets.add()
+        for members in self.contact_members.values():
+            if len(members) <= self.max_contact_customers:
+                for node in members[1:]:
+                    sets.union(node, members[0])
+        self.sets = sets
+
+    def common_contacts(self):
+        """Number of contact values ignored for being shared by too many customers."""
+        return sum(len(members) > self.max_contact_customers for members in self.contact_members.values())
+
+    def rings(self):
+        """DataFrame of customer_id -> ring_id (the ring's root customer id) and ring_size."""
+        roots = self.sets.roots()
+        customer_ids = np.asarray(self.customer_ids, dtype=object)
+        return pd.DataFrame({
+            'customer_id': self.customer_ids,
+            'ring_id': customer_ids[roots],
+            'ring_size': np.asarray(self.sets.size, dtype=np.int64)[roots]
+        })
+
+    def ring_features(self, customer_features, anomaly_column='is_anomaly', spend_column='amount_sum'):
+        """
+        Ring size, total spend and anomaly rate for each customer in customer_features.
+
+        Spend sums spend_column over the ring members that have features; the
+        anomaly rate is the share of those members flagged in anomaly_column.
+        Customers unknown to the linkage form a ring of their own.
+        """
+        rings = self.rings()
+        members = rings.merge(customer_features[['customer_id', spend_column, anomaly_column]],
+                              on='customer_id', how='left')
+        members[anomaly_column] = members[anomaly_column].astype(float)
+        ring_stats = members.groupby('ring_id').agg(
+            ring_total_spend=(spend_column, 'sum'),
+            ring_anomaly_rate=(anomaly_column, 'mean')
+        )
+        features = customer_features[['customer_id']].merge(rings, on='customer_id', how='left')
+        features = features.merge(ring_stats, left_on='ring_id', right_index=True, how='left')
+
+        features.index = customer_features.index
+        features['ring_id'] = features['ring_id'].fillna(features['customer_id'])
+        features['ring_size'] = features['ring_size'].fillna(1).astype(int)
+        features['ring_total_spend'] = features['ring_total_spend'].fillna(customer_features[spend_column])
+        features['ring_anomaly_rate'] = features['ring_anomaly_rate'].fillna(customer_features[anomaly_column].astype(float))
+        return features[['customer_id'] + RING_FEATURES]
+
+    def save(self, path=linkage_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=linkage_path):
+        return joblib.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add new customers to the persisted identity linkage and report their rings.')
+    parser.add_argument('--input', required=True, help='CSV of customers (customer_id, email, phone)')
+    parser.add_argument('--linkage', default=linkage_path, help='Persisted identity linkage')
+    parser.add_argument('--max-contact-customers', type=int, default=MAX_CONTACT_CUSTOMERS,
+                        help='Ignore an email/phone shared by more customers than this')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("IDENTITY LINKAGE UPDATE")
+    print("="*80)
+
+    if os.path.exists(args.linkage):
+        linkage = IdentityLinkage.load(args.linkage).set_max_contact_customers(args.max_contact_customers)
+    else:
+        linkage = IdentityLinkage(args.max_contact_customers)
+    customers = pd.read_csv(args.input)
+    linkage.add_customers(customers['customer_id'], customers['email'], customers['phone'])
+    linkage.save(args.linkage)
+
+    rings = linkage.rings()
+    new_rings = rings[rings['customer_id'].isin(customers['customer_id'])]
+    linked = new_rings[new_rings['ring_size'] > 1]
+    print(f"\n[OK] Linkage holds {len(linkage)} customers in {rings['ring_id'].nunique()} rings")
+    print(f"[OK] {len(linked)} of {len(customers)} input customers share an email or phone with others")
+    print(f"[OK] {linkage.common_contacts()} contact values shared by more than "
+          f"{linkage.max_contact_customers} customers ignored")
+    if len(linked) > 0:
+        print(linked.sort_values('ring_size', ascending=False).head(10).to_string(index=False))
+    print(f"[OK] Linkage saved to {args.linkage}")
+
+
+if __name__ == "__main__":
+    main()
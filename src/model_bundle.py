@@ -0,0 +1,187 @@
+import numpy as np
+import os
+import json
+import time
+import shutil
+import joblib
+from forest_export import FOREST_ARRAYS, FlatForest, export_forest, is_exportable_forest
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
+bundle_root = os.path.join(models_dir, 'segment_bundle')
+
+BUNDLE_FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+ESTIMATOR_FILE = 'estimator.joblib'
+
+# Inputs up to this many rows go through the flattened forest; larger
+# batches are faster through sklearn's compiled tree traversal
+FLAT_FOREST_MAX_ROWS = 1024
+
+
+def _version_dirs(bundle_root):
+    if not os.path.isdir(bundle_root):
+        return []
+    return sorted(name for name in os.listdir(bundle_root)
+                  if name.startswith('v') and name[1:].isdigit())
+
+
+def current_version(bundle_root=bundle_root):
+    """Return the promoted bundle version (e.g. 'v0003'), or None if nothing was promoted yet."""
+    try:
+        with open(os.path.join(bundle_root, CURRENT_FILE), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def promote_bundle(version, bundle_root=bundle_root):
+    """Atomically point CURRENT at an existing bundle version."""
+    if not os.path.isfile(os.path.join(bundle_root, version, MANIFEST_FILE)):
+        raise FileNotFoundError(f"Bundle version {version} not found in {bundle_root}")
+    tmp_path = os.path.join(bundle_root, f'.{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(bundle_root, CURRENT_FILE))
+
+
+def save_bundle(model, scaler, model_info, bundle_root=bundle_root, promote=True, keep=2):
+    """
+    Write a new bundle version and (by default) promote it.
+
+    The version is assembled in a staging directory and renamed into place,
+    so readers never see a partial bundle. Forest node arrays and scaler
+    parameters are stored as plain .npy files, which load with mmap_mode
+    and are shared between processes through the page cache.
+
+    Parameters:
+    -----------
+    model : fitted classifier
+    scaler : fitted StandardScaler
+    model_info : dict
+        Metadata as written to model_info.json (feature_columns, model_name, ...)
+    promote : bool
+        Point CURRENT at the new version once it is complete
+    keep : int
+        Number of most recent versions to keep, by default the new one and its
+        predecessor (the current one is never removed)
+
+    Returns:
+    --------
+    str : the new version name
+    """
+    os.makedirs(bundle_root, exist_ok=True)
+    staging_dir = os.path.join(bundle_root, f'.staging-{os.getpid()}-{time.time_ns()}')
+    os.makedirs(staging_dir)
+
+    try:
+        np.save(os.path.join(staging_dir, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+        np.save(os.path.join(staging_dir, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model_info': model_info,
+            'classes': [int(cls) for cls in model.classes_],
+            'has_flat_forest': False
+        }
+
+        if is_exportable_forest(model):
+            forest = export_forest(model)
+            for name in FOREST_ARRAYS:
+                np.save(os.path.join(staging_dir, f'forest_{name}.npy'), forest[name])
+            manifest['has_flat_forest'] = True
+            manifest['forest_max_depth'] = int(forest['max_depth'])
+
+        # Uncompressed, so joblib.load(mmap_mode=...) can map its arrays
+        joblib.dump(model, os.path.join(staging_dir, ESTIMATOR_FILE))
+
+        existing = _version_dirs(bundle_root)
+        next_number = int(existing[-1][1:]) + 1 if existing else 1
+        version = f'v{next_number:04d}'
+        manifest['version'] = version
+        with open(os.path.join(staging_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+        os.rename(staging_dir, os.path.join(bundle_root, version))
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    if promote:
+        promote_bundle(version, bundle_root)
+
+    # Prune old versions; processes that still map them keep working on POSIX
+    active = current_version(bundle_root)
+    for old in _version_dirs(bundle_root)[:-keep]:
+        if old != active:
+            shutil.rmtree(os.path.join(bundle_root, old), ignore_errors=True)
+
+    return version
+
+
+class ModelBundle:
+    """
+    A loaded bundle version: scaler parameters, feature order and classifier.
+
+    Scaled inputs with at most FLAT_FOREST_MAX_ROWS rows are scored with the
+    memory-mapped flattened forest; larger ones (or non-forest models) use the
+    sklearn estimator, which is only loaded the first time it is needed.
+    """
+
+    def __init__(self, bundle_dir, mmap_mode='r'):
+        self.bundle_dir = bundle_dir
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), 'r') as f:
+            self.manifest = json.load(f)
+
+        self.version = self.manifest['version']
+        self.model_info = self.manifest['model_info']
+        self.feature_columns = self.model_info['feature_columns']
+        self.classes_ = np.array(self.manifest['classes'])
+        self.scaler_mean = np.load(os.path.join(bundle_dir, 'scaler_mean.npy'), mmap_mode=mmap_mode)
+        self.scaler_scale = np.load(os.path.join(bundle_dir, 'scaler_scale.npy'), mmap_mode=mmap_mode)
+
+        self.flat_forest = None
+        if self.manifest['has_flat_forest']:
+            arrays = {name: np.load(os.path.join(bundle_dir, f'forest_{name}.npy'), mmap_mode=mmap_mode)
+                      for name in FOREST_ARRAYS}
+            self.flat_forest = FlatForest(**arrays, max_depth=self.manifest['forest_max_depth'])
+
+        self._estimator = None
+
+    @property
+    def estimator(self):
+        if self._estimator is None:
+            self._estimator = joblib.load(os.path.join(self.bundle_dir, ESTIMATOR_FILE), mmap_mode=self.mmap_mode)
+        return self._estimator
+
+    def transform(self, X):
+        """Scale a raw feature matrix in place (same arithmetic as StandardScaler.transform)."""
+        X -= self.scaler_mean
+        X /= self.scaler_scale
+        return X
+
+    def predict_proba(self, X_scaled):
+        if self.flat_forest is not None and len(X_scaled) <= FLAT_FOREST_MAX_ROWS:
+            return self.flat_forest.predict_proba(X_scaled)
+        if hasattr(self.estimator, 'predict_proba'):
+            return self.estimator.predict_proba(X_scaled)
+        return None
+
+    def predict(self, X_scaled):
+        if self.flat_forest is not None and len(X_scaled) <= FLAT_FOREST_MAX_ROWS:
+            return self.flat_forest.predict(X_scaled)
+        return self.estimator.predict(X_scaled)
+
+
+def load_bundle(bundle_root=bundle_root, version=None, mmap_mode='r'):
+    """Load the promoted bundle (or a specific version) from bundle_root."""
+    version = version or current_version(bundle_root)
+    if version is None:
+        raise FileNotFoundError(f"No promoted model bundle in {bundle_root}; run predictive_modeling.py first")
+    return ModelBundle(os.path.join(bundle_root, version), mmap_mode=mmap_mode)
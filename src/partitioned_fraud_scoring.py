@@ -0,0 +1,344 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+warnings.filterwarnings('ignore')
+
+from forest_export import FlatIsolationForest
+from fraud_scoring import TransactionFraudModel, add_transaction_features, fraud_model_path
+from payment_integrity import INTEGRITY_COLUMNS
+from score_calibration import HIGH_RISK_THRESHOLD
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.abspath(os.path.join(script_dir, '..', 'data'))
+models_dir = os.path.abspath(os.path.join(script_dir, '..', 'models'))
+partition_root = os.path.join(data_dir, 'transaction_fraud_detection')
+shared_model_root = os.path.join(models_dir, 'transaction_fraud_shared')
+
+MANIFEST_NAME = '_manifest.json'
+
+# Manifest fields that decide whether a partition's stored fraud scores can be reused
+SCORE_KEY_FIELDS = ('model_id', 'rows', 'input_hash')
+
+# Shared model directories younger than this are never pruned: another run may have
+# just exported one and not yet recorded it in the manifest
+SHARED_MODEL_GRACE_SECONDS = 3600
+
+# Per-process model (loaded once by _init_worker, reused for every partition)
+_shared = None
+
+
+def partition_keys(payment_dates):
+    """Month partition ('YYYY-MM') of every payment."""
+    return pd.to_datetime(payment_dates).dt.to_period('M').astype(str).to_numpy()
+
+
+def partition_path(output_root, key):
+    return os.path.join(output_root, f'payment_month={key}.parquet')
+
+
+def frame_hash(frame):
+    """Hash of a DataFrame's columns and values (what a partition file holds)."""
+    digest = hashlib.sha1(json.dumps(list(frame.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def export_shared_model(model, shared_root=shared_model_root):
+    """
+    Write the model's Isolation Forest and scaler as .npy files for the worker processes.
+
+    The directory is named after a hash of the arrays, so an unchanged refit
+    reuses it (and its id tells partitions scored by the same model apart).
+    Directories of older models are removed by prune_shared_models() once no
+    worker can still have them mapped.
+
+    Returns:
+    --------
+    (str, str) : model directory, model id
+    """
+    forest = FlatIsolationForest.from_model(model.iso_forest)
+    digest = hashlib.sha1()
+    for array in (forest.feature, forest.threshold, forest.children, forest.path_length, forest.roots,
+                  model.scaler.mean_, model.scaler.scale_):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(json.dumps([model.feature_columns, forest.max_depth, forest.normalizer, forest.offset_]).encode())
+    model_id = digest.hexdigest()[:16]
+
+    model_dir = os.path.join(shared_root, model_id)
+    if not os.path.exists(os.path.join(model_dir, 'scaler_scale.npy')):
+        forest.save(model_dir)
+        np.save(os.path.join(model_dir, 'scaler_mean.npy'), model.scaler.mean_)
+        np.save(os.path.join(model_dir, 'scaler_scale.npy'), model.scaler.scale_)
+    return model_dir, model_id
+
+
+def prune_shared_models(keep_ids, shared_root=shared_model_root, grace_seconds=SHARED_MODEL_GRACE_SECONDS):
+    """Remove shared model directories not in keep_ids and not written within grace_seconds."""
+    if not os.path.isdir(shared_root):
+        return
+    cutoff = time.time() - grace_seconds
+    for name in os.listdir(shared_root):
+        path = os.path.join(shared_root, name)
+        if name in keep_ids or not os.path.isdir(path) or os.path.getmtime(path) > cutoff:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _pool_context():
+    """
+    Fork start method for the worker pool, or None to score in-process.
+
+    Pipeline scripts run at module level; spawn/forkserver workers would
+    re-import (and rerun) them, so only fork is used.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def _init_worker(model_dir):
+    """Load the shared model once per worker process; its arrays are memory-mapped."""
+    global _shared
+    _shared = (FlatIsolationForest.load(model_dir),
+               np.load(os.path.join(model_dir, 'scaler_mean.npy'), mmap_mode='r'),
+               np.load(os.path.join(model_dir, 'scaler_scale.npy'), mmap_mode='r'))
+
+
+def score_partition(X):
+    """Isolation Forest scores for one partition's raw feature matrix (NaN already replaced by 0)."""
+    forest, mean, scale = _shared
+    X = X - mean
+    X /= scale
+    return forest.score_samples(X)
+
+
+class PartitionedFraudScorer:
+    """
+    Transaction fraud scoring split into monthly payment partitions.
+
+    Changed partitions are scored in a process pool whose workers share one
+    memory-mapped copy of the fitted Isolation Forest (flattened by
+    forest_export) instead of receiving a pickled model with every task.
+    A manifest records, per partition, the model id and a hash of its
+    feature matrix, and a hash of everything written to the partition file.
+    Partitions whose model and features match are not rescored (their scores
+    are read back from the partition file); partitions whose output matches
+    (including risk scores and integrity flags) are not rewritten. Scores
+    match IsolationForest.score_samples exactly.
+    """
+
+    def __init__(self, output_root=partition_root, shared_root=shared_model_root, workers=None):
+        self.output_root = output_root
+        self.shared_root = shared_root
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.manifest_path = os.path.join(output_root, MANIFEST_NAME)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self.pending = {}
+        self.model_id = None
+
+    def _is_current(self, key, entry):
+        previous = {k: v for k, v in self.manifest.get(key, {}).items() if k in SCORE_KEY_FIELDS}
+        return previous == entry and os.path.exists(partition_path(self.output_root, key))
+
+    def score_samples(self, model, transactions):
+        """
+        Fraud scores (IsolationForest score_samples) for transactions that carry the fraud features.
+
+        Remembers which partitions changed, for write_partitions(). Can be
+        passed to TransactionFraudModel.fit as its scorer.
+
+        Returns:
+        --------
+        np.ndarray : scores aligned with the rows of transactions
+        """
+        os.makedirs(self.shared_root, exist_ok=True)
+        model_dir, model_id = export_shared_model(model, self.shared_root)
+        self.model_id = model_id
+
+        X = transactions[model.feature_columns].to_numpy(dtype=np.float64, copy=True)
+        X[np.isnan(X)] = 0
+        keys = partition_keys(transactions['payment_date'])
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique_keys) + 1))
+
+        scores = np.empty(len(transactions))
+        self.pending = {}
+        to_score = []
+        for index, key in enumerate(unique_keys):
+            rows = order[bounds[index]:bounds[index + 1]]
+            X_partition = X[rows]
+            entry = {'model_id': model_id, 'rows': int(len(rows)),
+                     'input_hash': hashlib.sha1(X_partition.tobytes()).hexdigest()}
+            if self._is_current(key, entry):
+                scores[rows] = pd.read_parquet(partition_path(self.output_root, key),
+                                               columns=['fraud_score'])['fraud_score'].to_numpy()
+            else:
+                self.pending[key] = entry
+                to_score.append((rows, X_partition))
+
+        if to_score:
+            workers = min(self.workers, len(to_score))
+            context = _pool_context()
+            if workers <= 1 or context is None:
+                _init_worker(model_dir)
+                for rows, X_partition in to_score:
+                    scores[rows] = score_partition(X_partition)
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(model_dir,)) as executor:
+                    futures = [(rows, executor.submit(score_partition, X_partition)) for rows, X_partition in to_score]
+                    for rows, future in futures:
+                        scores[rows] = future.result()
+        return scores
+
+    def _partition_schema(self, scored, complete):
+        """Schema all partitions share: the existing partitions' when merging into them, else scored's."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not complete:
+            for key in sorted(self.manifest):
+                if os.path.exists(partition_path(self.output_root, key)):
+                    return pq.read_schema(partition_path(self.output_root, key))
+        return pa.Schema.from_pandas(scored, preserve_index=False)
+
+    def write_partitions(self, scored, complete=False):
+        """
+        Write scored payments into their month partitions and update the manifest.
+
+        Parameters:
+        -----------
+        scored : pd.DataFrame
+            Scored payments (from the last score_samples() call)
+        complete : bool
+            True if scored holds every payment (a full pipeline run): each
+            month's partition is replaced by its rows and partitions of months
+            no longer present are removed. Otherwise the rows are merged into
+            the existing partitions (replacing rows with the same payment_id)
+            and no partition is removed.
+
+        All partitions share one schema (so the directory reads as one Parquet
+        dataset); a partition is only written if its contents or schema changed.
+
+        Returns:
+        --------
+        int : number of partitions written
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.output_root, exist_ok=True)
+        schema = self._partition_schema(scored, complete)
+        schema_id = hashlib.sha1(schema.to_string(show_schema_metadata=False).encode()).hexdigest()[:16]
+        keys = partition_keys(scored['payment_date'])
+        present = set(keys)
+
+        written = 0
+        for key in sorted(present):
+            path = partition_path(self.output_root, key)
+            rows = scored[keys == key]
+            entry = self.pending.get(key, self.manifest.get(key, {}))
+            if not complete and os.path.exists(path):
+                existing = pd.read_parquet(path)
+                existing = existing[~existing['payment_id'].isin(rows['payment_id'])]
+                if len(existing) > 0:
+                    rows = pd.concat([existing, rows.reindex(columns=existing.columns)], ignore_index=True)
+                    rows = rows.sort_values('payment_date', kind='stable')
+                    # Stored scores no longer line up with one scoring run; the next full run rescores the month
+                    entry = {}
+            table = pa.Table.from_pandas(rows.reindex(columns=schema.names), schema=schema, preserve_index=False)
+            entry = dict({k: v for k, v in entry.items() if k in SCORE_KEY_FIELDS},
+                         output_hash=frame_hash(table.to_pandas()), schema_id=schema_id)
+            if self.manifest.get(key) == entry and os.path.exists(path):
+                continue
+            pq.write_table(table, path)
+            self.manifest[key] = entry
+            written += 1
+
+        if complete:
+            for key in [key for key in self.manifest if key not in present]:
+                del self.manifest[key]
+                if os.path.exists(partition_path(self.output_root, key)):
+                    os.remove(partition_path(self.output_root, key))
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+        # The pool has shut down; keep models the manifest (or this scorer) still refers to
+        keep_ids = {entry.get('model_id') for entry in self.manifest.values()} | {self.model_id}
+        prune_shared_models(keep_ids, self.shared_root)
+
+        self.pending = {}
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Score new payments by month partition with the persisted transaction fraud model '
+                    'and merge them into the partitions.')
+    parser.add_argument('--input', default=os.path.join(data_dir, 'merged_payments_orders.csv'),
+                        help='CSV of payments (payment_id, order_id, customer_id, method, amount, payment_date, '
+                             'order_date or payment_delay_days, optionally amount_order); only payments after '
+                             "the model's payment watermark are scored")
+    parser.add_argument('--output-root', default=partition_root, help='Directory of per-month Parquet partitions')
+    parser.add_argument('--model', default=fraud_model_path, help='Persisted transaction fraud model')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count, 1 = no pool)')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("PARTITIONED TRANSACTION FRAUD SCORING")
+    print("="*80)
+
+    model = TransactionFraudModel.load(args.model)
+    watermark = getattr(model, 'payment_watermark', None)
+    if watermark is None:
+        print("\nThe model has no payment watermark; refit it with anomaly_fraud_detection.py first.")
+        return
+
+    payments = pd.read_csv(args.input)
+    for column in ('payment_date', 'order_date'):
+        if column in payments.columns:
+            payments[column] = pd.to_datetime(payments[column])
+
+    # Payments up to the watermark are already in the model's baselines, windows and
+    # duplicate index (and in the partitions); scoring them again would compare them with themselves
+    payments = payments[payments['payment_date'] > watermark].reset_index(drop=True)
+    print(f"\n{len(payments)} payments after the model's watermark ({watermark:%Y-%m-%d})")
+    if len(payments) == 0:
+        print("[OK] Nothing to score")
+        return
+
+    # Features depend on each customer's earlier payments, so they are built in one
+    # time-ordered pass (without learning the payments); only the scoring is partitioned
+    scored = add_transaction_features(payments, model.baselines, model.velocity, update=False)
+    scored[INTEGRITY_COLUMNS] = model.integrity.check_batch(scored, update=False)
+
+    scorer = PartitionedFraudScorer(args.output_root, workers=args.workers)
+    start = time.perf_counter()
+    fraud_scores = scorer.score_samples(model, scored)
+    elapsed = time.perf_counter() - start
+    scored['fraud_prediction'] = np.where(fraud_scores - model.iso_forest.offset_ < 0, -1, 1)
+    scored['fraud_score'] = fraud_scores
+    scored['fraud_risk_score'] = model.risk_scores(fraud_scores)
+    written = scorer.write_partitions(scored)
+
+    print(f"\n[OK] Scored {len(scored)} payments in {elapsed * 1000:.1f} ms")
+    print(f"[OK] Flagged {int((scored['fraud_prediction'] == -1).sum())} as potentially fraudulent, "
+          f"{int((scored['fraud_risk_score'] > HIGH_RISK_THRESHOLD).sum())} high-risk (score > {HIGH_RISK_THRESHOLD})")
+    print(f"[OK] Merged into {written} month partitions in {args.output_root}")
+
+
+if __name__ == "__main__":
+    main()
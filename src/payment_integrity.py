@@ -0,0 +1,183 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+# Payments of the same order within this many days can be duplicates
+DUPLICATE_WINDOW_DAYS = 3
+
+# Near-duplicate: amount within this fraction of an earlier payment's amount
+NEAR_DUPLICATE_TOLERANCE = 0.01
+
+INTEGRITY_COLUMNS = ['is_duplicate_payment', 'is_near_duplicate_payment', 'duplicate_of',
+                     'order_paid_total', 'is_overpayment']
+
+
+class PaymentIntegrityDetector:
+    """
+    Duplicate-payment and cumulative overpayment checks, O(1) per payment.
+
+    A hash index keyed on (order_id, amount bucket) holds the order's recent
+    payments (day, amount, payment_id); a payment is an exact duplicate if
+    the same order got the same amount within window_days, and a near
+    duplicate if the amount is within tolerance instead. Only the payment's
+    own bucket and its two neighbours are probed, so lookups stay constant
+    time. Entries are expired by day (a heap of insertion days): once the
+    latest day seen is more than window_days past an entry, it is dropped,
+    so the index only holds the last window of payments. Running paid totals
+    per order are compared with amount_order to flag the payment that pushes
+    an order over its amount (and any after it).
+
+    Re-observing a payment_id still in the window is treated as a replay: it
+    is not its own duplicate and is not counted towards the paid total again.
+    Payments with a missing or non-finite amount are not indexed or totalled
+    and get no duplicate flags.
+
+    The same state serves batch (check_batch on a DataFrame) and streaming
+    (observe per payment) use.
+    """
+
+    def __init__(self, window_days=DUPLICATE_WINDOW_DAYS, tolerance=NEAR_DUPLICATE_TOLERANCE):
+        self.window_days = window_days
+        self.tolerance = tolerance
+        self.index = {}
+        self.paid_totals = {}
+        self.order_amounts = {}
+        self.expiry = []
+        self.latest_day = None
+        self._sequence = 0
+        self._undo = None
+
+    def _bucket(self, amount):
+        # Log-scale buckets one tolerance wide, so near amounts share or neighbour a bucket
+        return int(np.floor(np.log1p(abs(amount)) / np.log1p(self.tolerance)))
+
+    def observe(self, payment_id, order_id, amount, day, amount_order=None):
+        """
+        Check one payment against the state, then record it.
+
+        Parameters:
+        -----------
+        payment_id, order_id : hashable
+        amount : float
+        day : int
+            Payment day number (e.g. days since epoch)
+        amount_order : float, optional
+            Order amount; remembered per order, so later payments may omit it
+
+        Returns:
+        --------
+        tuple : (is_duplicate, is_near_duplicate, duplicate_of, order_paid_total, is_overpayment)
+        """
+        valid_amount = amount is not None and bool(np.isfinite(amount))
+        bucket = self._bucket(amount) if valid_amount else None
+        if self._undo is not None:
+            self._remember(order_id, bucket)
+        else:
+            self._expire(day)
+
+        if amount_order is not None and not np.isnan(amount_order):
+            self.order_amounts[order_id] = amount_order
+
+        is_duplicate = is_near_duplicate = is_replay = False
+        duplicate_of = None
+        probes = (bucket, bucket - 1, bucket + 1) if valid_amount else ()
+        for probe in probes:
+            entries = self.index.get((order_id, probe))
+            if not entries:
+                continue
+            for entry_day, entry_amount, entry_id in entries:
+                if abs(day - entry_day) > self.window_days:
+                    continue
+                if entry_id == payment_id:
+                    is_replay = True
+                    continue
+                if not is_duplicate and entry_amount == amount:
+                    is_duplicate, duplicate_of = True, entry_id
+                elif not is_duplicate and not is_near_duplicate and \
+                        abs(entry_amount - amount) <= self.tolerance * max(abs(entry_amount), abs(amount)):
+                    is_near_duplicate, duplicate_of = True, entry_id
+        if is_duplicate:
+            is_near_duplicate = False
+
+        paid_total = self.paid_totals.get(order_id, 0.0)
+        if valid_amount and not is_replay:
+            key = (order_id, bucket)
+            self.index.setdefault(key, []).append((day, amount, payment_id))
+            if self._undo is None:
+                self._sequence += 1
+                heapq.heappush(self.expiry, (day, self._sequence, key))
+            paid_total += amount
+            self.paid_totals[order_id] = paid_total
+        order_amount = self.order_amounts.get(order_id)
+        is_overpayment = valid_amount and order_amount is not None and paid_total > order_amount
+
+        return is_duplicate, is_near_duplicate, duplicate_of, paid_total, is_overpayment
+
+    def _expire(self, day):
+        """Drop index entries more than window_days before the latest day seen."""
+        if self.latest_day is None or day > self.latest_day:
+            self.latest_day = day
+        cutoff = self.latest_day - self.window_days
+        while self.expiry and self.expiry[0][0] < cutoff:
+            _, _, key = heapq.heappop(self.expiry)
+            entries = self.index.get(key)
+            if entries is None:
+                continue
+            entries[:] = [entry for entry in entries if entry[0] >= cutoff]
+            if not entries:
+                del self.index[key]
+
+    def _remember(self, order_id, bucket):
+        """Save the pre-batch state of everything observe() may change, once per key."""
+        index_undo, paid_undo, amount_undo = self._undo
+        probes = () if bucket is None else (bucket, bucket - 1, bucket + 1)
+        for probe in probes:
+            key = (order_id, probe)
+            if key not in index_undo:
+                entries = self.index.get(key)
+                index_undo[key] = None if entries is None else list(entries)
+        if order_id not in paid_undo:
+            paid_undo[order_id] = self.paid_totals.get(order_id)
+            amount_undo[order_id] = self.order_amounts.get(order_id)
+
+    def _rollback(self):
+        index_undo, paid_undo, amount_undo = self._undo
+        for state, undo in ((self.index, index_undo), (self.paid_totals, paid_undo), (self.order_amounts, amount_undo)):
+            for key, value in undo.items():
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+        self._undo = None
+
+    def check_batch(self, transactions, update=True):
+        """
+        Integrity flags for a payments DataFrame, processed in payment_date order.
+
+        Needs payment_id, order_id, amount and payment_date (amount_order if
+        available). Returns a DataFrame of INTEGRITY_COLUMNS aligned with the
+        input. With update=False the state is left unchanged (only the keys
+        the batch touched are saved and restored, and nothing is expired).
+        """
+        if not update:
+            self._undo = ({}, {}, {})
+
+        days = pd.to_datetime(transactions['payment_date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        order = np.argsort(days, kind='stable')
+        payment_ids = transactions['payment_id'].to_numpy()
+        order_ids = transactions['order_id'].to_numpy()
+        amounts = transactions['amount'].to_numpy(dtype=np.float64)
+        if 'amount_order' in transactions.columns:
+            order_amounts = transactions['amount_order'].to_numpy(dtype=np.float64)
+        else:
+            order_amounts = np.full(len(transactions), np.nan)
+
+        results = [None] * len(transactions)
+        for row in order:
+            results[row] = self.observe(payment_ids[row], order_ids[row], amounts[row], days[row], order_amounts[row])
+
+        if not update:
+            self._rollback()
+
+        return pd.DataFrame(results, columns=INTEGRITY_COLUMNS, index=transactions.index)
@@ -10,6 +10,7 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, f1_score
 from sklearn.metrics import roc_curve, auc
 import joblib
+from model_bundle import save_bundle, load_bundle, bundle_root
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -266,6 +267,16 @@ with open(os.path.join(models_dir, 'model_info.json'), 'w') as f:
     json.dump(feature_info, f, indent=4)
 print(f"[OK] Saved model metadata to {models_dir}/model_info.json")
 
+# Save versioned model bundle (scaler parameters, feature order, memory-mappable
+# flattened forest) and promote it; this is what the scoring tools load
+bundle_version = save_bundle(best_model, scaler, feature_info, bundle_root)
+bundle = load_bundle(bundle_root, bundle_version)
+if bundle.flat_forest is not None:
+    if not np.array_equal(bundle.flat_forest.predict_proba(X_test_scaled), best_model.predict_proba(X_test_scaled)):
+        raise RuntimeError("Flattened forest probabilities differ from the trained model")
+    print(f"[OK] Exported flattened forest ({len(bundle.flat_forest.feature)} nodes), probabilities verified")
+print(f"[OK] Saved and promoted model bundle {bundle_version} to {bundle_root}")
+
 # Save predictions
 predictions_df = pd.DataFrame({
     'customer_id': customer_segments.iloc[X_test.index]['customer_id'],
@@ -284,22 +295,16 @@ print("CREATING PREDICTION UTILITY")
 print("="*80)
 
 # Create a simple prediction script
-prediction_script = '''import pandas as pd
-import numpy as np
-import joblib
-import os
-
-# Load model and scaler
-models_dir = os.path.join(os.path.dirname(__file__), '..', 'models')
-model = joblib.load(os.path.join(models_dir, 'segment_classifier.pkl'))
-scaler = joblib.load(os.path.join(models_dir, 'feature_scaler.pkl'))
+prediction_script = '''import os
+import sys
 
-# Load feature info
-import json
-with open(os.path.join(models_dir, 'model_info.json'), 'r') as f:
-    model_info = json.load(f)
+# Load the promoted model bundle (scaler, feature order and classifier)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from segment_predictor import SegmentPredictor
 
-feature_columns = model_info['feature_columns']
+predictor = SegmentPredictor.from_bundle_dir()
+model_info = predictor.model_info
+feature_columns = predictor.feature_columns
 
 def predict_customer_segment(customer_features_dict):
     """
@@ -314,40 +319,22 @@ def predict_customer_segment(customer_features_dict):
     --------
     dict : Prediction results including segment, probability, and confidence
     """
-    # Create dataframe from input
-    customer_df = pd.DataFrame([customer_features_dict])
-    
-    # Ensure all required features are present
-    for feature in feature_columns:
-        if feature not in customer_df.columns:
-            customer_df[feature] = 0
-    
-    # Select and order features
-    X = customer_df[feature_columns].copy()
-    X = X.replace([np.inf, -np.inf], np.nan).fillna(0)
-    
-    # Scale features
-    X_scaled = scaler.transform(X)
-    
-    # Predict
-    predicted_segment = model.predict(X_scaled)[0]
-    
-    # Get probability if available
-    if hasattr(model, 'predict_proba'):
-        probabilities = model.predict_proba(X_scaled)[0]
-        confidence = probabilities.max()
-        all_probs = {f'segment_{i}': prob for i, prob in enumerate(probabilities)}
-    else:
-        confidence = 1.0
-        all_probs = {}
+    return predictor.predict(customer_features_dict)[0]
+
+def predict_customer_segments(customers):
+    """
+    Predict segments for many customers in one vectorized call.
     
-    return {
-        'predicted_segment': int(predicted_segment),
-        'confidence': float(confidence),
-        'probabilities': all_probs,
-        'model_name': model_info['model_name'],
-        'model_accuracy': model_info['test_accuracy']
-    }
+    Parameters:
+    -----------
+    customers : dict, list of dict, or 2-D array
+        Feature dicts, or a raw feature matrix with columns in feature_columns order
+        
+    Returns:
+    --------
+    list of dict : One prediction result per customer (same keys as predict_customer_segment)
+    """
+    return predictor.predict(customers)
 
 # Example usage
 if __name__ == "__main__":
@@ -408,6 +395,7 @@ print(f"\nFiles generated:")
 print(f"  - {models_dir}/segment_classifier.pkl (trained model)")
 print(f"  - {models_dir}/feature_scaler.pkl (feature scaler)")
 print(f"  - {models_dir}/model_info.json (model metadata)")
+print(f"  - {bundle_root}/{bundle_version}/ (versioned model bundle, promoted)")
 print(f"  - {models_dir}/predict_segment.py (prediction utility)")
 print(f"  - {output_dir}/feature_importance.csv")
 print(f"  - {output_dir}/test_predictions.csv")
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import os
+from artifact_store import write_artifact
 
 # Get the project root (one level up from src)
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -99,10 +100,11 @@ customer_payment_summary['num_payments'] = customer_payment_summary['customer_id
     payments_orders.groupby('customer_id').size()
 ).fillna(0).astype(int)
 customer_payment_summary.to_csv(os.path.join(data_dir, 'customer_summary.csv'), index=False)
+write_artifact(customer_payment_summary, 'customer_summary')
 
 print(f'\nData loaded, preprocessed, and merged successfully!')
 print(f'Merged file saved to {data_dir}/merged_payments_orders.csv')
 print(f'All customers saved to {data_dir}/all_customers.csv')
-print(f'Customer summary saved to {data_dir}/customer_summary.csv')
+print(f'Customer summary saved to {data_dir}/customer_summary.csv (and .parquet)')
 print(f'\nCustomers with payment data: {customer_payment_summary["has_payment_data"].sum()}/{len(customer_payment_summary)}')
 print(f'\nReady for feature engineering!')
@@ -0,0 +1,163 @@
+import pandas as pd
+import os
+import json
+import time
+import hashlib
+import threading
+
+from artifact_store import iter_artifact_frames, artifact_version, artifact_schema
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
+export_dir = os.path.join(output_dir, 'exports')
+
+# Export format (also the file extension) -> (label, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'text/csv'),
+    'csv.gz': ('CSV (gzip)', 'application/gzip'),
+    'csv.zst': ('CSV (zstd)', 'application/zstd'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+_CSV_COMPRESSION = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+
+# Report files of other data versions are only removed once unused for this long,
+# as another session may still be about to read one
+STALE_REPORT_SECONDS = 600
+
+# Rows per Parquet row group (small chunks, e.g. one per month partition, are combined)
+ROW_GROUP_SIZE = 65_536
+
+
+def write_report(frames, path, fmt='csv', schema=None):
+    """
+    Write a stream of DataFrames to one report file, a chunk at a time.
+
+    Parameters:
+    -----------
+    frames : iterable of pd.DataFrame
+        Report rows (all chunks with the same columns)
+    path : str
+        File to write
+    fmt : str
+        One of EXPORT_FORMATS: plain, gzip- or zstd-compressed CSV, or Parquet (zstd)
+    schema : pyarrow.Schema, optional
+        Parquet column types (default: inferred from the first chunk, with
+        all-null columns written as strings)
+
+    Returns:
+    --------
+    int : number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = 0
+    if fmt == 'parquet':
+        writer = None
+        pending = []
+        try:
+            for frame in frames:
+                if writer is None:
+                    if schema is None:
+                        schema = pa.Schema.from_pandas(frame, preserve_index=False).remove_metadata()
+                        schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                            for field in schema])
+                    writer = pq.ParquetWriter(path, schema, compression='zstd')
+                pending.append(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                rows += len(frame)
+                if sum(table.num_rows for table in pending) >= ROW_GROUP_SIZE:
+                    writer.write_table(pa.concat_tables(pending), row_group_size=ROW_GROUP_SIZE)
+                    pending = []
+            if pending:
+                writer.write_table(pa.concat_tables(pending), row_group_size=ROW_GROUP_SIZE)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pd.DataFrame().to_parquet(path, index=False)
+        return rows
+
+    sink = pa.OSFile(path, 'wb')
+    if _CSV_COMPRESSION[fmt] is not None:
+        sink = pa.CompressedOutputStream(sink, _CSV_COMPRESSION[fmt])
+    with sink:
+        for frame in frames:
+            # Same text as DataFrame.to_csv(index=False) of the whole report
+            sink.write(frame.to_csv(index=False, header=rows == 0).encode('utf-8'))
+            rows += len(frame)
+    return rows
+
+
+def export_report(name, make_frames, fmt='csv', version=None, query=None, schema=None, directory=export_dir):
+    """
+    Report file written from a stream of DataFrames, kept for reuse.
+
+    Parameters:
+    -----------
+    name : str
+        Report name (file name prefix)
+    make_frames : callable
+        Returns the report rows as an iterable of DataFrames; only called if
+        the file does not exist yet
+    fmt : str
+        One of EXPORT_FORMATS
+    version, query : JSON-serializable
+        Version of the data the report is built from, and what is selected
+        from it. A file is reused for the same version, query and format;
+        files of other versions of the same report are removed once unused
+        for STALE_REPORT_SECONDS.
+    schema : pyarrow.Schema, optional
+        Parquet column types (see write_report)
+
+    Returns:
+    --------
+    str : path of the report file
+    """
+    version_id = hashlib.sha1(json.dumps(version, default=str).encode()).hexdigest()[:12]
+    query_id = hashlib.sha1(json.dumps([query, fmt], default=str).encode()).hexdigest()[:12]
+    path = os.path.join(directory, f'{name}-{version_id}-{query_id}.{fmt}')
+    if os.path.exists(path):
+        try:
+            # Mark it as in use, so other versions' cleanup leaves it alone
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+    os.makedirs(directory, exist_ok=True)
+    # Written under a temporary name, so concurrent sessions never serve a partial file
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        write_report(make_frames(), temp_path, fmt, schema)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    cutoff = time.time() - STALE_REPORT_SECONDS
+    for entry in os.listdir(directory):
+        if entry.startswith(f'{name}-') and not entry.startswith(f'{name}-{version_id}-') and not entry.endswith('.tmp'):
+            stale_path = os.path.join(directory, entry)
+            try:
+                if os.path.getmtime(stale_path) < cutoff:
+                    os.remove(stale_path)
+            except FileNotFoundError:
+                # Removed by a concurrent export
+                pass
+    return path
+
+
+def export_artifact(name, fmt='csv', columns=None, filters=None, directory=export_dir):
+    """
+    Report file of an artifact's columns/rows (as read_artifact), streamed from the artifact store
+    (see export_report). Raises FileNotFoundError if the artifact does not exist.
+    """
+    version = artifact_version(name)
+    if version is None:
+        raise FileNotFoundError(f"Artifact '{name}' not found; run the pipeline to create it")
+    return export_report(name, lambda: iter_artifact_frames(name, columns, filters), fmt,
+                         version=version, query=[columns, filters], schema=artifact_schema(name, columns),
+                         directory=directory)
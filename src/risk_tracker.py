@@ -0,0 +1,90 @@
+import os
+import pandas as pd
+
+# Get the project root (one level up from src)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.path.abspath(os.path.join(script_dir, '..', 'output'))
+high_risk_report_path = os.path.join(output_dir, 'high_risk_transactions.csv')
+
+REPORT_COLUMNS = ['payment_id', 'customer_id', 'order_id', 'amount', 'payment_delay_days',
+                  'fraud_risk_score', 'method', 'fraud_prediction']
+
+
+class TopKRiskTracker:
+    """
+    Bounded-memory top-K of scored transactions by risk score.
+
+    Feed it scored chunks with update(); it only ever holds k rows, keeping at
+    most one (the riskiest) payment per dedupe_column value so a single
+    customer cannot fill the list. Trackers built on different chunks or
+    workers combine with merge(), and the list persists as a small CSV that
+    can be read back without the scored transactions.
+
+    Ties keep the earlier-seen row, as DataFrame.nlargest(keep='first').
+    """
+
+    def __init__(self, k=50, score_column='fraud_risk_score', dedupe_column='customer_id',
+                 columns=REPORT_COLUMNS):
+        self.k = k
+        self.score_column = score_column
+        self.dedupe_column = dedupe_column
+        self.columns = list(columns)
+        self.top = pd.DataFrame(columns=self.columns)
+
+    def __len__(self):
+        return len(self.top)
+
+    @property
+    def threshold(self):
+        """Score a new row must exceed to enter a full list (None while not full)."""
+        if len(self.top) < self.k:
+            return None
+        return self.top[self.score_column].iloc[-1]
+
+    def _candidates(self, chunk):
+        """Rows of a chunk that can still enter the list, at most k of them."""
+        threshold = self.threshold
+        if threshold is not None:
+            chunk = chunk[chunk[self.score_column] > threshold]
+        if self.dedupe_column is not None and len(chunk):
+            chunk = chunk.sort_values(self.score_column, ascending=False, kind='mergesort')
+            chunk = chunk.drop_duplicates(self.dedupe_column, keep='first')
+        return chunk.nlargest(self.k, self.score_column)
+
+    def update(self, chunk):
+        """Offer a scored DataFrame chunk (needs the tracked columns) to the list."""
+        candidates = self._candidates(chunk[[c for c in self.columns if c in chunk.columns]])
+        if len(candidates):
+            self._combine(candidates)
+        return self
+
+    def merge(self, other):
+        """Fold another tracker's list into this one (e.g. from another worker)."""
+        if len(other.top):
+            self._combine(other.top)
+        return self
+
+    def _combine(self, candidates):
+        combined = pd.concat([self.top, candidates], ignore_index=True) if len(self.top) else candidates
+        combined = combined.sort_values(self.score_column, ascending=False, kind='mergesort')
+        if self.dedupe_column is not None:
+            combined = combined.drop_duplicates(self.dedupe_column, keep='first')
+        self.top = combined.head(self.k).reset_index(drop=True)
+
+    def head(self, n):
+        """The n riskiest tracked rows."""
+        return self.top.head(n)
+
+    def save(self, path=high_risk_report_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.top.to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path=high_risk_report_path, k=50, **kwargs):
+        """Tracker holding a previously saved list (empty if the file does not exist)."""
+        tracker = cls(k=k, **kwargs)
+        if os.path.exists(path):
+            saved = pd.read_csv(path)
+            tracker.columns = [c for c in tracker.columns if c in saved.columns] or list(saved.columns)
+            tracker._combine(saved)
+        return tracker
@@ -0,0 +1,63 @@
+import numpy as np
+
+HIGH_RISK_THRESHOLD = 70
+
+
+class ScoreQuantileSketch:
+    """
+    Compact, mergeable summary of a reference score distribution.
+
+    Keeps the scores' values at n_quantiles evenly spaced probabilities plus
+    the number of scores summarized, so memory is fixed however large the
+    reference window is. Two sketches merge by pooling their quantile points
+    weighted by count and re-reading the quantiles from the pooled CDF.
+    """
+
+    def __init__(self, values, count):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.probs = np.linspace(0.0, 1.0, len(self.values))
+        self.count = int(count)
+
+    @classmethod
+    def from_scores(cls, scores, n_quantiles=1001):
+        scores = np.asarray(scores, dtype=np.float64)
+        scores = scores[np.isfinite(scores)]
+        return cls(np.quantile(scores, np.linspace(0.0, 1.0, n_quantiles)), len(scores))
+
+    def quantile(self, q):
+        return np.interp(q, self.probs, self.values)
+
+    def cdf(self, x):
+        """Fraction of reference scores at or below x."""
+        # Flat runs in values (ties) map to the top of the run, as for an empirical CDF
+        return np.interp(x, self.values, self.probs, left=0.0, right=1.0)
+
+    def merge(self, other):
+        """Sketch of the union of both reference windows."""
+        values = np.concatenate([self.values, other.values])
+        weights = np.concatenate([np.full(len(self.values), self.count / len(self.values)),
+                                  np.full(len(other.values), other.count / len(other.values))])
+        order = np.argsort(values, kind='mergesort')
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+        pooled_probs = (cumulative - cumulative[0]) / (cumulative[-1] - cumulative[0])
+        merged = np.interp(self.probs, pooled_probs, values)
+        return ScoreQuantileSketch(merged, self.count + other.count)
+
+
+def calibrated_risk(fraud_scores, sketch, high_risk_tail=0.05):
+    """
+    Map IsolationForest scores to 0-100 risk (higher = more suspicious) via the reference sketch.
+
+    A score's position p in the reference distribution (lower score = more
+    anomalous) is mapped piecewise-linearly so that the riskiest
+    high_risk_tail fraction of the reference lands above HIGH_RISK_THRESHOLD:
+    p = 0 -> 100, p = high_risk_tail -> 70, p = 1 -> 0. A payment's risk thus
+    depends only on its own score and the persisted reference, not on the
+    batch it is scored with.
+    """
+    p = sketch.cdf(np.asarray(fraud_scores, dtype=np.float64))
+    tail = high_risk_tail
+    upper = HIGH_RISK_THRESHOLD + (100 - HIGH_RISK_THRESHOLD) * (1 - p / tail)
+    lower = HIGH_RISK_THRESHOLD * (1 - p) / (1 - tail)
+    return np.clip(np.where(p <= tail, upper, lower), 0, 100)
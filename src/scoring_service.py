@@ -0,0 +1,250 @@
+import numpy as np
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import warnings
+warnings.filterwarnings('ignore')
+
+from model_bundle import bundle_root
+from segment_predictor import SegmentPredictor
+
+
+class ServiceStats:
+    """Thread-safe request counters and a window of recent latencies."""
+
+    def __init__(self, window=10_000):
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=window)
+        self.started_at = time.time()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record_request(self, latency_ms, rows):
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self._latencies_ms.append(latency_ms)
+
+    def record_batch(self):
+        with self._lock:
+            self.batches += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies_ms)
+            uptime = time.time() - self.started_at
+            snapshot = {
+                'uptime_seconds': round(uptime, 1),
+                'requests': self.requests,
+                'rows_scored': self.rows,
+                'model_batches': self.batches,
+                'errors': self.errors,
+                'requests_per_second': round(self.requests / uptime, 2) if uptime > 0 else 0.0,
+                'rows_per_second': round(self.rows / uptime, 2) if uptime > 0 else 0.0,
+            }
+        if len(latencies) > 0:
+            snapshot['latency_ms_p50'] = round(float(np.percentile(latencies, 50)), 3)
+            snapshot['latency_ms_p99'] = round(float(np.percentile(latencies, 99)), 3)
+        else:
+            snapshot['latency_ms_p50'] = None
+            snapshot['latency_ms_p99'] = None
+        return snapshot
+
+
+class _PendingPrediction:
+    __slots__ = ('features', 'done', 'result', 'error')
+
+    def __init__(self, features):
+        self.features = features
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row requests into one model call.
+
+    The worker thread blocks for the first request, then keeps collecting
+    requests until max_batch_size is reached or max_wait_ms has passed since
+    the first one arrived, and scores them all as one matrix. Each request is
+    converted to its feature row in submit(), so malformed input fails only
+    its own request; if the model call still fails, the batch is rescored
+    one request at a time so the error reaches only the culprit.
+    """
+
+    def __init__(self, predictor, stats, max_batch_size=64, max_wait_ms=2.0):
+        self.predictor = predictor
+        self.stats = stats
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, features, timeout=5.0):
+        if not isinstance(features, dict):
+            raise TypeError('Expected a JSON object of feature values')
+        row = self.predictor.to_matrix(features)
+        pending = _PendingPrediction(row)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError('Prediction timed out')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.predictor.predict(np.vstack([pending.features for pending in batch]))
+                self.stats.record_batch()
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception:
+                self._score_each(batch)
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def _score_each(self, batch):
+        """Rescore a failed batch one request at a time, so only failing requests get the error."""
+        for pending in batch:
+            try:
+                pending.result = self.predictor.predict(pending.features)[0]
+                self.stats.record_batch()
+            except Exception as e:
+                pending.error = e
+
+
+def make_handler(predictor, batcher, stats):
+    """Create the request handler class bound to one predictor/batcher."""
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            # Per-request logging would dominate latency; use /stats instead
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok', 'model_name': predictor.model_info['model_name'],
+                                      'bundle_version': predictor.bundle.version})
+            elif self.path == '/stats':
+                self._send_json(200, stats.snapshot())
+            else:
+                self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            try:
+                payload = self._read_json()
+                if self.path == '/predict':
+                    features = payload.get('features', payload)
+                    result = batcher.submit(features)
+                    rows = 1
+                elif self.path == '/predict_batch':
+                    customers = payload if isinstance(payload, list) else payload.get('customers', [])
+                    # A single record is one row, not one row per feature key
+                    if isinstance(customers, dict):
+                        customers = [customers]
+                    result = {'predictions': predictor.predict(customers)}
+                    stats.record_batch()
+                    rows = len(customers)
+                else:
+                    self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+                    return
+            except (ValueError, TypeError, AttributeError) as e:
+                stats.record_error()
+                self._send_json(400, {'error': str(e)})
+                return
+            except Exception as e:
+                stats.record_error()
+                self._send_json(500, {'error': str(e)})
+                return
+
+            stats.record_request((time.perf_counter() - start) * 1000, rows)
+            self._send_json(200, result)
+
+    return ScoringHandler
+
+
+class ScoringHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default backlog of 5 resets connections under a few dozen concurrent clients
+    request_queue_size = 256
+
+
+def create_server(host='127.0.0.1', port=8765, bundle_dir=bundle_root, max_batch_size=64, max_wait_ms=2.0):
+    """Load the model once and build a threaded HTTP server around it."""
+    predictor = SegmentPredictor.from_bundle_dir(bundle_dir)
+    stats = ServiceStats()
+    batcher = MicroBatcher(predictor, stats, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    return ScoringHTTPServer((host, port), make_handler(predictor, batcher, stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local HTTP scoring service for segment predictions.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--bundle-dir', default=bundle_root, help='Model bundle directory (uses its promoted version)')
+    parser.add_argument('--max-batch-size', type=int, default=64, help='Max single requests per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help='Max time to wait for a micro-batch to fill')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("SEGMENT SCORING SERVICE")
+    print("="*80)
+
+    server = create_server(args.host, args.port, args.bundle_dir, args.max_batch_size, args.max_wait_ms)
+    print(f"\n[OK] Model bundle loaded from {args.bundle_dir}")
+    print(f"[OK] Listening on http://{args.host}:{args.port}")
+    print("  POST /predict        - score one customer (micro-batched)")
+    print("  POST /predict_batch  - score a list of customers")
+    print("  GET  /stats          - p50/p99 latency and throughput counters")
+    print("  GET  /health")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
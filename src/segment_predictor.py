@@ -0,0 +1,95 @@
+import numpy as np
+from model_bundle import load_bundle, bundle_root
+
+
+class SegmentPredictor:
+    """
+    Pandas-free segment prediction on top of a loaded model bundle.
+
+    The feature-name -> column mapping and the StandardScaler parameters are
+    precomputed once; scaling is the bundle's in-place (x - mean) / scale, so
+    results match ModelBundle exactly. Inputs can be a feature dict, a list of dicts,
+    or a raw 2-D array with columns in feature_columns order.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.model_info = bundle.model_info
+        self.feature_columns = bundle.feature_columns
+        self.feature_index = {name: idx for idx, name in enumerate(self.feature_columns)}
+        self.classes_ = bundle.classes_
+        self._segment_keys = [f'segment_{i}' for i in range(len(self.classes_))]
+
+    @classmethod
+    def from_bundle_dir(cls, bundle_dir=bundle_root, version=None):
+        return cls(load_bundle(bundle_dir, version))
+
+    def to_matrix(self, customers):
+        """
+        Build a raw (unscaled) float64 feature matrix.
+
+        Dict inputs: unknown keys are ignored and missing features are 0.
+        Array inputs must already be in feature_columns order. Non-finite
+        values become 0, as in training.
+        """
+        if isinstance(customers, dict):
+            customers = [customers]
+
+        if isinstance(customers, np.ndarray):
+            X = np.array(customers, dtype=np.float64, ndmin=2)
+            if X.shape[1] != len(self.feature_columns):
+                raise ValueError(f"Expected {len(self.feature_columns)} feature columns, got {X.shape[1]}")
+        else:
+            X = np.zeros((len(customers), len(self.feature_columns)), dtype=np.float64)
+            feature_index = self.feature_index
+            for row, customer in enumerate(customers):
+                for name, value in customer.items():
+                    idx = feature_index.get(name)
+                    if idx is not None:
+                        X[row, idx] = np.nan if value is None else value
+
+        np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        return X
+
+    def transform(self, X):
+        """Scale a raw feature matrix in place (same arithmetic as the bundle and StandardScaler)."""
+        return self.bundle.transform(X)
+
+    def predict_proba(self, customers):
+        """Class probabilities, shape (n_customers, n_classes); None for models without predict_proba."""
+        return self.bundle.predict_proba(self.transform(self.to_matrix(customers)))
+
+    def predict(self, customers):
+        """
+        Predict segments.
+
+        Returns:
+        --------
+        list of dict : one result per customer with predicted_segment, confidence,
+                       probabilities, model_name and model_accuracy
+        """
+        X_scaled = self.transform(self.to_matrix(customers))
+        probabilities = self.bundle.predict_proba(X_scaled)
+        if probabilities is not None:
+            segments = self.classes_[probabilities.argmax(axis=1)]
+            confidences = probabilities.max(axis=1)
+        else:
+            segments = self.bundle.predict(X_scaled)
+            confidences = np.ones(len(X_scaled))
+
+        model_name = self.model_info['model_name']
+        model_accuracy = self.model_info['test_accuracy']
+        results = []
+        for row in range(len(X_scaled)):
+            if probabilities is not None:
+                all_probs = dict(zip(self._segment_keys, probabilities[row].tolist()))
+            else:
+                all_probs = {}
+            results.append({
+                'predicted_segment': int(segments[row]),
+                'confidence': float(confidences[row]),
+                'probabilities': all_probs,
+                'model_name': model_name,
+                'model_accuracy': model_accuracy
+            })
+        return results
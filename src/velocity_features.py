@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+VELOCITY_WINDOWS_DAYS = (1, 7, 30)
+
+# Entity -> payments column whose values define the event streams
+VELOCITY_KEYS = {'customer': 'customer_id', 'method': 'method'}
+
+
+def velocity_feature_names(windows=VELOCITY_WINDOWS_DAYS, keys=VELOCITY_KEYS):
+    return [f'{entity}_{stat}_{window}d' for entity in keys for window in windows for stat in ('count', 'amount')]
+
+
+VELOCITY_FEATURES = velocity_feature_names()
+
+
+class VelocityWindows:
+    """
+    Sliding-window payment count and amount per key (e.g. per customer).
+
+    Each key keeps a ring buffer of daily (count, amount) buckets covering the
+    widest window, so state is bounded per key and the cost per payment does
+    not depend on how much history the key has. Windows are calendar days:
+    the w-day window of a payment on day d covers days d-w+1..d and counts
+    the key's earlier payments in it: within a batch, those dated earlier
+    (same day: earlier in input order); from earlier batches, all of them.
+
+    score_and_update() handles any batch size: within the batch, windows
+    come from a sorted-time sweep (searchsorted as a vectorized two-pointer)
+    and are added to what the ring buffers already hold for earlier batches.
+    """
+
+    def __init__(self, windows=VELOCITY_WINDOWS_DAYS, initial_capacity=1024):
+        self.windows = tuple(windows)
+        self.span = max(self.windows)
+        self.index = {}
+        self.counts = np.zeros((initial_capacity, self.span), dtype=np.float64)
+        self.sums = np.zeros((initial_capacity, self.span), dtype=np.float64)
+        self.last_day = np.full(initial_capacity, -2**40, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _rows_for(self, keys):
+        """State row per event, registering unseen keys."""
+        index = self.index
+        rows = np.empty(len(keys), dtype=np.int64)
+        for position, key in enumerate(keys):
+            row = index.get(key)
+            if row is None:
+                row = len(index)
+                index[key] = row
+            rows[position] = row
+
+        if len(index) > len(self.counts):
+            capacity = max(len(index), 2 * len(self.counts))
+            pad = np.zeros((capacity - len(self.counts), self.span))
+            self.counts = np.vstack([self.counts, pad])
+            self.sums = np.vstack([self.sums, pad])
+            self.last_day = np.concatenate([self.last_day, np.full(len(pad), -2**40, dtype=np.int64)])
+        return rows
+
+    def score_and_update(self, keys, days, amounts, update=True):
+        """
+        Payment count and amount in each window before every event.
+
+        Parameters:
+        -----------
+        keys : sequence
+            Stream key per event (customer id, payment method, ...)
+        days : np.ndarray of int
+            Event day number (e.g. days since epoch)
+        amounts : np.ndarray
+            Event amount; NaN counts as an event with amount 0
+        update : bool
+            Add the events to the ring buffers afterwards
+
+        Returns:
+        --------
+        (np.ndarray, np.ndarray) : counts and amounts, shape (n_events, n_windows)
+        """
+        days = np.asarray(days, dtype=np.int64)
+        amounts = np.nan_to_num(np.asarray(amounts, dtype=np.float64))
+        n_events = len(days)
+        counts = np.zeros((n_events, len(self.windows)))
+        sums = np.zeros((n_events, len(self.windows)))
+        if n_events == 0:
+            return counts, sums
+        rows = self._rows_for(keys)
+
+        # Sort by (key, day); lexsort is stable, so same-day events keep input order
+        order = np.lexsort((days, rows))
+        r = rows[order]
+        d = days[order]
+        a = amounts[order]
+        group_start = np.ones(n_events, dtype=bool)
+        group_start[1:] = r[1:] != r[:-1]
+        group_id = np.cumsum(group_start) - 1
+        first_position = np.flatnonzero(group_start)
+        last_position = np.append(first_position[1:], n_events) - 1
+        group_rows = r[first_position]
+
+        # In-batch windows: composite (key, day) is sorted, so the left edge of
+        # each window is a searchsorted away and the right edge is the event itself
+        day_min = d.min()
+        stride = int(d.max() - day_min) + self.span + 1
+        composite = r * stride + (d - day_min)
+        position = np.arange(n_events)
+        cumulative = np.concatenate([[0.0], np.cumsum(a)])
+
+        # Earlier batches: ring buckets laid out oldest to newest per key
+        state_last = self.last_day[group_rows]
+        base_day = state_last - self.span + 1
+        slot_days = base_day[:, np.newaxis] + np.arange(self.span)
+        ring_rows = group_rows[:, np.newaxis]
+        ring_counts = np.zeros((len(group_rows), self.span + 1))
+        ring_sums = np.zeros((len(group_rows), self.span + 1))
+        ring_counts[:, 1:] = np.cumsum(self.counts[ring_rows, slot_days % self.span], axis=1)
+        ring_sums[:, 1:] = np.cumsum(self.sums[ring_rows, slot_days % self.span], axis=1)
+        event_base = base_day[group_id]
+        hi = np.clip(d - event_base + 1, 0, self.span)
+
+        for w, window in enumerate(self.windows):
+            left = np.searchsorted(composite, r * stride + (d - window + 1 - day_min), side='left')
+            lo = np.minimum(np.clip(d - window + 1 - event_base, 0, self.span), hi)
+            counts[order, w] = (position - left) + ring_counts[group_id, hi] - ring_counts[group_id, lo]
+            sums[order, w] = (cumulative[position] - cumulative[left]) + ring_sums[group_id, hi] - ring_sums[group_id, lo]
+
+        if update:
+            new_last = np.maximum(state_last, d[last_position])
+            # Clear buckets whose day falls out of the span once the key advances to new_last
+            old_slot_days = state_last[:, np.newaxis] - ((state_last[:, np.newaxis] - np.arange(self.span)) % self.span)
+            stale = old_slot_days <= (new_last - self.span)[:, np.newaxis]
+            stale_rows, stale_slots = np.nonzero(stale)
+            self.counts[group_rows[stale_rows], stale_slots] = 0.0
+            self.sums[group_rows[stale_rows], stale_slots] = 0.0
+
+            # Events older than the span contribute to no window any more
+            keep = d > new_last[group_id] - self.span
+            np.add.at(self.counts, (r[keep], d[keep] % self.span), 1.0)
+            np.add.at(self.sums, (r[keep], d[keep] % self.span), a[keep])
+            self.last_day[group_rows] = new_last
+
+        return counts, sums
+
+
+class VelocityFeatureEngine:
+    """
+    Per-customer and per-payment-method velocity features.
+
+    Keeps one VelocityWindows per entity in VELOCITY_KEYS and adds, for every
+    entity and window, the number of payments and the amount paid in that
+    window before the payment (e.g. customer_count_7d, method_amount_1d).
+    """
+
+    def __init__(self, windows=VELOCITY_WINDOWS_DAYS, keys=VELOCITY_KEYS):
+        self.windows = tuple(windows)
+        self.keys = dict(keys)
+        self.streams = {entity: VelocityWindows(self.windows) for entity in self.keys}
+        self.feature_columns = velocity_feature_names(self.windows, self.keys)
+
+    def add_features(self, transactions, update=True):
+        """Add the velocity columns to a payments DataFrame (in place); needs payment_date, amount and the key columns."""
+        days = pd.to_datetime(transactions['payment_date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        amounts = transactions['amount'].to_numpy(dtype=np.float64)
+
+        for entity, column in self.keys.items():
+            counts, sums = self.streams[entity].score_and_update(
+                transactions[column].to_numpy(), days, amounts, update=update)
+            for w, window in enumerate(self.windows):
+                transactions[f'{entity}_count_{window}d'] = counts[:, w]
+                transactions[f'{entity}_amount_{window}d'] = sums[:, w]
+        return transactions